@@ -0,0 +1,48 @@
+"""
+CSV读取方式的基准测试：对比 csv.reader 与内存映射按列提取（行/秒）
+
+用法：
+    python benchmarks/bench_csv_reader.py 导出的CSV文件 [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import moyu_analyzer  # noqa: E402
+from moyu_csv import iter_columns  # noqa: E402
+
+
+def bench(name, path, columns, reader, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = 0
+        for _ in iter_columns(path, columns, reader=reader):
+            rows += 1
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<12} {rows / best:>14,.0f} 行/秒")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV读取方式基准测试")
+    parser.add_argument("csv", help="导出的CSV文件")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快的一次")
+    args = parser.parse_args()
+
+    columns = (moyu_analyzer.time_index, moyu_analyzer.msg_index, moyu_analyzer.nickname_index)
+
+    # 两种读取方式的结果必须完全一致
+    assert list(iter_columns(args.csv, columns, reader="csv")) == list(iter_columns(args.csv, columns, reader="mmap"))
+
+    baseline = bench("csv.reader", args.csv, columns, "csv", args.repeat)
+    mapped = bench("mmap", args.csv, columns, "mmap", args.repeat)
+    print(f"加速比: {baseline / mapped:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+消息过滤与昵称清洗的微基准测试：对比原始实现与预编译正则 + 缓存的实现（行/秒）
+
+用法：
+    python benchmarks/bench_filter.py [导出的CSV文件] [--repeat 3]
+不指定CSV文件时使用内置的示例消息
+"""
+import argparse
+import csv
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import moyu_analyzer  # noqa: E402
+
+
+# 原始实现：每个关键字都重新转一次小写
+def legacy_is_valid_message(msg):
+    if not msg or msg.strip() == "":
+        return False
+    if "<" in msg or ">" in msg:
+        return False
+    if "撤回" in msg:
+        return False
+    xml_keywords = ["xml", "cdn", "aeskey", "thumburl", "imgurl", "signature",
+                    "platform", "version", "length", "md5", "encryver", "hdwidth",
+                    "hdheight", "thumbwidth", "thumbheight"]
+    for keyword in xml_keywords:
+        if keyword in msg.lower():
+            return False
+    return True
+
+
+# 原始实现：每次调用 re.sub
+def legacy_clean_nickname(nickname):
+    return re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9.,，。、？！]', '', nickname)
+
+
+def sample_rows(count):
+    random.seed(0)
+    messages = [
+        "今天又在摸鱼了哈哈", "中午吃什么好呢", "这个需求太难了，今晚又要加班", "周末一起去爬山吧",
+        "Python 3.12 的性能提升不少", "老板来了快跑", "\"张三\" 撤回了一条消息", "",
+        '<msg><img aeskey="abc" cdnthumburl="x" md5="y" length="1024" hdlength="2048"/></msg>',
+        "<?xml version=\"1.0\"?><msg><appmsg><title>链接</title></appmsg></msg>",
+    ]
+    nicknames = ["张三😀", "李四", "王五🐟", "赵六", "Alice", "bob_x", "摸鱼王✨", "小明"]
+    return [(random.choice(nicknames), random.choice(messages)) for _ in range(count)]
+
+
+def read_rows(path):
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) > max(moyu_analyzer.nickname_index, moyu_analyzer.msg_index):
+                rows.append((row[moyu_analyzer.nickname_index], row[moyu_analyzer.msg_index]))
+    return rows
+
+
+def bench(name, rows, filter_func, clean_func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for nickname, msg in rows:
+            clean_func(nickname)
+            filter_func(msg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<12} {len(rows) / best:>14,.0f} 行/秒")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="消息过滤微基准测试")
+    parser.add_argument("csv", nargs="?", help="导出的CSV文件，不指定时使用内置示例")
+    parser.add_argument("--rows", type=int, default=500000, help="内置示例的行数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快的一次")
+    args = parser.parse_args()
+
+    rows = read_rows(args.csv) if args.csv else sample_rows(args.rows)
+
+    # 两种实现的过滤结果必须完全一致
+    for nickname, msg in rows:
+        assert legacy_is_valid_message(msg) == moyu_analyzer.is_valid_message(msg), msg
+        assert legacy_clean_nickname(nickname) == moyu_analyzer.clean_nickname(nickname), nickname
+
+    legacy = bench("原始实现", rows, legacy_is_valid_message, legacy_clean_nickname, args.repeat)
+    compiled = bench("预编译实现", rows, moyu_analyzer.is_valid_message, moyu_analyzer.clean_nickname, args.repeat)
+    print(f"加速比: {legacy / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
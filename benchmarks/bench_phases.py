@@ -0,0 +1,253 @@
+"""
+分阶段基准测试：分别测量 解析(parse)、过滤(filter)、统计(aggregate)、分词(tokenize)、渲染(render)、
+生成报告(report) 各阶段的耗时，以及完整运行 analyze() 的总耗时，结果保存为JSON，便于在不同提交之间比较。
+
+- parse：csv.reader 读取需要的三列（不使用列式缓存）
+- filter：对解析出的每一行执行 is_valid_message 和 clean_nickname
+- aggregate：逐行统计（包含过滤和时间换算），与默认的逐行模式相同
+- tokenize：对工作时间内的消息分词并按用户统计词频（不使用分词缓存，不包含jieba词典加载，词典加载单独记为 jieba_init）
+- render：渲染全部图表和词云
+- report：把图表和表格写入HTML报告
+- analyze：完整运行一次 analyze()（使用默认配置，但不使用列式缓存和分词缓存，每次都从CSV开始）
+
+用法：
+    python benchmarks/bench_phases.py [导出的CSV文件] [--rows 100000] [--repeat 3] [--font 字体文件]
+                                      [--json 结果.json] [--compare 之前的结果.json]
+不指定CSV文件时用 generate_export.py 生成 --rows 行的模拟数据
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import moyu_analyzer  # noqa: E402
+from generate_export import generate  # noqa: E402
+from moyu_calendar import WorkCalendar  # noqa: E402
+from moyu_csv import iter_columns  # noqa: E402
+
+phases = ["parse", "filter", "aggregate", "jieba_init", "tokenize", "render", "report", "analyze"]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(func, repeat):
+    """
+    运行 repeat 次，返回 (每次的耗时, 最后一次的返回值)
+    """
+    runs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    return runs, result
+
+
+def render_all(stats, config, renderer):
+    """
+    与 analyze() 相同地提交全部图表和词云，返回 [(文件名, PNG字节)]
+    """
+    from moyu_render import wordcloud_budget
+
+    a = moyu_analyzer
+    cube = stats["cube"]
+    ranking = cube.moyu_counter().most_common(10)
+    total_work_days = cube.work_day_count()
+    work_hours = list(range(*config.work_hours))
+    detailed_users = [name for name, _ in ranking[:3]]
+    word_counter = Counter()
+    for user_word_counter in stats["user_word_counters"].values():
+        word_counter.update(user_word_counter)
+    budget = wordcloud_budget(config.wordcloud_max_words, config.wordcloud_width, config.wordcloud_height,
+                              config.wordcloud_scale, config.wordcloud_preview)
+
+    futures = [
+        ("moyu_ranking.png", renderer.submit(a.plot_ranking, ranking, [])),
+        ("moyu_time_distribution.png", renderer.submit(a.plot_time_distribution, cube.hour_counts(), work_hours)),
+        ("detailed_users_time_distribution.png", renderer.submit(a.plot_detailed_users_time, detailed_users, {
+            user: cube.user_hour_counts(user)[work_hours[0]:work_hours[-1] + 1] for user in detailed_users
+        }, work_hours)),
+        ("weekday_trend.png", renderer.submit(a.plot_weekday_trend, cube.weekday_counts())),
+        ("detailed_users_weekday_distribution.png", renderer.submit(
+            a.plot_detailed_users_weekday, detailed_users, {
+                user: cube.user_weekday_counts(user) for user in detailed_users
+            })),
+        ("weekday_hour_heatmap.png", renderer.submit(a.plot_heatmap, cube.heatmap().tolist(), work_hours)),
+        ("moyu_content_wordcloud.png", renderer.submit(
+            a.plot_wordcloud, word_counter, '摸鱼内容词云', budget, config.font_path)),
+    ]
+    if total_work_days:
+        futures.append(("moyu_efficiency.png", renderer.submit(a.plot_efficiency, ranking, total_work_days, [])))
+    for user in detailed_users:
+        if stats["user_word_counters"].get(user):
+            futures.append((f"{user}_wordcloud.png", renderer.submit(
+                a.plot_wordcloud, stats["user_word_counters"][user], f'{user}的摸鱼内容词云', budget,
+                config.font_path)))
+    return [(name, future.result()) for name, future in futures]
+
+
+def write_report(path, stats, images, embed_images):
+    from moyu_report import ReportWriter
+
+    with ReportWriter(path, embed_images) as report:
+        report.write(moyu_analyzer.report_head)
+        report.write("<table>")
+        for i, (name, count) in enumerate(stats["cube"].moyu_counter().most_common(10), 1):
+            report.write(f"<tr><td>{i}</td><td>{name}</td><td>{count}</td></tr>")
+        report.write("</table>")
+        for filename, png in images:
+            report.write(f'<div class="chart"><img src="{report.image(png, filename)}"></div>')
+        report.write("</div></body></html>")
+
+
+def run(csv_path, args, work_dir):
+    from moyu_tokenizer import Tokenizer, initialize_jieba
+    from moyu_render import ChartRenderer
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    config = moyu_analyzer.Config(result_dir=os.path.join(work_dir, "results"), font_path=args.font,
+                                  workers=args.workers, use_columnar_cache=False, use_token_cache=False)
+    columns = config.columns
+    work_calendar = WorkCalendar(config.timezone, config.work_hours)
+    results = {}
+    counts = {}
+
+    def record(name, runs, items=None, unit="条"):
+        results[name] = {"seconds": min(runs), "runs": runs}
+        if items:
+            results[name]["items"] = items
+            results[name]["items_per_second"] = items / min(runs)
+        print(f"{name:<12} {min(runs):>9.3f} 秒" + (f"  {items / min(runs):>14,.1f} {unit}/秒" if items else ""))
+
+    runs, rows = timed(lambda: list(iter_columns(csv_path, (columns[0], columns[2], columns[1]))), args.repeat)
+    counts["rows"] = len(rows)
+    record("parse", runs, len(rows))
+
+    def filter_rows():
+        return [(t, moyu_analyzer.clean_nickname(n), m) for t, n, m in rows if moyu_analyzer.is_valid_message(m)]
+
+    runs, valid = timed(lambda: (moyu_analyzer.clean_nickname.cache_clear(), filter_rows())[1], args.repeat)
+    counts["valid_messages"] = len(valid)
+    record("filter", runs, len(rows))
+
+    def aggregate():
+        moyu_analyzer.clean_nickname.cache_clear()
+        return moyu_analyzer.update_stats_rows(moyu_analyzer.new_stats(work_calendar), rows, work_calendar)
+
+    runs, stats = timed(aggregate, args.repeat)
+    counts["work_messages"] = stats["cube"].work_message_count()
+    record("aggregate", runs, len(rows))
+
+    start = time.perf_counter()
+    initialize_jieba()
+    record("jieba_init", [time.perf_counter() - start])
+
+    user_messages = stats["user_messages"]
+    names = [name for name, msgs in user_messages.items() for _ in msgs]
+    messages = [msg for msgs in user_messages.values() for msg in msgs]
+    with Tokenizer(moyu_analyzer.stop_words, args.workers) as tokenizer:
+        runs, user_word_counters = timed(lambda: tokenizer.count_user_words(messages, names), args.repeat)
+    stats["user_word_counters"] = user_word_counters
+    counts["tokens"] = sum(sum(counter.values()) for counter in user_word_counters.values())
+    record("tokenize", runs, len(messages))
+
+    plt.rcParams['font.sans-serif'] = ['Microsoft YaHei']
+    plt.rcParams['axes.unicode_minus'] = False
+    with ChartRenderer(args.workers) as renderer:
+        runs, images = timed(lambda: render_all(stats, config, renderer), args.repeat)
+    record("render", runs, len(images), "张")
+
+    os.makedirs(config.result_dir, exist_ok=True)
+    report_path = os.path.join(config.result_dir, "bench_report.html")
+    runs, _ = timed(lambda: write_report(report_path, stats, images, config.embed_images), args.repeat)
+    record("report", runs)
+
+    def analyze():
+        shutil.rmtree(config.result_dir, ignore_errors=True)
+        with open(os.devnull, "w", encoding="utf-8") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                moyu_analyzer.analyze(csv_path, config)
+            finally:
+                sys.stdout = stdout
+
+    runs, _ = timed(analyze, args.repeat)
+    record("analyze", runs, len(rows))
+    return results, counts
+
+
+def compare(old_path, results):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    print(f"\n与 {old_path}（提交 {old.get('commit')}）比较：")
+    for name in phases:
+        if name in results and name in old["phases"]:
+            before, after = old["phases"][name]["seconds"], results[name]["seconds"]
+            print(f"{name:<12} {before:>9.3f} -> {after:>9.3f} 秒  {before / after:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分阶段基准测试")
+    parser.add_argument("csv", nargs="?", help="导出的CSV文件，不指定时生成模拟数据")
+    parser.add_argument("--rows", type=int, default=100000, help="生成模拟数据时的消息条数")
+    parser.add_argument("--seed", type=int, default=1, help="生成模拟数据时的随机数种子")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段的重复次数，取最快的一次")
+    parser.add_argument("--workers", type=int, default=1, help="分词和渲染使用的进程数")
+    parser.add_argument("--font", default=moyu_analyzer.font_path, help="词云使用的中文字体文件")
+    parser.add_argument("--json", help="结果保存的路径，默认为 benchmarks/results/phases-<提交>.json")
+    parser.add_argument("--compare", help="与之前保存的结果比较")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="moyu_bench_")
+    try:
+        csv_path = args.csv
+        if csv_path is None:
+            csv_path = os.path.join(work_dir, "synthetic.csv")
+            generate(csv_path, args.rows, seed=args.seed)
+        results, counts = run(csv_path, args, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    commit = git_commit()
+    output = {
+        "commit": commit,
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "input": os.path.abspath(args.csv) if args.csv else {"synthetic_rows": args.rows, "seed": args.seed},
+        "repeat": args.repeat,
+        "workers": args.workers,
+        "counts": counts,
+        "phases": results,
+    }
+    json_path = args.json or os.path.join(root, "benchmarks", "results", f"phases-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {json_path}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+启动耗时基准测试：每一项都在新的Python进程中运行，取最快的一次（秒）
+
+- 导入 moyu_analyzer（重型库延迟导入后不再加载 matplotlib、pandas、jieba）
+- 导入 matplotlib.pyplot / pandas / jieba 各自的耗时，作为对比
+- jieba 词典加载：没有缓存时解析词典文件；有缓存时对比 jieba.initialize() 与
+  moyu_tokenizer.initialize_jieba() 加载 --jieba-cache-dir 中的序列化词典
+- 指定CSV文件时，再测量 moyu_analyzer.py --stats-only 的总耗时
+
+用法：
+    python benchmarks/bench_startup.py [导出的CSV文件] [--repeat 3]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def run_best(args, repeat, prepare=None):
+    best = None
+    for _ in range(repeat):
+        if prepare is not None:
+            prepare()
+        start = time.perf_counter()
+        subprocess.run(args, cwd=root, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report(name, seconds):
+    print(f"{name:<32} {seconds:>8.3f} 秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("csv", nargs="?", help="导出的CSV文件，指定时测量 --stats-only 的总耗时")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快的一次")
+    args = parser.parse_args()
+
+    python = sys.executable
+    report("python 空进程", run_best([python, "-c", "pass"], args.repeat))
+    report("import moyu_analyzer", run_best([python, "-c", "import moyu_analyzer"], args.repeat))
+    for module in ("matplotlib.pyplot", "pandas", "jieba"):
+        report(f"import {module}", run_best([python, "-c", f"import {module}"], args.repeat))
+
+    # 每次运行前清空缓存目录，测量解析词典文件的耗时；不清空时测量加载序列化缓存的耗时
+    cache_dir = tempfile.mkdtemp(prefix="jieba_cache_")
+    setup = f"import jieba, moyu_tokenizer; moyu_tokenizer.use_dictionary_cache({cache_dir!r}); "
+    try:
+        def clear():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        report("jieba 词典加载（无缓存）",
+               run_best([python, "-c", setup + "moyu_tokenizer.initialize_jieba()"], args.repeat, prepare=clear))
+        report("jieba.initialize()（复用缓存）",
+               run_best([python, "-c", setup + "jieba.initialize()"], args.repeat))
+        report("initialize_jieba()（复用缓存）",
+               run_best([python, "-c", setup + "moyu_tokenizer.initialize_jieba()"], args.repeat))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if args.csv:
+        csv_path = os.path.abspath(args.csv)
+        # 结果（moyu_timings.json 等）写入临时目录，不在仓库中留下 moyu_results
+        result_dir = tempfile.mkdtemp(prefix="moyu_results_")
+        try:
+            report("moyu_analyzer.py --stats-only",
+                   run_best([python, "moyu_analyzer.py", csv_path, "--stats-only", "-o", result_dir], args.repeat))
+        finally:
+            shutil.rmtree(result_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
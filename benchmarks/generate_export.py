@@ -0,0 +1,174 @@
+"""
+生成模拟的微信群聊导出CSV，列的布局与真实导出文件相同（第5列 CreateTime、第7列 StrContent、第10列 NickName），
+用于基准测试和在没有真实聊天记录时试用分析工具。
+
+内容尽量接近真实的群聊：
+- 发言量按用户大致服从Zipf分布，工作日白天更活跃，夜间和周末较少
+- 昵称包含表情符号和特殊字符，中文消息带有标点、表情、@提及，少量多行消息和带引号的消息
+- 图片、表情、链接等消息的内容为XML，另有撤回、拍一拍等系统消息和内容为空的语音消息
+
+用法：
+    python benchmarks/generate_export.py 输出的CSV文件 --rows 1000000 [--users 200] [--days 365] [--seed 1]
+"""
+import argparse
+import csv
+import datetime
+import random
+
+columns = ["localId", "TalkerId", "Type", "SubType", "IsSender", "CreateTime", "Status", "StrContent",
+           "StrTime", "Remark", "NickName", "Sender"]
+
+# 生成的时间按北京时间计算活跃程度
+utc_offset = 8 * 3600
+
+# 每个小时的相对活跃程度（工作日）；周末整体乘以 weekend_activity
+hour_activity = [1, 0.5, 0.3, 0.2, 0.2, 0.3, 0.8, 2, 4, 8, 10, 10,
+                 9, 8, 10, 10, 9, 8, 6, 5, 5, 5, 4, 2]
+weekend_activity = 0.4
+
+# 各类消息的比例：文本、图片、表情、链接/小程序、语音（内容为空）、撤回、拍一拍
+message_kinds = [("text", 0.78), ("image", 0.07), ("sticker", 0.05), ("app", 0.03),
+                 ("voice", 0.02), ("recall", 0.03), ("pat", 0.02)]
+
+surnames = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何林罗高"
+given_names = "伟芳娜敏静丽强磊军洋勇艳杰涛明超秀霞平刚桂英华玉萍红娟鹏飞宇浩然子轩欣怡"
+english_names = ["Alice", "Bob", "Tony", "Kevin", "Lucy", "Jack", "Coco", "Leo", "Mia", "Sam"]
+decorations = ["😀", "🐟", "🌙", "✨", "🍵", "(^_^)", "～", "★", "🐱", "🔥"]
+
+topic_words = ["摸鱼", "老板", "需求", "加班", "开会", "周报", "午饭", "外卖", "咖啡", "奶茶", "代码", "上线",
+               "测试", "产品经理", "项目", "周末", "爬山", "电影", "游戏", "股票", "基金", "房价", "地铁",
+               "下班", "打卡", "年终奖", "涨薪", "跳槽", "面试", "健身", "减肥", "火锅", "烧烤", "旅游",
+               "高铁", "机票", "天气", "下雨", "空调", "快递", "双十一", "孩子", "学校", "考试", "手机",
+               "电脑", "键盘", "显示器", "Python", "bug", "服务器", "数据库", "接口", "文档", "方案"]
+filler_words = ["今天", "真的", "有点", "好像", "感觉", "我们", "大家", "一起", "已经", "还是", "怎么",
+                "为什么", "现在", "明天", "刚才", "就是", "可以", "不行", "太", "又", "也", "都", "去",
+                "吃", "看", "想", "要", "说", "做", "搞", "等", "哈哈哈", "笑死", "离谱", "绝了"]
+endings = ["", "", "", "。", "！", "？", "～", "吗", "啊", "吧", "呢", "哈哈", "😂", "[旺柴]", "[捂脸]", "👍"]
+
+
+def make_nicknames(count, rng):
+    names = set()
+    while len(names) < count:
+        r = rng.random()
+        if r < 0.15:
+            name = rng.choice(english_names) + str(rng.randint(1, 99))
+        else:
+            name = rng.choice(surnames) + "".join(rng.choice(given_names) for _ in range(rng.randint(1, 2)))
+        if rng.random() < 0.3:
+            name += rng.choice(decorations)
+        names.add(name)
+    return sorted(names)
+
+
+def make_text(nicknames, rng):
+    words = [rng.choice(topic_words if rng.random() < 0.45 else filler_words) for _ in range(rng.randint(2, 12))]
+    text = "".join(words) + rng.choice(endings)
+    r = rng.random()
+    if r < 0.05:
+        text = "@" + rng.choice(nicknames) + " " + text
+    elif r < 0.08:
+        text += "\n" + "".join(rng.choice(filler_words + topic_words) for _ in range(rng.randint(2, 6)))
+    elif r < 0.10:
+        text = f'他说"{text}"'
+    return text
+
+
+def make_xml(kind, rng):
+    md5 = "%032x" % rng.getrandbits(128)
+    aeskey = "%032x" % rng.getrandbits(128)
+    if kind == "image":
+        return (f'<?xml version="1.0"?><msg><img aeskey="{aeskey}" encryver="1" cdnthumbaeskey="{aeskey}" '
+                f'cdnthumburl="3057020100044b3049020100" cdnthumblength="{rng.randint(2000, 9000)}" '
+                f'cdnthumbheight="120" cdnthumbwidth="90" length="{rng.randint(20000, 900000)}" '
+                f'md5="{md5}" hdlength="{rng.randint(100000, 2000000)}" /></msg>')
+    if kind == "sticker":
+        return (f'<msg><emoji fromusername="wxid_{rng.getrandbits(40):x}" type="2" md5="{md5}" '
+                f'len="{rng.randint(1000, 90000)}" productid="" androidmd5="{md5}" width="240" height="240" '
+                f'cdnurl="http://wxapp.tc.qq.com/262/20304/stodownload?m={md5}" /></msg>')
+    title = rng.choice(topic_words) + rng.choice(["攻略", "新闻", "教程", "分享", "小程序"])
+    return (f'<?xml version="1.0"?><msg><appmsg appid="" sdkver="0"><title>{title}</title>'
+            f'<url>https://mp.weixin.qq.com/s/{md5}</url><thumburl>https://example.com/{md5}.jpg</thumburl>'
+            f'</appmsg><platform>android</platform><version>1</version></msg>')
+
+
+def make_message(nickname, nicknames, rng):
+    """
+    返回 (Type, SubType, StrContent, NickName)
+    """
+    r = rng.random()
+    for kind, ratio in message_kinds:
+        r -= ratio
+        if r < 0:
+            break
+    if kind == "text":
+        return 1, 0, make_text(nicknames, rng), nickname
+    if kind == "image":
+        return 3, 0, make_xml(kind, rng), nickname
+    if kind == "sticker":
+        return 47, 0, make_xml(kind, rng), nickname
+    if kind == "app":
+        return 49, 5, make_xml(kind, rng), nickname
+    if kind == "voice":
+        return 34, 0, "", nickname
+    if kind == "recall":
+        return 10000, 0, f'"{nickname}" 撤回了一条消息', ""
+    return 10000, 0, f'"{nickname}" 拍了拍 "{rng.choice(nicknames)}"', ""
+
+
+def generate(path, rows, users=200, days=365, seed=1, start_date="2023-01-01", bytes_extra=0):
+    """
+    生成 rows 行消息写入 path。bytes_extra 大于0时在末尾增加一个 BytesExtra 列，
+    每行包含 bytes_extra 个十六进制字符（模拟带有大段无关列的导出文件）
+    """
+    rng = random.Random(seed)
+    nicknames = make_nicknames(users, rng)
+    sender_ids = {name: f"wxid_{i:06d}" for i, name in enumerate(nicknames)}
+    # 发言量服从Zipf分布：第k个用户的权重为 1/k
+    weights = [1 / (k + 1) for k in range(users)]
+    speakers = rng.choices(nicknames, weights, k=min(rows, 100000))
+
+    start = datetime.datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
+    timestamp = start.timestamp() - utc_offset
+    # 平均活跃程度下每秒的消息数，使消息大致均匀地分布在 days 天中
+    mean_activity = sum(hour_activity) / 24 * (5 + 2 * weekend_activity) / 7
+    base_rate = rows / (days * 86400) / mean_activity
+
+    header = columns + (["BytesExtra"] if bytes_extra else [])
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(rows):
+            local = int(timestamp) + utc_offset
+            activity = hour_activity[local // 3600 % 24]
+            if (local // 86400 + 3) % 7 >= 5:  # 1970-01-01 是周四
+                activity *= weekend_activity
+            timestamp += rng.expovariate(base_rate * activity)
+
+            created = int(timestamp)
+            nickname = speakers[i % len(speakers)]
+            msg_type, sub_type, content, sender_name = make_message(nickname, nicknames, rng)
+            is_sender = 1 if nickname == nicknames[0] and msg_type != 10000 else 0
+            str_time = datetime.datetime.fromtimestamp(created + utc_offset, datetime.timezone.utc)
+            row = [i + 1, 1, msg_type, sub_type, is_sender, created, 2, content,
+                   str_time.strftime("%Y-%m-%d %H:%M:%S"), "", sender_name, sender_ids[nickname]]
+            if bytes_extra:
+                row.append("%0*x" % (bytes_extra, rng.getrandbits(bytes_extra * 4)))
+            writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成模拟的微信群聊导出CSV")
+    parser.add_argument("output", help="输出的CSV文件")
+    parser.add_argument("--rows", type=int, default=100000, help="消息条数")
+    parser.add_argument("--users", type=int, default=200, help="群成员数")
+    parser.add_argument("--days", type=int, default=365, help="消息大致覆盖的天数")
+    parser.add_argument("--seed", type=int, default=1, help="随机数种子，相同的参数和种子生成相同的文件")
+    parser.add_argument("--start-date", default="2023-01-01", help="第一条消息的日期")
+    parser.add_argument("--bytes-extra", type=int, default=0,
+                        help="在末尾增加 BytesExtra 列，每行包含的十六进制字符数")
+    args = parser.parse_args()
+    generate(args.output, args.rows, args.users, args.days, args.seed, args.start_date, args.bytes_extra)
+
+
+if __name__ == "__main__":
+    main()
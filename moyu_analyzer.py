@@ -1,18 +1,30 @@
+import argparse
 import csv
 import datetime
+import functools
+import hashlib
+import pickle
+import sys
 from collections import Counter
-import matplotlib.pyplot as plt
-from matplotlib.font_manager import FontProperties
-import jieba
-from wordcloud import WordCloud
+from concurrent.futures import ProcessPoolExecutor
 import re
 import numpy as np
-import pandas as pd
-from matplotlib.ticker import FuncFormatter
 import os
-import base64
-from io import BytesIO
-from matplotlib.patches import Patch
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from moyu_calendar import WorkCalendar, day_number, period_ranges
+from moyu_columnar import missing_timestamp, open_export, parse_timestamp
+from moyu_csv import iter_columns, row_boundaries
+from moyu_cube import CountCube
+from moyu_sketch import SpaceSaving
+from moyu_timing import PhaseTimer
+
+# matplotlib、wordcloud、pandas 和 jieba 的导入耗时较长，只在用到它们的函数中导入，
+# 只输出排行榜（--stats-only）时程序启动不需要加载这些库
+
+# 以下为默认配置，可以通过命令行参数或 Config(...) 覆盖
+
+# 要分析的聊天记录CSV文件
+input_file = "bj.csv"
 
 # 重点用户列表（可配置）
 key_users = []  # 请替换为您想要重点关注的用户昵称
@@ -20,15 +32,192 @@ key_users = []  # 请替换为您想要重点关注的用户昵称
 # 需要详细分析topn个用户的消息
 topn_users = 3
 
-# 创建结果目录
+# 结果目录
 result_dir = "moyu_results"
-if not os.path.exists(result_dir):
-    os.makedirs(result_dir)
+
+# jieba分词和图表渲染使用的进程数，1 表示不使用进程池（可通过 --workers 参数覆盖）
+workers = 1
+
+# 是否使用持久化的分词缓存（保存在结果目录下），重复运行时只对新消息分词
+use_token_cache = True
+token_cache_file = "token_cache.sqlite3"
+
+# 是否使用CSV旁边的二进制列式缓存（<文件名>.moyu 目录），CSV未变化时无需重新解析
+use_columnar_cache = True
+
+# CSV读取方式："csv" 使用标准库 csv.reader；"mmap" 以内存映射方式只提取需要的列，
+# 不解码其余的列，导出文件带有大段的无关列（BytesExtra、XML等）时更快，两种方式结果一致
+csv_reader = "csv"
+
+# 词云渲染预算：最多显示的词数、画布大小（像素）和缩放比例（scale 为2时输出两倍分辨率的图片）。
+# 每个词云的耗时主要取决于词数和画布面积；wordcloud_preview 为 True 时使用快速的低分辨率预览（可通过 --preview 参数启用）
+wordcloud_max_words = 200
+wordcloud_width = 800
+wordcloud_height = 400
+wordcloud_scale = 1
+wordcloud_preview = False
+
+# 报告中的图片是否以base64内嵌，False 时以相对路径引用结果目录中的PNG文件（可通过 --link-images 参数设为 False）
+embed_images = True
+
+# 工作时间：周一至周五的 work_start_hour 点到 work_end_hour 点（不含）
+work_start_hour = 9
+work_end_hour = 18
+
+# 词云使用的字体（需要支持中文），默认使用微软雅黑
+font_path = "C:\\Windows\\Fonts\\msyh.ttc"
+
+# jieba序列化词典缓存所在的目录，None 表示使用jieba的默认位置（系统临时目录，可能被定期清理）。
+# 缓存存在时jieba直接加载，不需要重新解析词典文件
+jieba_cache_dir = None
+
+# 时区（IANA时区名，例如 "Asia/Shanghai"），None 表示使用本机时区（可通过 --timezone 参数覆盖）
+timezone = None
+
+# 增量分析时保存统计状态的文件（位于结果目录下，可通过 --incremental 参数启用增量分析）
+state_file = "moyu_state.pkl"
+
+# 数据读取方式："loop" 逐行解析（原始实现），"vectorized" 使用pandas/NumPy按列批量计算，
+# "stream" 分块读取并即时分词，不保存消息原文，适合内存放不下的超大导出文件
+ingest_mode = "loop"
+
+# 流式模式下每次读取的行数
+chunk_size = 100000
+
+# 统计数据的来源："memory" 每次读取导出文件在内存中统计，"sqlite" 先把导出文件导入结果目录下的SQLite消息库
+# （见 moyu_store.py，数据文件没有变化时直接使用），排行榜、时间分布和词频由消息库的聚合查询得到
+backend = "memory"
+
+# 分片统计时保存各分片统计结果的目录（位于结果目录下），见 --shard / --shards 参数
+shard_dir = "shards"
+
+# 按周/按月滚动排行（--rolling 参数）显示最近的周期数，以及每个周期显示的人数
+rolling_periods = 12
+rolling_top_users = 3
+
+# 近似词频（可通过 --approximate-words 参数启用）：用 Space-Saving 摘要只跟踪全部摸鱼内容中最常见的 word_sketch_size 个词
+# 和每个用户最常见的 user_word_sketch_size 个词，内存占用固定，不随词汇量增长；计数可能偏高，偏高的上限随结果一起输出
+approximate_words = False
+word_sketch_size = 10000
+user_word_sketch_size = 1000
+
+# 各阶段的耗时、CPU时间、峰值内存和处理的行数/词数，每次分析后保存在结果目录下
+timings_file = "moyu_timings.json"
+
+# cProfile 的统计结果（位于结果目录下，可通过 --profile 参数启用，用 python -m pstats 或 snakeviz 查看）
+profile_file = "moyu_profile.prof"
+
+# CSV列索引（根据您的CSV文件结构）
+time_index = 5  # CreateTime列
+msg_index = 7  # StrContent列
+nickname_index = 10  # NickName列
+
+# 常见XML属性关键字，包含这些关键字的消息视为系统消息
+xml_keywords = ["xml", "cdn", "aeskey", "thumburl", "imgurl", "signature", 
+               "platform", "version", "length", "md5", "encryver", "hdwidth", 
+               "hdheight", "thumbwidth", "thumbheight"]
+
+# XML标签、撤回消息和XML属性关键字合并成一个预编译的正则，每条消息只需转小写并扫描一次
+invalid_message_pattern = re.compile("|".join(["<", ">", "撤回"] + [re.escape(keyword) for keyword in xml_keywords]))
+
+# 昵称中需要移除的表情符号和特殊字符
+nickname_pattern = re.compile(r'[^\u4e00-\u9fa5a-zA-Z0-9.,，。、？！]')
+
+
+
+class AnalysisError(Exception):
+    """
+    分析过程中无法继续的错误（例如CSV文件无法读取），命令行入口捕获后打印并以非零状态退出
+    """
+
+
+class Config:
+    """
+    一次分析使用的配置。未指定的配置项取上面的模块级默认值，例如
+    Config(key_users=["张三"], result_dir="out", work_hours=(10, 19))
+    """
+
+    def __init__(self, **options):
+        self.key_users = list(key_users)
+        self.topn_users = topn_users
+        self.result_dir = result_dir
+        self.workers = workers
+        self.use_token_cache = use_token_cache
+        self.token_cache_file = token_cache_file
+        self.use_columnar_cache = use_columnar_cache
+        self.csv_reader = csv_reader
+        self.wordcloud_max_words = wordcloud_max_words
+        self.wordcloud_width = wordcloud_width
+        self.wordcloud_height = wordcloud_height
+        self.wordcloud_scale = wordcloud_scale
+        self.wordcloud_preview = wordcloud_preview
+        self.embed_images = embed_images
+        self.work_hours = (work_start_hour, work_end_hour)
+        self.font_path = font_path
+        self.jieba_cache_dir = jieba_cache_dir
+        self.stats_only = False
+        self.shards = 1
+        self.shard_dir = shard_dir
+        self.timings_file = timings_file
+        self.profile = False
+        self.profile_file = profile_file
+        self.date_from = None  # 只看某个日期范围的排行："YYYY-MM-DD"，None 表示不限
+        self.date_to = None
+        self.rolling = None  # "week" 或 "month"：按自然周/自然月滚动排行
+        self.rolling_periods = rolling_periods
+        self.rolling_top_users = rolling_top_users
+        self.approximate_words = approximate_words
+        self.word_sketch_size = word_sketch_size
+        self.user_word_sketch_size = user_word_sketch_size
+        self.timezone = timezone
+        self.incremental = False
+        self.state_file = state_file
+        self.ingest_mode = ingest_mode
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.time_index = time_index
+        self.msg_index = msg_index
+        self.nickname_index = nickname_index
+        for name, value in options.items():
+            if not hasattr(self, name):
+                raise TypeError(f"未知的配置项: {name}")
+            setattr(self, name, value)
+
+    @property
+    def columns(self):
+        # 需要读取的 (时间戳, 消息内容, 昵称) 列索引
+        return self.time_index, self.msg_index, self.nickname_index
+
+
+class Result:
+    """
+    analyze() 的返回值：统计数据、排行榜、词频以及报告的保存路径。
+    只输出排行榜（stats_only）时词频和报告路径为 None
+    """
+
+    def __init__(self, stats, total_work_days, ranking, extended_ranking, word_counter, user_word_counters,
+                 report_path, timings=None, date_range=None, rolling=None, word_error=None, user_word_errors=None):
+        self.stats = stats
+        self.total_work_days = total_work_days
+        self.ranking = ranking  # 摸鱼排行前10名 [(昵称, 工作时间消息数)]
+        self.extended_ranking = extended_ranking  # 前10名加上不在前10名的重点用户
+        self.word_counter = word_counter
+        self.user_word_counters = user_word_counters
+        self.report_path = report_path
+        self.timings = timings  # 各阶段的耗时，与 moyu_timings.json 的内容相同
+        self.date_range = date_range  # 指定日期范围时该范围内的排行，见 date_range_ranking()
+        self.rolling = rolling  # 指定滚动周期时各周期的排行，见 rolling_rankings()
+        # 近似词频时词频计数可能偏高的上限（全部内容 / 每个用户），精确词频时为 None
+        self.word_error = word_error
+        self.user_word_errors = user_word_errors
+
 
 # 处理昵称中的表情符号
+# 同一批发言者会重复出现数百万次，清洗结果直接缓存
+@functools.lru_cache(maxsize=None)
 def clean_nickname(nickname):
     # 移除表情符号和特殊字符
-    return re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9.,，。、？！]', '', nickname)
+    return nickname_pattern.sub('', nickname)
 
 # 检查消息是否为有效的文本消息（非系统消息、非XML内容）
 def is_valid_message(msg):
@@ -36,56 +225,15 @@ def is_valid_message(msg):
     检查消息是否为有效的文本消息（非系统消息、非XML内容）
     """
     # 过滤空消息
-    if not msg or msg.strip() == "":
-        return False
-    
-    # 过滤包含XML标签的消息
-    if "<" in msg or ">" in msg:
+    if not msg or msg.isspace():
         return False
     
-    # 过滤撤回消息
-    if "撤回" in msg:
-        return False
-    
-    # 过滤包含常见XML属性的消息
-    xml_keywords = ["xml", "cdn", "aeskey", "thumburl", "imgurl", "signature", 
-                   "platform", "version", "length", "md5", "encryver", "hdwidth", 
-                   "hdheight", "thumbwidth", "thumbheight"]
-    
-    for keyword in xml_keywords:
-        if keyword in msg.lower():
-            return False
-    
-    return True
+    # 过滤包含XML标签、撤回提示或常见XML属性的消息
+    return invalid_message_pattern.search(msg.lower()) is None
 
-# 定义工作时间（周一至周五，上午9点到下午6点）
-def is_work_time(timestamp, nickname=None):
-    try:
-        # 如果是重点用户，也统计非工作时间的消息
-        # if nickname in key_users:
-        #     return True
-            
-        # 转换Unix时间戳为datetime对象
-        dt = datetime.datetime.fromtimestamp(int(timestamp))
-        # 检查是否为工作日（0=周一，6=周日）
-        if dt.weekday() >= 5:  # 周末
-            return False
-        # 检查是否在工作时间内（9:00-18:00）
-        if 9 <= dt.hour < 18:
-            return True
-        return False
-    except Exception as e:
-        print(f"时间解析错误: {e}, 时间戳: {timestamp}")
-        return False
-
-# 将图表保存为base64编码，用于嵌入HTML
-def fig_to_base64(fig):
-    buf = BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    img_str = base64.b64encode(buf.read()).decode('utf-8')
-    buf.close()
-    return img_str
+# 工作日名称，星期 0=周一
+weekday_names = ['周一', '周二', '周三', '周四', '周五']
+all_weekday_names = weekday_names + ['周六', '周日']
 
 # 定义停用词集合
 stop_words = set([
@@ -113,713 +261,1542 @@ stop_words = set([
     '10', '两个', '不了', '只有', '不好', '只能', '一年', '几个'
 ])
 
-# 初始化HTML内容
-html_content = """
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>微信群摸鱼排行榜分析报告</title>
-    <style>
-        body {
-            font-family: 'Microsoft YaHei', Arial, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background-color: #f5f5f5;
-            color: #333;
-        }
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            background-color: white;
-            padding: 20px;
-            box-shadow: 0 0 10px rgba(0,0,0,0.1);
-            border-radius: 5px;
-        }
-        h1, h2, h3 {
-            color: #2c3e50;
-        }
-        h1 {
-            text-align: center;
-            padding-bottom: 10px;
-            border-bottom: 2px solid #3498db;
-            margin-bottom: 30px;
-        }
-        .section {
-            margin-bottom: 40px;
-            padding-bottom: 20px;
-            border-bottom: 1px solid #eee;
-        }
-        .chart {
-            text-align: center;
-            margin: 20px 0;
-        }
-        .chart img {
-            max-width: 100%;
-            height: auto;
-            border: 1px solid #ddd;
-            border-radius: 4px;
-            padding: 5px;
-            background-color: white;
-        }
-        table {
-            width: 100%;
-            border-collapse: collapse;
-            margin: 20px 0;
-        }
-        th, td {
-            padding: 12px 15px;
-            text-align: left;
-            border-bottom: 1px solid #ddd;
-        }
-        th {
-            background-color: #3498db;
-            color: white;
-        }
-        tr:nth-child(even) {
-            background-color: #f2f2f2;
-        }
-        .highlight {
-            background-color: #ffffcc;
-            font-weight: bold;
-        }
-        .footer {
-            text-align: center;
-            margin-top: 30px;
-            color: #7f8c8d;
-            font-size: 0.9em;
-        }
-        .key-user {
-            background-color: #e8f8f5;
-            font-weight: bold;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>微信群摸鱼排行榜分析报告</h1>
-"""
-
-# 存储用户摸鱼数据
-moyu_counter = Counter()
-user_hour_stats = {}  # 用户在不同时间段的发言数量
-user_weekday_stats = {}  # 用户在不同工作日的发言数量
-user_messages = {}  # 存储用户的消息内容
-work_days = set()  # 记录工作日天数
-hour_counter = Counter()  # 时间段分布
-weekday_counter = Counter()  # 工作日分布
-moyu_content = []  # 所有摸鱼内容
-
-# 读取CSV文件
-try:
-    with open("bj.csv", "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        header = next(reader, None)  # 假设第一行是表头
-        
-        # 确定列索引（根据您的CSV文件结构）
-        time_index = 5  # CreateTime列
-        nickname_index = 10  # NickName列
-        msg_index = 7  # StrContent列
-        
-        for row in reader:
-            if len(row) <= max(time_index, nickname_index, msg_index):
-                continue  # 跳过格式不正确的行
-                
-            timestamp = row[time_index]
-            nickname = clean_nickname(row[nickname_index])
-            msg = row[msg_index]
-            
-            # 使用更严格的消息过滤条件
-            if not is_valid_message(msg):
-                continue
-            
-            try:
-                dt = datetime.datetime.fromtimestamp(int(timestamp))
-                
-                # 记录工作日
-                if dt.weekday() < 5:  # 工作日
-                    work_days.add(dt.strftime("%Y-%m-%d"))
-                    
-                    # 统计工作日分布
-                    weekday_counter[dt.weekday()] += 1
-                
-                # 统计时间分布
-                hour_counter[dt.hour] += 1
-                
-                # 检查是否在工作时间发言
-                if is_work_time(timestamp, nickname):
-                    moyu_counter[nickname] += 1
-                    moyu_content.append(msg)
-                    
-                    # 初始化用户数据结构
-                    if nickname not in user_hour_stats:
-                        user_hour_stats[nickname] = Counter()
-                    if nickname not in user_weekday_stats:
-                        user_weekday_stats[nickname] = Counter()
-                    if nickname not in user_messages:
-                        user_messages[nickname] = []
-                    
-                    # 统计用户在不同时间段的发言
-                    user_hour_stats[nickname][dt.hour] += 1
-                    
-                    # 统计用户在不同工作日的发言
-                    user_weekday_stats[nickname][dt.weekday()] += 1
-                    
-                    # 存储用户消息
-                    user_messages[nickname].append(msg)
-            except:
-                continue
-except Exception as e:
-    print(f"读取CSV文件时出错: {e}")
-    exit(1)
-
-# 计算总工作日数
-total_work_days = len(work_days)
-print(f"\n数据集中共有 {total_work_days} 个工作日")
-
-# 获取摸鱼排行前10名
-top_moyu = moyu_counter.most_common(10)
-# 打印结果
-print("\n摸鱼排行榜前10名:")
-for i, (name, count) in enumerate(top_moyu, 1):
-    avg_per_day = count / total_work_days if total_work_days > 0 else 0
-    print(f"{i}. {name}: {count}条工作时间消息 (平均每天 {avg_per_day:.2f}条)")
-
-# 处理重点用户
-# 获取前10名用户名列表
-top10_names = [name for name, _ in top_moyu]
-
-# 创建扩展排行榜，包含前10名和不在前10名的重点用户
-extended_ranking = list(top_moyu)
-key_users_not_in_top10 = []
-
-# 添加不在前10名的重点用户
-for user in key_users:
-    if user in moyu_counter and user not in top10_names:
-        key_users_not_in_top10.append((user, moyu_counter[user]))
-
-# 将不在前10名的重点用户添加到扩展排行榜
-extended_ranking.extend(key_users_not_in_top10)
-
-# 打印重点用户信息
-if key_users_not_in_top10:
-    print("\n不在前10名的重点用户:")
-    for name, count in key_users_not_in_top10:
-        avg_per_day = count / total_work_days if total_work_days > 0 else 0
-        print(f"{name}: {count}条工作时间消息 (平均每天 {avg_per_day:.2f}条)")
 
-# 添加基本信息到HTML
-html_content += f"""
-    <div class="section">
-        <h2>基本统计信息</h2>
-        <p>数据集中共有 <span class="highlight">{total_work_days}</span> 个工作日</p>
-        
-        <h3>摸鱼排行榜</h3>
-        <table>
-            <tr>
-                <th>排名</th>
-                <th>昵称</th>
-                <th>工作时间消息数</th>
-                <th>平均每天消息数</th>
-                <th>备注</th>
-            </tr>
-"""
-
-# 添加排行榜到HTML
-for i, (name, count) in enumerate(extended_ranking, 1):
-    avg_per_day = count / total_work_days if total_work_days > 0 else 0
-    is_key_user = name in key_users
-    row_class = 'class="key-user"' if is_key_user else ''
-    note = "重点关注用户" if is_key_user else ""
-    
-    html_content += f"""
-            <tr {row_class}>
-                <td>{i}</td>
-                <td>{name}</td>
-                <td>{count}</td>
-                <td>{avg_per_day:.2f}</td>
-                <td>{note}</td>
-            </tr>
-    """
+# 统计数据结构的版本，结构变化后已保存的增量状态和分片统计结果不再使用
+stats_format = "cube-1"
 
-html_content += """
-        </table>
-    </div>
-"""
-
-# 设置字体
-font = FontProperties(fname="C:\\Windows\\Fonts\\msyh.ttc")  # 使用微软雅黑字体
-
-# 设置全局字体
-plt.rcParams['font.sans-serif'] = ['Microsoft YaHei']
-plt.rcParams['axes.unicode_minus'] = False
-
-# 1. 可视化摸鱼排行榜
-plt.figure(figsize=(12, 6))
-names = [item[0] for item in extended_ranking]
-counts = [item[1] for item in extended_ranking]
-
-# 创建颜色列表，重点用户使用不同颜色
-colors = ['skyblue' if name not in key_users else 'lightgreen' for name in names]
-
-# 创建横向条形图
-plt.barh(range(len(names)), counts, color=colors)
-plt.yticks(range(len(names)), names)
-plt.xlabel('工作时间消息数量')
-plt.title('微信群摸鱼排行榜')
-
-# 在条形图上显示具体数值
-for i, v in enumerate(counts):
-    plt.text(v + 1, i, str(v), va='center')
-
-# 添加图例
-legend_elements = [
-    Patch(facecolor='skyblue', label='普通用户'),
-    Patch(facecolor='lightgreen', label='重点关注用户')
-]
-plt.legend(handles=legend_elements, loc='lower right')
-
-plt.tight_layout()
-ranking_img = fig_to_base64(plt.gcf())
-plt.savefig(os.path.join(result_dir, "moyu_ranking.png"))
-plt.close()
-
-# 添加排行榜图表到HTML
-html_content += """
-    <div class="section">
-        <h2>摸鱼排行榜</h2>
-        <div class="chart">
-            <img src="data:image/png;base64,""" + ranking_img + """" alt="摸鱼排行榜">
-        </div>
-    </div>
-"""
-
-# 2. 可视化时间分布
-plt.figure(figsize=(12, 6))
-hours = list(range(24))
-counts = [hour_counter[hour] for hour in hours]
-
-plt.bar(hours, counts, color='lightgreen')
-plt.xlabel('小时')
-plt.ylabel('消息数量')
-plt.title('24小时消息分布')
-plt.xticks(hours)
-
-# 标记工作时间区域
-plt.axvspan(9, 18, alpha=0.2, color='red')
-plt.text(13.5, max(counts)*0.9, '工作时间', ha='center')
-
-plt.tight_layout()
-time_dist_img = fig_to_base64(plt.gcf())
-plt.savefig(os.path.join(result_dir, "moyu_time_distribution.png"))
-plt.close()
-
-# 添加时间分布到HTML
-html_content += """
-    <div class="section">
-        <h2>时间分布分析</h2>
-        <div class="chart">
-            <img src="data:image/png;base64,""" + time_dist_img + """" alt="24小时消息分布">
-        </div>
+# 逐行模式每累计这么多条消息，批量写入一次计数立方体
+cube_batch_size = 65536
+
+
+# 近似词频时 (全部内容, 每个用户) 的摘要大小，精确词频时为 None
+def word_sketch_sizes(config):
+    if not config.approximate_words:
+        return None
+    return config.word_sketch_size, config.user_word_sketch_size
+
+# 按配置的时区和工作时间创建 WorkCalendar，时区无效时抛出 AnalysisError
+def make_work_calendar(config):
+    try:
+        return WorkCalendar(config.timezone, config.work_hours)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise AnalysisError(f"无效的时区: {config.timezone}，应为IANA时区名，例如 Asia/Shanghai") from e
+
+# 创建空的统计数据结构，sketch_sizes 为 word_sketch_sizes() 的返回值
+def new_stats(work_calendar, sketch_sizes=None):
+    return {
+        # 用户 × 星期 × 小时 的消息数以及按日的消息数，排行榜、时间分布、工作日分布和热力图都由它得到
+        "cube": CountCube((work_calendar.work_start, work_calendar.work_end)),
+        "user_messages": {},  # 存储用户的消息内容
+        # 用户摸鱼内容词频（Counter，近似词频时为 SpaceSaving 摘要），逐行/向量化模式在读取后分词时才累加
+        "user_word_counters": {},
+        "word_sketch_sizes": sketch_sizes,
+        "word_sketch": None if sketch_sizes is None else SpaceSaving(sketch_sizes[0]),  # 近似词频时全部内容的摘要
+        "max_timestamp": None,  # 已统计消息的最大时间戳（增量分析的高水位线）
+    }
+
+# 把一批消息的用户词频累加到统计结果中，近似词频时累加到固定大小的摘要，这一批的精确词频随后即可丢弃
+def add_user_words(stats, user_word_counters):
+    sizes = stats["word_sketch_sizes"]
+    for name, counter in user_word_counters.items():
+        if sizes is None:
+            stats["user_word_counters"].setdefault(name, Counter()).update(counter)
+        else:
+            stats["user_word_counters"].setdefault(name, SpaceSaving(sizes[1])).update(counter)
+            stats["word_sketch"].update(counter)
+
+# 按消息顺序每 batch_size 条分词一次，累加到统计结果的用户词频中
+def tokenize_user_messages(stats, tokenizer, user_messages, batch_size):
+    names = [name for name, msgs in user_messages.items() for _ in msgs]
+    messages = [msg for msgs in user_messages.values() for msg in msgs]
+    for start in range(0, len(messages), batch_size):
+        add_user_words(stats, tokenizer.count_user_words(messages[start:start + batch_size],
+                                                         names[start:start + batch_size]))
+
+# 逐行返回 (时间戳, 原始昵称, 消息内容)，启用列式缓存时从缓存读取（缓存无法写入时直接读取CSV）
+def iter_rows(path, config):
+    export = open_export(path, config.columns, config.csv_reader) if config.use_columnar_cache else None
+    if export is not None:
+        with export:
+            for timestamps, nicknames, msgs in export.iter_chunks(config.chunk_size):
+                for timestamp, nickname, msg in zip(timestamps.tolist(), nicknames, msgs):
+                    if timestamp != missing_timestamp:  # 无法解析的时间戳与直接读CSV时一样跳过
+                        yield timestamp, nickname, msg
+        return
+
+    # 假设第一行是表头，跳过表头和格式不正确的行
+    time_index, msg_index, nickname_index = config.columns
+    yield from iter_columns(path, (time_index, nickname_index, msg_index), reader=config.csv_reader)
+
+# 逐行统计 rows 中的 (时间戳, 原始昵称, 消息内容)，并累加到 stats 中
+def update_stats_rows(stats, rows, work_calendar):
+    cube = stats["cube"]
+    user_ids = cube.ids
+    user_messages = stats["user_messages"]
+    # 每条消息在立方体中的格子和日序号，攒够一批后再用NumPy一次累加
+    cells = []
+    days = []
+
+    for timestamp, nickname, msg in rows:
+        nickname = clean_nickname(nickname)
+        
+        # 使用更严格的消息过滤条件
+        if not is_valid_message(msg):
+            continue
         
-        <h3>工作时间内的消息分布</h3>
-        <table>
-            <tr>
-                <th>时间段</th>
-                <th>消息数量</th>
-            </tr>
-"""
-
-for hour in range(9, 18):
-    html_content += f"""
-            <tr>
-                <td>{hour}点-{hour+1}点</td>
-                <td>{hour_counter[hour]}</td>
-            </tr>
+        # 只有无法解析或无法换算的时间戳才跳过该行
+        try:
+            timestamp = int(timestamp)
+            day, weekday, hour = work_calendar.calendar(timestamp)
+        except (ValueError, TypeError):
+            continue
+        if stats["max_timestamp"] is None or timestamp > stats["max_timestamp"]:
+            stats["max_timestamp"] = timestamp
+
+        # 记录消息所在的格子（用户、星期、小时）和日期
+        user_id = user_ids.get(nickname)
+        if user_id is None:
+            user_id = cube.intern(nickname)
+        cells.append((user_id * 7 + weekday) * 24 + hour)
+        days.append(day)
+
+        # 检查是否在工作时间发言
+        if work_calendar.is_work_time(weekday, hour):
+            if nickname not in user_messages:
+                user_messages[nickname] = []
+
+            # 存储用户消息
+            user_messages[nickname].append(msg)
+
+        if len(cells) >= cube_batch_size:
+            cube.add_cells(cells, days)
+            cells.clear()
+            days.clear()
+    cube.add_cells(cells, days)
+    return stats
+
+# 逐行读取CSV文件并统计
+def read_stats_loop(path, work_calendar, config):
+    stats = new_stats(work_calendar, word_sketch_sizes(config))
+    return update_stats_rows(stats, iter_rows(path, config), work_calendar)
+
+# 把字符串时间戳列转换为int64数组，结果与逐行模式的 int() 一致，无法解析或超出int64范围的记为 missing_timestamp。
+# 绝大多数时间戳是不超过18位的十进制数字，直接批量转换；其余的（下划线分隔、全角数字、超长的数字等）逐个用 int() 解析
+def parse_timestamp_column(timestamps):
+    simple = timestamps.str.fullmatch(r"\s*[+-]?[0-9]{1,18}\s*").to_numpy(dtype=bool)
+    result = np.full(len(timestamps), missing_timestamp, dtype=np.int64)
+    result[simple] = timestamps[simple].astype(np.int64).to_numpy()
+    if not simple.all():
+        result[~simple] = [parse_timestamp(value) for value in timestamps[~simple].tolist()]
+    return result
+
+# 用pandas/NumPy向量化统计一批数据，并累加到 stats 中
+def update_stats_vectorized(stats, df, work_calendar, tokenizer=None, min_timestamp=None, keep_messages=True,
+                            day_word_counters=None):
+    """
+    df 为只包含时间戳、消息内容、昵称三列的DataFrame（按此顺序）。
+    传入 tokenizer 时不保存消息原文，而是立即分词并累加词频（流式模式），
+    同时传入 day_word_counters（dict）时还按日累加工作时间消息的词频（日序号 -> Counter）；
+    传入 min_timestamp 时只统计时间戳大于它的消息（增量模式）；
+    keep_messages 为 False 时只统计消息数量，也不保存消息原文
+    """
+    import pandas as pd
+
+    timestamps, msgs, nicknames = df.iloc[:, 0], df.iloc[:, 1], df.iloc[:, 2]
+
+    # 向量化的消息过滤，规则与 is_valid_message 相同
+    valid = msgs.str.strip() != ""
+    valid &= ~msgs.str.lower().str.contains(invalid_message_pattern)
+    timestamps, msgs, nicknames = timestamps[valid], msgs[valid], nicknames[valid]
+    # 只保留能被 int() 解析且在int64范围内的时间戳（列式缓存中的时间戳已经是整数）
+    if pd.api.types.is_integer_dtype(timestamps):
+        timestamps = timestamps.to_numpy(dtype=np.int64)
+    else:
+        timestamps = parse_timestamp_column(timestamps)
+    parsed = timestamps != missing_timestamp
+    timestamps, msgs, nicknames = timestamps[parsed], msgs[parsed], nicknames[parsed]
+    if min_timestamp is not None:
+        newer = timestamps > min_timestamp
+        timestamps, msgs, nicknames = timestamps[newer], msgs[newer], nicknames[newer]
+
+    days, weekday, hour, ok = work_calendar.calendar_array(timestamps)
+    days, weekday, hour = days[ok], weekday[ok], hour[ok]
+    msgs, nicknames = msgs[ok], nicknames[ok]
+    if ok.any():
+        chunk_max = int(timestamps[ok].max())
+        if stats["max_timestamp"] is None or chunk_max > stats["max_timestamp"]:
+            stats["max_timestamp"] = chunk_max
+
+    # 昵称只有几百个，逐个清洗、映射为用户id后再映射回每一行
+    cube = stats["cube"]
+    clean_names = {name: clean_nickname(name) for name in nicknames.unique()}
+    user_ids = nicknames.map({name: cube.intern(clean) for name, clean in clean_names.items()})
+    nicknames = nicknames.map(clean_names)
+
+    # 全部消息一次写入计数立方体，用户按第一条工作时间消息的顺序排名，与逐行模式一致
+    cube.add(user_ids.to_numpy(), days, weekday, hour)
+
+    # 工作时间内的消息
+    work = work_calendar.work_mask(weekday, hour)
+    work_msgs = msgs[work]
+    work_names = nicknames[work].to_numpy()
+
+    if tokenizer is not None and day_word_counters is not None:
+        user_word_counters = {}
+        token_lists = tokenizer.tokenize_many(work_msgs.tolist())
+        for name, day, words in zip(work_names.tolist(), days[work].tolist(), token_lists):
+            user_word_counters.setdefault(name, Counter()).update(words)
+            day_word_counters.setdefault(day, Counter()).update(words)
+        add_user_words(stats, user_word_counters)
+    elif tokenizer is not None:
+        # 按消息顺序逐条分词，每个用户词频的先后顺序与读取全部消息后再分词一致
+        add_user_words(stats, tokenizer.count_user_words(work_msgs.tolist(), work_names.tolist()))
+    elif keep_messages:
+        for name, group in work_msgs.groupby(work_names, sort=False):
+            stats["user_messages"].setdefault(name, []).extend(group.tolist())
+    return stats
+
+# 只读取 columns（时间戳、消息内容、昵称）三列，usecols 按文件中的列顺序返回；指定 chunksize 时返回分块迭代器
+def read_csv_columns(path, columns, chunksize=None):
+    import pandas as pd
+    return pd.read_csv(path, header=0, usecols=list(columns),
+                       dtype=str, keep_default_na=False, encoding="utf-8", chunksize=chunksize)
+
+# 从已打开文件的当前位置（某一行的开头）继续读取，column_count 为表头的列数
+def read_csv_columns_from(f, column_count, columns, chunksize=None):
+    import pandas as pd
+    return pd.read_csv(f, header=None, names=range(column_count),
+                       usecols=list(columns),
+                       dtype=str, keep_default_na=False, encoding="utf-8", chunksize=chunksize)
+
+# 按块返回只包含时间戳、消息内容、昵称三列的DataFrame，启用列式缓存时从缓存读取（缓存无法写入时直接读取CSV）
+def iter_column_frames(path, config, chunksize=None):
+    import pandas as pd
+
+    export = open_export(path, config.columns, config.csv_reader) if config.use_columnar_cache else None
+    if export is not None:
+        with export:
+            for timestamps, nicknames, msgs in export.iter_chunks(chunksize):
+                yield pd.DataFrame({"CreateTime": timestamps, "StrContent": msgs, "NickName": nicknames})
+        return
+
+    if chunksize is None:
+        yield read_csv_columns(path, config.columns)
+    else:
+        yield from read_csv_columns(path, config.columns, chunksize=chunksize)
+
+# 按列读取CSV文件，用pandas/NumPy向量化统计，结果与 read_stats_loop 一致
+def read_stats_vectorized(path, work_calendar, config):
+    """
+    注意：不使用列式缓存时，列数不足的行会被pandas补为空字符串，而不是像逐行模式那样直接跳过
+    """
+    stats = new_stats(work_calendar, word_sketch_sizes(config))
+    for frame in iter_column_frames(path, config):
+        update_stats_vectorized(stats, frame, work_calendar)
+    return stats
+
+# 分块流式读取CSV文件，不保存消息原文，内存占用只与块大小有关；tokenizer 为 None 时不分词，只统计消息数量
+def read_stats_stream(path, work_calendar, tokenizer, config):
+    stats = new_stats(work_calendar, word_sketch_sizes(config))
+    for chunk in iter_column_frames(path, config, chunksize=config.chunk_size):
+        update_stats_vectorized(stats, chunk, work_calendar, tokenizer, keep_messages=False)
+    return stats
+
+# 从SQLite消息库读取统计结果：计数立方体和用户词频都由聚合查询得到，与读取导出文件统计的结果相同。
+# 数据文件或配置变化时先重新导入（导入时分词），之后的分析不再读取导出文件，也不需要分词
+def read_stats_store(path, work_calendar, config):
+    from moyu_store import open_store
+
+    stats = new_stats(work_calendar, word_sketch_sizes(config))
+    with open_store(path, config) as store:
+        store.fill_cube(stats["cube"])
+        add_user_words(stats, store.user_word_counters())
+        stats["max_timestamp"] = store.max_timestamp()
+    return stats
+
+# 合并两份统计结果（other 累加到 stats 中）
+def merge_stats(stats, other):
+    stats["cube"].merge(other["cube"])
+    sizes = stats["word_sketch_sizes"]
+    for name, counter in other["user_word_counters"].items():
+        empty = Counter() if sizes is None else SpaceSaving(sizes[1])
+        stats["user_word_counters"].setdefault(name, empty).update(counter)
+    if stats["word_sketch"] is not None:
+        stats["word_sketch"].merge(other["word_sketch"])
+    for name, msgs in other["user_messages"].items():
+        stats["user_messages"].setdefault(name, []).extend(msgs)
+    if stats["max_timestamp"] is None or (other["max_timestamp"] is not None
+                                          and other["max_timestamp"] > stats["max_timestamp"]):
+        stats["max_timestamp"] = other["max_timestamp"]
+    return stats
+
+# 影响统计结果的配置：列配置、时区、工作时间、近似词频的摘要大小和停用词
+def config_fingerprint_parts(work_calendar, config):
+    parts = [stats_format, str(config.columns), str(work_calendar.timezone),
+             str((work_calendar.work_start, work_calendar.work_end)), str(word_sketch_sizes(config))]
+    parts.extend(sorted(stop_words))
+    return parts
+
+# 增量状态的指纹：数据文件或上述配置变化后，旧状态不能再继续累加
+def state_fingerprint(path, work_calendar, config):
+    parts = [os.path.abspath(path)] + config_fingerprint_parts(work_calendar, config)
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+# 计算文件 offset 之前最后4KB内容的哈希，用于判断文件是否只是在末尾追加了新内容
+def file_tail_hash(path, offset):
+    with open(path, "rb") as f:
+        f.seek(max(0, offset - 4096))
+        return hashlib.sha1(f.read(offset - f.tell())).hexdigest()
+
+# 读取上次保存的增量状态，不存在或与当前配置不匹配时返回 None
+def load_state(state_path, path, work_calendar, config):
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, "rb") as f:
+        state = pickle.load(f)
+    if state.get("fingerprint") != state_fingerprint(path, work_calendar, config):
+        print("数据文件或配置已变化，重新进行完整分析")
+        return None
+    return state
+
+# 保存统计状态、高水位线以及已读取到的文件位置
+def save_state(state_path, path, stats, column_count, work_calendar, config):
+    offset = os.path.getsize(path)
+    state = {
+        "fingerprint": state_fingerprint(path, work_calendar, config),
+        "stats": stats,
+        "column_count": column_count,
+        "offset": offset,
+        "tail_hash": file_tail_hash(path, offset),
+    }
+    with open(state_path + ".tmp", "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(state_path + ".tmp", state_path)
+
+# 增量分析：在上次保存的统计状态上只累加时间戳晚于高水位线的新消息
+def read_stats_incremental(path, state_path, work_calendar, tokenizer, config):
+    """
+    如果数据文件只是在末尾追加了内容，直接从上次读取结束的位置继续读取，新读取的每一行都统计
+    （包括与上次最后一条消息在同一秒内的消息）；
+    否则（例如重新导出了整个文件）扫描全文件，但只统计时间戳严格大于高水位线的消息：
+    与上次最后一条消息在同一秒内、但上次还没有导出的消息无法与已统计的消息区分，这种情况下不会被统计
+    """
+    state = load_state(state_path, path, work_calendar, config)
+    stats = state["stats"] if state else new_stats(work_calendar, word_sketch_sizes(config))
+    mark = stats["max_timestamp"]
+
+    with open(path, "rb") as f:
+        column_count = len(next(csv.reader([f.readline().decode("utf-8")]), []))
+        appended = (state is not None
+                    and state["column_count"] == column_count
+                    and os.path.getsize(path) >= state["offset"]
+                    and file_tail_hash(path, state["offset"]) == state["tail_hash"])
+        if appended:
+            # 从上次读取结束的位置开始的行都没有统计过，不需要再按高水位线过滤
+            f.seek(state["offset"])
+            chunks = read_csv_columns_from(f, column_count, config.columns, chunksize=config.chunk_size)
+            min_timestamp = None
+        else:
+            f.seek(0)
+            chunks = read_csv_columns(f, config.columns, chunksize=config.chunk_size)
+            min_timestamp = mark
+
+        new = new_stats(work_calendar, word_sketch_sizes(config))
+        for chunk in chunks:
+            update_stats_vectorized(new, chunk, work_calendar, tokenizer, min_timestamp=min_timestamp)
+    print(f"增量分析：新增 {new['cube'].work_message_count()} 条工作时间消息")
+
+    merge_stats(stats, new)
+
+    save_state(state_path, path, stats, column_count, work_calendar, config)
+    return stats
+
+# 统计一个分片：只读取 [start, end) 范围内的行，并立即分词，不保存消息原文，得到的统计结果可以pickle后在别处合并。
+# tokenizer 为 None 时不分词（只输出排行榜）
+def read_stats_shard(path, start, end, work_calendar, tokenizer, config):
+    time_index, msg_index, nickname_index = config.columns
+    rows = iter_columns(path, (time_index, nickname_index, msg_index), skip_header=start == 0,
+                        reader=config.csv_reader, start=start, end=end)
+    stats = update_stats_rows(new_stats(work_calendar, word_sketch_sizes(config)), rows, work_calendar)
+    if tokenizer is not None:
+        # 与读取全部消息后再分词的顺序相同：按用户首次出现的顺序，逐条分词
+        tokenize_user_messages(stats, tokenizer, stats["user_messages"], config.chunk_size)
+    stats["user_messages"] = {}
+    return stats
+
+# 分片状态的指纹：各台机器上同一个文件的路径可能不同，用文件名、大小和修改时间标识数据文件
+def shard_fingerprint(path, work_calendar, config):
+    stat = os.stat(path)
+    parts = [os.path.basename(path), str(stat.st_size), str(stat.st_mtime_ns)]
+    parts.extend(config_fingerprint_parts(work_calendar, config))
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+# 第 index 个分片（从0开始）的统计结果保存的位置
+def shard_state_path(config, index, count):
+    return os.path.join(config.result_dir, config.shard_dir, f"shard_{index + 1}_of_{count}.pkl")
+
+# 读取已保存的分片统计结果，不存在或与当前的数据文件、配置、分片范围不匹配时返回 None；
+# need_words 为 True 时不使用只统计了消息数量、没有分词的分片（--shard 与 --stats-only 一起生成的）
+def load_shard_state(state_path, fingerprint, start, end, need_words=True):
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, "rb") as f:
+        state = pickle.load(f)
+    if state.get("fingerprint") != fingerprint or state.get("range") != (start, end):
+        return None
+    if need_words and not state.get("tokenized"):
+        return None
+    return state["stats"]
+
+# 在单独的进程（或其他机器）中统计一个分片
+def shard_worker(path, start, end, config):
+    work_calendar = WorkCalendar(config.timezone, config.work_hours)
+    if config.stats_only:
+        return read_stats_shard(path, start, end, work_calendar, None, config)
+
+    from moyu_tokenizer import Tokenizer, use_dictionary_cache
+    if config.jieba_cache_dir:
+        use_dictionary_cache(config.jieba_cache_dir)
+    with Tokenizer(stop_words) as tokenizer:
+        return read_stats_shard(path, start, end, work_calendar, tokenizer, config)
+
+def save_shard(path, index, count, config):
+    """
+    把文件切分为 count 个分片，只统计第 index 个（从0开始）并保存到结果目录的分片目录中，返回保存的路径。
+    各台机器通过共享文件系统分别统计不同的分片后，用 read_stats_sharded（--shards 参数）合并
+    """
+    work_calendar = make_work_calendar(config)
+    try:
+        boundaries = row_boundaries(path, count)
+        start, end = boundaries[index], boundaries[index + 1]
+        state = {
+            "fingerprint": shard_fingerprint(path, work_calendar, config),
+            "shard": (index, count),
+            "range": (start, end),
+            "tokenized": not config.stats_only,
+            "stats": shard_worker(path, start, end, config),
+        }
+    except Exception as e:
+        raise AnalysisError(f"读取CSV文件时出错: {e}") from e
+    state_path = shard_state_path(config, index, count)
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with open(state_path + ".tmp", "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(state_path + ".tmp", state_path)
+    return state_path
+
+# 分片统计：按字节把文件切分为 config.shards 个分片分别统计，再按文件中的顺序合并
+def read_stats_sharded(path, work_calendar, config):
+    """
+    合并后的统计结果与一次读取整个文件完全一致（包括排名并列时的顺序）。
+    分片目录中已有同一文件、同一配置的分片统计结果（例如其他机器用 --shard 生成的）时直接使用，
+    其余分片在本机统计，config.workers 大于1时用进程池并行
     """
-    print(f"{hour}点-{hour+1}点: {hour_counter[hour]}条消息")
-
-html_content += """
-        </table>
-    </div>
-"""
-
-# 3. 创建详细分析用户列表（前三名 + 重点用户）
-detailed_users = [name for name, _ in top_moyu[:3]]  # 取前三名用户
-
-# 添加不在前三名的重点用户
-for user in key_users:
-    if user in moyu_counter and user not in detailed_users:
-        detailed_users.append(user)
-
-# 分析详细用户的摸鱼时间分布
-print("\n===== 摸鱼达人时间分析 =====")
-
-plt.figure(figsize=(14, 8))
-bar_width = 0.25 / (len(detailed_users) if len(detailed_users) > 0 else 1)  # 调整柱状图宽度
-index = range(9)  # 9小时工作时间
-
-for i, user in enumerate(detailed_users):
-    if user in user_hour_stats:
-        user_data = [user_hour_stats[user][hour] for hour in range(9, 18)]
-        plt.bar([x + i * bar_width for x in index], user_data, bar_width, 
-                label=user, alpha=0.7)
-
-plt.xlabel('工作时间')
-plt.ylabel('消息数量')
-plt.title('摸鱼达人时间分布对比')
-plt.xticks([x + bar_width * len(detailed_users) / 2 for x in index], [f"{h}点" for h in range(9, 18)])
-plt.legend()
-plt.tight_layout()
-detailed_users_time_img = fig_to_base64(plt.gcf())
-plt.savefig(os.path.join(result_dir, "detailed_users_time_distribution.png"))
-plt.close()
-
-# 添加摸鱼达人时间分析到HTML
-html_content += """
-    <div class="section">
-        <h2>摸鱼达人时间分析</h2>
-        <div class="chart">
-            <img src="data:image/png;base64,""" + detailed_users_time_img + """" alt="摸鱼达人时间分布对比">
+    count = config.shards
+    boundaries = row_boundaries(path, count)
+    fingerprint = shard_fingerprint(path, work_calendar, config)
+    shard_stats = [
+        load_shard_state(shard_state_path(config, i, count), fingerprint, boundaries[i], boundaries[i + 1],
+                         not config.stats_only)
+        for i in range(count)
+    ]
+    missing = [i for i, stats in enumerate(shard_stats) if stats is None]
+    if len(missing) < count:
+        print(f"使用已保存的 {count - len(missing)}/{count} 个分片统计结果")
+
+    if config.workers > 1 and len(missing) > 1:
+        with ProcessPoolExecutor(min(config.workers, len(missing))) as pool:
+            futures = [pool.submit(shard_worker, path, boundaries[i], boundaries[i + 1], config) for i in missing]
+            for i, future in zip(missing, futures):
+                shard_stats[i] = future.result()
+    else:
+        for i in missing:
+            shard_stats[i] = shard_worker(path, boundaries[i], boundaries[i + 1], config)
+
+    stats = new_stats(work_calendar, word_sketch_sizes(config))
+    for other in shard_stats:
+        merge_stats(stats, other)
+    return stats
+
+
+# 日期范围 [date_from, date_to]（"YYYY-MM-DD"，包含两端，None 表示不限）内的摸鱼排行前 top 名，
+# 由按日计数的前缀和相减得到，不需要重新读取消息
+def date_range_ranking(cube, date_from=None, date_to=None, top=10):
+    first = None if date_from is None else day_number(date_from)
+    last = None if date_to is None else day_number(date_to)
+    moyu_counter = cube.range_moyu_counter(first, last)
+    return {
+        "label": f"{date_from or '最早'} 至 {date_to or '最后'}",
+        "work_days": cube.range_work_day_count(first, last),
+        "work_messages": sum(moyu_counter.values()),
+        "ranking": moyu_counter.most_common(top),
+    }
+
+
+# 最近 count 个自然周（period="week"）或自然月（period="month"）各自的摸鱼排行，按时间顺序
+def rolling_rankings(cube, work_calendar, period, count, top):
+    if not len(cube.days):
+        return []
+    rankings = []
+    for first, last in list(period_ranges(int(cube.days[0]), int(cube.days[-1]), period))[-count:]:
+        moyu_counter = cube.range_moyu_counter(first, last)
+        rankings.append({
+            "label": f"{work_calendar.date_string(first)} 至 {work_calendar.date_string(last)}",
+            "work_days": cube.range_work_day_count(first, last),
+            "work_messages": sum(moyu_counter.values()),
+            "ranking": moyu_counter.most_common(top),
+        })
+    return rankings
+
+
+period_names = {"week": "周", "month": "月"}
+period_units = {"week": "周", "month": "个月"}
+
+
+def print_date_range_ranking(date_range):
+    print(f"\n{date_range['label']} 摸鱼排行榜前10名（{date_range['work_days']}个工作日）:")
+    for i, (name, count) in enumerate(date_range["ranking"], 1):
+        avg_per_day = count / date_range["work_days"] if date_range["work_days"] > 0 else 0
+        print(f"{i}. {name}: {count}条工作时间消息 (平均每天 {avg_per_day:.2f}条)")
+
+
+def print_rolling_rankings(rolling, period):
+    print(f"\n每{period_names[period]}摸鱼排行（最近{len(rolling)}{period_units[period]}）:")
+    for entry in rolling:
+        ranking = "，".join(f"{i}. {name} {count}条" for i, (name, count) in enumerate(entry["ranking"], 1))
+        print(f"{entry['label']}: {ranking or '没有工作时间消息'}")
+
+
+# 日期范围排行和滚动排行写入报告
+def date_range_section(report, date_range):
+    report.write(f"""
+        <div class="section">
+            <h2>{date_range['label']} 摸鱼排行榜</h2>
+            <p>该时间段共有 <span class="highlight">{date_range['work_days']}</span> 个工作日，
+            <span class="highlight">{date_range['work_messages']}</span> 条工作时间消息</p>
+            <table>
+                <tr>
+                    <th>排名</th>
+                    <th>昵称</th>
+                    <th>工作时间消息数</th>
+                    <th>平均每天消息数</th>
+                </tr>
+    """)
+    for i, (name, count) in enumerate(date_range["ranking"], 1):
+        avg_per_day = count / date_range["work_days"] if date_range["work_days"] > 0 else 0
+        report.write(f"""
+                <tr>
+                    <td>{i}</td>
+                    <td>{name}</td>
+                    <td>{count}</td>
+                    <td>{avg_per_day:.2f}</td>
+                </tr>
+        """)
+    report.write("""
+            </table>
+        </div>
+    """)
+
+
+def rolling_section(report, rolling, period):
+    report.write(f"""
+        <div class="section">
+            <h2>每{period_names[period]}摸鱼排行</h2>
+            <table>
+                <tr>
+                    <th>时间段</th>
+                    <th>工作日数</th>
+                    <th>工作时间消息数</th>
+                    <th>摸鱼排行</th>
+                </tr>
+    """)
+    for entry in rolling:
+        ranking = "<br>".join(f"{i}. {name}（{count}条）" for i, (name, count) in enumerate(entry["ranking"], 1))
+        report.write(f"""
+                <tr>
+                    <td>{entry['label']}</td>
+                    <td>{entry['work_days']}</td>
+                    <td>{entry['work_messages']}</td>
+                    <td>{ranking}</td>
+                </tr>
+        """)
+    report.write("""
+            </table>
         </div>
-    </div>
-"""
+    """)
+
+
+# 以下绘图函数只依赖已经统计好的数据，返回PNG字节，可以在渲染子进程中执行
 
-# 4. 计算并显示每人每天平均摸鱼消息数
-if total_work_days > 0:
-    print("\n每人每天平均摸鱼消息数:")
-    for i, (name, count) in enumerate(extended_ranking, 1):
-        avg_per_day = count / total_work_days
-        print(f"{i}. {name}: {avg_per_day:.2f}条/天")
+# 1. 摸鱼排行榜
+def plot_ranking(extended_ranking, key_users):
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Patch
+    from moyu_render import figure_png
+
+    plt.figure(figsize=(12, 6))
+    names = [item[0] for item in extended_ranking]
+    counts = [item[1] for item in extended_ranking]
+
+    # 创建颜色列表，重点用户使用不同颜色
+    colors = ['skyblue' if name not in key_users else 'lightgreen' for name in names]
+
+    # 创建横向条形图
+    plt.barh(range(len(names)), counts, color=colors)
+    plt.yticks(range(len(names)), names)
+    plt.xlabel('工作时间消息数量')
+    plt.title('微信群摸鱼排行榜')
+
+    # 在条形图上显示具体数值
+    for i, v in enumerate(counts):
+        plt.text(v + 1, i, str(v), va='center')
+
+    # 添加图例
+    legend_elements = [
+        Patch(facecolor='skyblue', label='普通用户'),
+        Patch(facecolor='lightgreen', label='重点关注用户')
+    ]
+    plt.legend(handles=legend_elements, loc='lower right')
+
+    plt.tight_layout()
+    return figure_png(plt.gcf())
+
+# 2. 24小时消息分布，work_hours 为工作时间包含的小时
+def plot_time_distribution(hour_counts, work_hours):
+    import matplotlib.pyplot as plt
+    from moyu_render import figure_png
+
+    plt.figure(figsize=(12, 6))
+    hours = list(range(24))
+    counts = [hour_counts[hour] for hour in hours]
+
+    plt.bar(hours, counts, color='lightgreen')
+    plt.xlabel('小时')
+    plt.ylabel('消息数量')
+    plt.title('24小时消息分布')
+    plt.xticks(hours)
+
+    # 标记工作时间区域
+    plt.axvspan(work_hours[0], work_hours[-1] + 1, alpha=0.2, color='red')
+    plt.text((work_hours[0] + work_hours[-1] + 1) / 2, max(counts)*0.9, '工作时间', ha='center')
+
+    plt.tight_layout()
+    return figure_png(plt.gcf())
+
+# 3. 摸鱼达人时间分布对比，user_hour_data 为 {用户: work_hours 中每小时的消息数}
+def plot_detailed_users_time(detailed_users, user_hour_data, work_hours):
+    import matplotlib.pyplot as plt
+    from moyu_render import figure_png
+
+    plt.figure(figsize=(14, 8))
+    bar_width = 0.25 / (len(detailed_users) if len(detailed_users) > 0 else 1)  # 调整柱状图宽度
+    index = range(len(work_hours))  # 工作时间的小时数
+
+    for i, user in enumerate(detailed_users):
+        if user in user_hour_data:
+            plt.bar([x + i * bar_width for x in index], user_hour_data[user], bar_width, 
+                    label=user, alpha=0.7)
+
+    plt.xlabel('工作时间')
+    plt.ylabel('消息数量')
+    plt.title('摸鱼达人时间分布对比')
+    plt.xticks([x + bar_width * len(detailed_users) / 2 for x in index], [f"{h}点" for h in work_hours])
+    plt.legend()
+    plt.tight_layout()
+    return figure_png(plt.gcf())
+
+# 4. 日均摸鱼效率排行
+def plot_efficiency(extended_ranking, total_work_days, key_users):
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Patch
+    from moyu_render import figure_png
 
-    # 可视化平均摸鱼效率
     plt.figure(figsize=(12, 6))
     names = [item[0] for item in extended_ranking]
     avg_counts = [item[1]/total_work_days for item in extended_ranking]
-    
+
     # 创建颜色列表，重点用户使用不同颜色
     colors = ['orange' if name not in key_users else 'lightgreen' for name in names]
-    
+
     plt.barh(range(len(names)), avg_counts, color=colors)
     plt.yticks(range(len(names)), names)
     plt.xlabel('平均每天摸鱼消息数')
     plt.title('微信群日均摸鱼效率排行')
-    
+
     for i, v in enumerate(avg_counts):
         plt.text(v + 0.1, i, f"{v:.2f}", va='center')
-    
+
     # 添加图例
     legend_elements = [
         Patch(facecolor='orange', label='普通用户'),
         Patch(facecolor='lightgreen', label='重点关注用户')
     ]
     plt.legend(handles=legend_elements, loc='lower right')
-    
+
     plt.tight_layout()
-    efficiency_img = fig_to_base64(plt.gcf())
-    plt.savefig(os.path.join(result_dir, "moyu_efficiency.png"))
-    plt.close()
-    
-    # 添加摸鱼效率到HTML
-    html_content += """
+    return figure_png(plt.gcf())
+
+# 5. 周一至周五的摸鱼趋势
+def plot_weekday_trend(weekday_counts):
+    import matplotlib.pyplot as plt
+    from moyu_render import figure_png
+
+    plt.figure(figsize=(10, 6))
+    counts = [weekday_counts[day] for day in range(5)]
+
+    plt.bar(weekday_names, counts, color='purple')
+    plt.xlabel('工作日')
+    plt.ylabel('消息数量')
+    plt.title('工作日摸鱼趋势')
+
+    for i, v in enumerate(counts):
+        plt.text(i, v + 100, str(v), ha='center')
+
+    plt.tight_layout()
+    return figure_png(plt.gcf())
+
+# 6. 摸鱼达人工作日分布对比，user_weekday_data 为 {用户: 周一到周五每天的消息数}
+def plot_detailed_users_weekday(detailed_users, user_weekday_data):
+    import matplotlib.pyplot as plt
+    from moyu_render import figure_png
+
+    plt.figure(figsize=(12, 6))
+    bar_width = 0.25 / (len(detailed_users) if len(detailed_users) > 0 else 1)  # 调整柱状图宽度
+    index = range(5)  # 5个工作日
+
+    for i, user in enumerate(detailed_users):
+        if user in user_weekday_data:
+            plt.bar([x + i * bar_width for x in index], user_weekday_data[user], bar_width, 
+                    label=user, alpha=0.7)
+
+    plt.xlabel('工作日')
+    plt.ylabel('消息数量')
+    plt.title('摸鱼达人工作日分布对比')
+    plt.xticks([x + bar_width * len(detailed_users) / 2 for x in index], weekday_names)
+    plt.legend()
+    plt.tight_layout()
+    return figure_png(plt.gcf())
+
+# 7. 星期 × 小时的消息热力图，heatmap[星期][小时] 为全部有效消息数（星期 0=周一），框出工作时间
+def plot_heatmap(heatmap, work_hours):
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle
+    from moyu_render import figure_png
+
+    fig, ax = plt.subplots(figsize=(14, 5))
+    image = ax.imshow(heatmap, cmap='YlOrRd', aspect='auto')
+    ax.set_xticks(range(24))
+    ax.set_xticklabels([str(hour) for hour in range(24)])
+    ax.set_yticks(range(7))
+    ax.set_yticklabels(all_weekday_names)
+    ax.set_xlabel('小时')
+    ax.set_title('摸鱼热力图（星期 × 小时消息数）')
+    fig.colorbar(image, ax=ax, label='消息数量')
+
+    # 框出周一至周五的工作时间
+    ax.add_patch(Rectangle((work_hours[0] - 0.5, -0.5), len(work_hours), 5,
+                           fill=False, edgecolor='blue', linewidth=2))
+
+    plt.tight_layout()
+    return figure_png(fig)
+
+# 8. 词云（全部摸鱼内容或单个用户的摸鱼内容），budget 为 wordcloud_budget() 返回的渲染预算
+def plot_wordcloud(word_counter, title, budget, font_path):
+    import matplotlib.pyplot as plt
+    from moyu_render import figure_png, make_wordcloud, wordcloud_figure
+
+    # 根据已有的词频生成词云
+    wordcloud = make_wordcloud(word_counter, font_path, budget)
+
+    # 显示词云图
+    wordcloud_figure(budget)
+    plt.imshow(wordcloud, interpolation="bilinear")
+    plt.axis("off")
+    plt.title(title)
+    plt.tight_layout()
+    return figure_png(plt.gcf())
+
+# 近似词频的说明：error 为计数可能偏高的上限（SpaceSaving.error_bound()）
+def approximate_words_note(error):
+    return f"（近似词频：每个词的次数最多偏高 {error} 次，未列出的词出现次数不超过 {error} 次）"
+
+# 报告中词频表前的近似词频说明，精确词频（error 为 None）时为空
+def approximate_words_paragraph(error):
+    return "" if error is None else f"<p>{approximate_words_note(error)}</p>"
+
+# 生成单个用户的摸鱼内容分析（词云和词频表）并写入报告；
+# wordcloud_future 为已提交渲染的词云，用户没有摸鱼内容时为 None；word_error 为近似词频的误差上限
+def user_content_section(report, user, user_word_counter, wordcloud_future, word_error=None):
+    print(f"\n{user}的摸鱼内容分析:")
+
+    if not user_word_counter:  # 确保有内容再生成词云
+        print(f"{user}的摸鱼内容不足以生成词云")
+        return
+
+    user_wordcloud_src = report.image(wordcloud_future.result(), f"{user}_wordcloud.png")
+
+    # 输出词频统计
+    user_word_counts = user_word_counter.most_common(10)
+    print(f"\n{user}摸鱼内容中最常见的10个词：")
+    if word_error is not None:
+        print(approximate_words_note(word_error))
+    for word, count in user_word_counts:
+        print(f"{word}: {count}次")
+
+    # 添加用户摸鱼内容分析到HTML
+    report.write(f"""
         <div class="section">
-            <h2>摸鱼效率分析</h2>
+            <h2>{user}的摸鱼内容分析</h2>
             <div class="chart">
-                <img src="data:image/png;base64,""" + efficiency_img + """" alt="微信群日均摸鱼效率排行">
+                <img src="{user_wordcloud_src}" alt="{user}的摸鱼内容词云">
             </div>
+
+            <h3>{user}摸鱼内容中最常见的10个词</h3>
+            {approximate_words_paragraph(word_error)}
+            <table>
+                <tr>
+                    <th>词语</th>
+                    <th>出现次数</th>
+                </tr>
+    """)
+
+    for word, count in user_word_counts:
+        report.write(f"""
+                <tr>
+                    <td>{word}</td>
+                    <td>{count}</td>
+                </tr>
+        """)
+
+    report.write("""
+            </table>
         </div>
+    """)
+
+
+# HTML报告的开头（各群的分析报告和批量分析的汇总报告共用）
+report_head = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>微信群摸鱼排行榜分析报告</title>
+        <style>
+            body {
+                font-family: 'Microsoft YaHei', Arial, sans-serif;
+                margin: 0;
+                padding: 20px;
+                background-color: #f5f5f5;
+                color: #333;
+            }
+            .container {
+                max-width: 1200px;
+                margin: 0 auto;
+                background-color: white;
+                padding: 20px;
+                box-shadow: 0 0 10px rgba(0,0,0,0.1);
+                border-radius: 5px;
+            }
+            h1, h2, h3 {
+                color: #2c3e50;
+            }
+            h1 {
+                text-align: center;
+                padding-bottom: 10px;
+                border-bottom: 2px solid #3498db;
+                margin-bottom: 30px;
+            }
+            .section {
+                margin-bottom: 40px;
+                padding-bottom: 20px;
+                border-bottom: 1px solid #eee;
+            }
+            .chart {
+                text-align: center;
+                margin: 20px 0;
+            }
+            .chart img {
+                max-width: 100%;
+                height: auto;
+                border: 1px solid #ddd;
+                border-radius: 4px;
+                padding: 5px;
+                background-color: white;
+            }
+            table {
+                width: 100%;
+                border-collapse: collapse;
+                margin: 20px 0;
+            }
+            th, td {
+                padding: 12px 15px;
+                text-align: left;
+                border-bottom: 1px solid #ddd;
+            }
+            th {
+                background-color: #3498db;
+                color: white;
+            }
+            tr:nth-child(even) {
+                background-color: #f2f2f2;
+            }
+            .highlight {
+                background-color: #ffffcc;
+                font-weight: bold;
+            }
+            .footer {
+                text-align: center;
+                margin-top: 30px;
+                color: #7f8c8d;
+                font-size: 0.9em;
+            }
+            .key-user {
+                background-color: #e8f8f5;
+                font-weight: bold;
+            }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>微信群摸鱼排行榜分析报告</h1>
     """
 
-# 5. 可视化周一至周五的摸鱼趋势
-plt.figure(figsize=(10, 6))
-weekdays = ['周一', '周二', '周三', '周四', '周五']
-counts = [weekday_counter[day] for day in range(5)]
-
-plt.bar(weekdays, counts, color='purple')
-plt.xlabel('工作日')
-plt.ylabel('消息数量')
-plt.title('工作日摸鱼趋势')
-
-for i, v in enumerate(counts):
-    plt.text(i, v + 100, str(v), ha='center')
-
-plt.tight_layout()
-weekday_trend_img = fig_to_base64(plt.gcf())
-plt.savefig(os.path.join(result_dir, "weekday_trend.png"))
-plt.close()
-
-# 添加工作日趋势到HTML
-html_content += """
-    <div class="section">
-        <h2>工作日摸鱼趋势</h2>
-        <div class="chart">
-            <img src="data:image/png;base64,""" + weekday_trend_img + """" alt="工作日摸鱼趋势">
-        </div>
-    </div>
-"""
-
-# 6. 详细用户的工作日摸鱼对比
-plt.figure(figsize=(12, 6))
-bar_width = 0.25 / (len(detailed_users) if len(detailed_users) > 0 else 1)  # 调整柱状图宽度
-index = range(5)  # 5个工作日
-
-for i, user in enumerate(detailed_users):
-    if user in user_weekday_stats:
-        user_data = [user_weekday_stats[user][day] for day in range(5)]
-        plt.bar([x + i * bar_width for x in index], user_data, bar_width, 
-                label=user, alpha=0.7)
-
-plt.xlabel('工作日')
-plt.ylabel('消息数量')
-plt.title('摸鱼达人工作日分布对比')
-plt.xticks([x + bar_width * len(detailed_users) / 2 for x in index], weekdays)
-plt.legend()
-plt.tight_layout()
-detailed_users_weekday_img = fig_to_base64(plt.gcf())
-plt.savefig(os.path.join(result_dir, "detailed_users_weekday_distribution.png"))
-plt.close()
-
-# 添加摸鱼达人工作日分布到HTML
-html_content += """
-    <div class="section">
-        <h2>摸鱼达人工作日分布</h2>
-        <div class="chart">
-            <img src="data:image/png;base64,""" + detailed_users_weekday_img + """" alt="摸鱼达人工作日分布对比">
-        </div>
-    </div>
-"""
-
-# 7. 摸鱼内容分析
-print("\n===== 摸鱼内容分析 =====")
-
-# 将所有消息合并成一个字符串
-text = " ".join(moyu_content)
-
-# 使用jieba进行分词，并过滤停用词
-word_list = [word for word in jieba.cut(text) if word not in stop_words and len(word) > 1]
-word_space = " ".join(word_list)
-
-# 创建词云对象
-wordcloud = WordCloud(
-    font_path="C:\\Windows\\Fonts\\msyh.ttc",  # 使用微软雅黑字体
-    width=800,
-    height=400,
-    background_color="white",
-    min_font_size=10,
-    max_font_size=150
-)
-
-# 生成词云
-wordcloud.generate(word_space)
-
-# 显示词云图
-plt.figure(figsize=(10, 5))
-plt.imshow(wordcloud, interpolation="bilinear")
-plt.axis("off")
-plt.title('摸鱼内容词云')
-plt.tight_layout()
-wordcloud_img = fig_to_base64(plt.gcf())
-plt.savefig(os.path.join(result_dir, "moyu_content_wordcloud.png"))
-plt.close()
-
-# 输出词频统计
-word_counts = Counter(word_list).most_common(20)
-print("\n摸鱼内容中最常见的20个词：")
-for word, count in word_counts:
-    print(f"{word}: {count}次")
-
-# 添加摸鱼内容分析到HTML
-html_content += """
-    <div class="section">
-        <h2>摸鱼内容分析</h2>
-        <div class="chart">
-            <img src="data:image/png;base64,""" + wordcloud_img + """" alt="摸鱼内容词云">
-        </div>
-        
-        <h3>摸鱼内容中最常见的20个词</h3>
-        <table>
-            <tr>
-                <th>词语</th>
-                <th>出现次数</th>
-            </tr>
-"""
-
-for word, count in word_counts:
-    html_content += f"""
-            <tr>
-                <td>{word}</td>
-                <td>{count}</td>
-            </tr>
+
+def analyze(path, config=None):
     """
+    分析聊天记录CSV文件，生成图表和HTML报告（保存在 config.result_dir 中），返回 Result。
+    各阶段的耗时保存在 config.timings_file 中；config.profile 为 True 时另外保存 cProfile 的统计结果。
+    读取失败时抛出 AnalysisError
+    """
+    if config is None:
+        config = Config()
+    timer = PhaseTimer()
+    profiler = None
+    if config.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        result = _analyze(path, config, timer)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            if os.path.isdir(config.result_dir):
+                profiler.dump_stats(os.path.join(config.result_dir, config.profile_file))
+    result.timings = timer.save(os.path.join(config.result_dir, config.timings_file),
+                                input=os.path.abspath(path), ingest_mode=config.ingest_mode, backend=config.backend,
+                                workers=config.workers, shards=config.shards, incremental=config.incremental,
+                                stats_only=config.stats_only, profile=config.profile)
+    return result
+
+
+def _analyze(path, config, timer):
+    key_users = config.key_users
+    topn_users = config.topn_users
+    result_dir = config.result_dir
+
+    # 创建结果目录
+    timer.start("setup")
+    if not os.path.exists(result_dir):
+        os.makedirs(result_dir)
+
+    # 时间戳换算为日期、星期和小时
+    work_calendar = make_work_calendar(config)
+    work_hours = list(range(work_calendar.work_start, work_calendar.work_end))
+
+    # 流式、增量和分片模式在读取时就完成分词，消息库在导入时已经统计好词频，直接使用累计的词频
+    use_store = config.backend == "sqlite"
+    tokenized_on_read = use_store or config.ingest_mode == "stream" or config.incremental or config.shards > 1
+
+    # 分词器，多进程时各子进程只加载一次jieba词典；只输出排行榜时不需要分词（增量模式仍需为保存的状态累加词频），
+    # 分片模式由各分片自己分词
+    tokenizer = None
+    if not use_store and (config.incremental or (not config.stats_only and config.shards <= 1)):
+        from moyu_token_cache import TokenCache
+        from moyu_tokenizer import Tokenizer, use_dictionary_cache
+
+        if config.jieba_cache_dir:
+            use_dictionary_cache(config.jieba_cache_dir)
+        token_cache = None
+        if config.use_token_cache:
+            token_cache = TokenCache(os.path.join(result_dir, config.token_cache_file), stop_words)
+        tokenizer = Tokenizer(stop_words, config.workers, token_cache)
+
+    # 读取CSV文件
+    timer.start("read")
+    try:
+        if use_store:
+            stats = read_stats_store(path, work_calendar, config)
+        elif config.incremental:
+            stats = read_stats_incremental(path, os.path.join(result_dir, config.state_file),
+                                           work_calendar, tokenizer, config)
+        elif config.shards > 1:
+            stats = read_stats_sharded(path, work_calendar, config)
+        elif config.ingest_mode == "stream":
+            stats = read_stats_stream(path, work_calendar, tokenizer, config)
+        elif config.ingest_mode == "vectorized":
+            stats = read_stats_vectorized(path, work_calendar, config)
+        else:
+            stats = read_stats_loop(path, work_calendar, config)
+    except Exception as e:
+        if tokenizer is not None:
+            tokenizer.close()
+        raise AnalysisError(f"读取CSV文件时出错: {e}") from e
+
+    # 用户摸鱼数据都由计数立方体的切片和求和得到
+    cube = stats["cube"]
+    moyu_counter = cube.moyu_counter()  # 用户摸鱼消息数
+    user_messages = stats["user_messages"]  # 存储用户的消息内容
+    hour_counts = cube.hour_counts()  # 时间段分布
+    weekday_counts = cube.weekday_counts()  # 工作日分布
+
+    timer.count(messages=cube.message_count(), work_messages=cube.work_message_count(), users=len(cube.names))
+
+    # 计算总工作日数
+    timer.start("ranking")
+    total_work_days = cube.work_day_count()
+    print(f"\n数据集中共有 {total_work_days} 个工作日")
+
+    # 获取摸鱼排行前10名
+    top_moyu = moyu_counter.most_common(10)
+    # 打印结果
+    print("\n摸鱼排行榜前10名:")
+    for i, (name, count) in enumerate(top_moyu, 1):
+        avg_per_day = count / total_work_days if total_work_days > 0 else 0
+        print(f"{i}. {name}: {count}条工作时间消息 (平均每天 {avg_per_day:.2f}条)")
+
+    # 处理重点用户
+    # 获取前10名用户名列表
+    top10_names = [name for name, _ in top_moyu]
+
+    # 创建扩展排行榜，包含前10名和不在前10名的重点用户
+    extended_ranking = list(top_moyu)
+    key_users_not_in_top10 = []
+
+    # 添加不在前10名的重点用户
+    for user in key_users:
+        if user in moyu_counter and user not in top10_names:
+            key_users_not_in_top10.append((user, moyu_counter[user]))
+
+    # 将不在前10名的重点用户添加到扩展排行榜
+    extended_ranking.extend(key_users_not_in_top10)
+
+    # 打印重点用户信息
+    if key_users_not_in_top10:
+        print("\n不在前10名的重点用户:")
+        for name, count in key_users_not_in_top10:
+            avg_per_day = count / total_work_days if total_work_days > 0 else 0
+            print(f"{name}: {count}条工作时间消息 (平均每天 {avg_per_day:.2f}条)")
+
+    # 指定的日期范围和滚动周期的排行，直接由按日计数的前缀和得到
+    date_range = rolling = None
+    if config.date_from or config.date_to or config.rolling:
+        timer.start("date_ranges")
+    if config.date_from or config.date_to:
+        date_range = date_range_ranking(cube, config.date_from, config.date_to)
+        print_date_range_ranking(date_range)
+    if config.rolling:
+        rolling = rolling_rankings(cube, work_calendar, config.rolling, config.rolling_periods,
+                                   config.rolling_top_users)
+        print_rolling_rankings(rolling, config.rolling)
+
+    if config.stats_only:
+        if tokenizer is not None:
+            tokenizer.close()
+        timer.stop()
+        return Result(stats, total_work_days, top_moyu, extended_ranking, None, None, None,
+                      date_range=date_range, rolling=rolling)
+
+    timer.start("render_setup")
+    import matplotlib.pyplot as plt
+    from moyu_render import ChartRenderer, wordcloud_budget
+    from moyu_report import ReportWriter
+
+    timer.start("ranking")
+
+    # 报告的各部分生成后直接写入文件
+    report_path = os.path.join(result_dir, "moyu_report.html")
+    # 正常结束时替换为正式的报告；中途出错时删除临时文件，进程池也会关闭（批量分析时不会累积）
+    with ReportWriter(report_path, config.embed_images) as report:
+        report.write(report_head)
+
+        # 添加基本信息到HTML
+        report.write(f"""
+            <div class="section">
+                <h2>基本统计信息</h2>
+                <p>数据集中共有 <span class="highlight">{total_work_days}</span> 个工作日</p>
+
+                <h3>摸鱼排行榜</h3>
+                <table>
+                    <tr>
+                        <th>排名</th>
+                        <th>昵称</th>
+                        <th>工作时间消息数</th>
+                        <th>平均每天消息数</th>
+                        <th>备注</th>
+                    </tr>
+        """)
+
+        # 添加排行榜到HTML
+        for i, (name, count) in enumerate(extended_ranking, 1):
+            avg_per_day = count / total_work_days if total_work_days > 0 else 0
+            is_key_user = name in key_users
+            row_class = 'class="key-user"' if is_key_user else ''
+            note = "重点关注用户" if is_key_user else ""
+
+            report.write(f"""
+                    <tr {row_class}>
+                        <td>{i}</td>
+                        <td>{name}</td>
+                        <td>{count}</td>
+                        <td>{avg_per_day:.2f}</td>
+                        <td>{note}</td>
+                    </tr>
+            """)
+
+        report.write("""
+                </table>
+            </div>
+        """)
+
+        if date_range is not None:
+            date_range_section(report, date_range)
+        if rolling is not None:
+            rolling_section(report, rolling, config.rolling)
+
+        # 设置全局字体
+        plt.rcParams['font.sans-serif'] = ['Microsoft YaHei']
+        plt.rcParams['axes.unicode_minus'] = False
+
+        # 创建详细分析用户列表（前三名 + 重点用户）
+        detailed_users = [name for name, _ in top_moyu[:3]]  # 取前三名用户
+
+        # 添加不在前三名的重点用户
+        for user in key_users:
+            if user in moyu_counter and user not in detailed_users:
+                detailed_users.append(user)
+
+        # 图表只依赖已经统计好的数据，先全部提交渲染（多进程时并行渲染），再按原来的顺序组装HTML。
+        # 单进程时在提交时渲染，渲染耗时计入提交图表的那一部分
+        timer.start("render_setup")
+        with ChartRenderer(config.workers) as renderer:
+            timer.start("ranking")
+            ranking_future = renderer.submit(plot_ranking, extended_ranking, key_users)
+            timer.start("time_distribution")
+            time_dist_future = renderer.submit(plot_time_distribution, hour_counts, work_hours)
+            timer.start("detailed_users_time")
+            detailed_users_time_future = renderer.submit(plot_detailed_users_time, detailed_users, {
+                user: cube.user_hour_counts(user)[work_calendar.work_start:work_calendar.work_end]
+                for user in detailed_users
+            }, work_hours)
+            efficiency_future = None
+            if total_work_days > 0:
+                timer.start("efficiency")
+                efficiency_future = renderer.submit(plot_efficiency, extended_ranking, total_work_days, key_users)
+            timer.start("weekday_trend")
+            weekday_trend_future = renderer.submit(plot_weekday_trend, weekday_counts)
+            timer.start("detailed_users_weekday")
+            detailed_users_weekday_future = renderer.submit(plot_detailed_users_weekday, detailed_users, {
+                user: cube.user_weekday_counts(user) for user in detailed_users
+            })
+            timer.start("heatmap")
+            heatmap_future = renderer.submit(plot_heatmap, cube.heatmap().tolist(), work_hours)
+
+            # 每条消息只分词一次，得到每个用户的词频，总词频由各用户的词频相加得到
+            timer.start("tokenize")
+            if not tokenized_on_read:
+                # 分批分词，近似词频时每批的精确词频累加到摘要后即丢弃
+                tokenize_user_messages(stats, tokenizer, user_messages, config.chunk_size)
+            if tokenizer is not None:
+                tokenizer.close()
+            user_word_counters = stats["user_word_counters"]
+            word_sketch = stats["word_sketch"]
+
+            timer.count(messages=cube.work_message_count(),
+                        tokens=word_sketch.total if word_sketch is not None
+                        else sum(sum(counter.values()) for counter in user_word_counters.values()))
+
+            timer.start("content")
+            word_error = user_word_errors = None
+            if word_sketch is not None:
+                # 近似词频：摘要中的词和计数，以及计数可能偏高的上限
+                word_error = word_sketch.error_bound()
+                user_word_errors = {name: sketch.error_bound() for name, sketch in user_word_counters.items()}
+                user_word_counters = {name: sketch.counter() for name, sketch in user_word_counters.items()}
+                word_counter = word_sketch.counter()
+            else:
+                # 总词频由各用户的词频依次相加：次数相同的词按用户首次发言的顺序、再按词在该用户内容中首次出现的顺序排列，
+                # 而不是按词在全部消息中首次出现的顺序（与最初逐条消息统计的版本相比，只有并列词的先后可能不同，次数相同）
+                word_counter = Counter()
+                for user_word_counter in user_word_counters.values():
+                    word_counter.update(user_word_counter)
+            timer.count(words=len(word_counter))
+            budget = wordcloud_budget(config.wordcloud_max_words, config.wordcloud_width, config.wordcloud_height,
+                                      config.wordcloud_scale, config.wordcloud_preview)
+            wordcloud_future = renderer.submit(plot_wordcloud, word_counter, '摸鱼内容词云', budget, config.font_path)
+
+            # 每个用户只生成一次词云：重点用户如果已在前topn名中，第10部分不再重复生成
+            top_users = [name for name, _ in top_moyu[:topn_users]]
+            other_key_users = [user for user in dict.fromkeys(key_users)
+                               if moyu_counter[user] > 0 and user not in top_users]
+            timer.start("user_content")
+            user_wordcloud_futures = {}
+            for user in top_users + other_key_users:
+                user_word_counter = user_word_counters.get(user, Counter())
+                if user_word_counter:
+                    user_wordcloud_futures[user] = renderer.submit(plot_wordcloud, user_word_counter,
+                                                                   f'{user}的摸鱼内容词云', budget, config.font_path)
+
+            # 1. 可视化摸鱼排行榜
+            timer.start("ranking")
+            ranking_src = report.image(ranking_future.result(), "moyu_ranking.png")
+
+            # 添加排行榜图表到HTML
+            report.write(f"""
+                <div class="section">
+                    <h2>摸鱼排行榜</h2>
+                    <div class="chart">
+                        <img src="{ranking_src}" alt="摸鱼排行榜">
+                    </div>
+                </div>
+            """)
 
-html_content += """
-        </table>
-    </div>
-"""
-# 8. 前topn名用户的摸鱼内容分析
-
-print("\n===== 前%s名用户的摸鱼内容分析 =====" % topn_users)
-# 确保detailed_users中没有重复用户
-detailed_users = list(dict.fromkeys(detailed_users))
-for user in detailed_users:
-    if user in user_messages and len(user_messages[user]) > 0:
-        print(f"\n{user}的摸鱼内容分析:")
-        
-        # 将用户消息合并成一个字符串
-        user_text = " ".join(user_messages[user])
-        
-        # 使用jieba进行分词，并过滤停用词
-        user_word_list = [word for word in jieba.cut(user_text) if word not in stop_words and len(word) > 1]
-        user_word_space = " ".join(user_word_list)
-        
-        # 创建词云对象
-        user_wordcloud = WordCloud(
-            font_path="C:\\Windows\\Fonts\\msyh.ttc",  # 使用微软雅黑字体
-            width=800,
-            height=400,
-            background_color="white",
-            min_font_size=10,
-            max_font_size=150
-        )
-        
-        # 生成词云
-        if user_word_space.strip():  # 确保有内容再生成词云
-            user_wordcloud.generate(user_word_space)
-            
-            # 显示词云图
-            plt.figure(figsize=(10, 5))
-            plt.imshow(user_wordcloud, interpolation="bilinear")
-            plt.axis("off")
-            plt.title(f'{user}的摸鱼内容词云')
-            plt.tight_layout()
-            user_wordcloud_img = fig_to_base64(plt.gcf())
-            plt.savefig(os.path.join(result_dir, f"{user}_wordcloud.png"))
-            plt.close()
-            
-            # 输出词频统计
-            user_word_counts = Counter(user_word_list).most_common(10)
-            print(f"\n{user}摸鱼内容中最常见的10个词：")
-            for word, count in user_word_counts:
-                print(f"{word}: {count}次")
-            
-            # 添加用户摸鱼内容分析到HTML
-            html_content += f"""
+            # 2. 可视化时间分布
+            timer.start("time_distribution")
+            time_dist_src = report.image(time_dist_future.result(), "moyu_time_distribution.png")
+
+            # 添加时间分布到HTML
+            report.write(f"""
                 <div class="section">
-                    <h2>{user}的摸鱼内容分析</h2>
+                    <h2>时间分布分析</h2>
                     <div class="chart">
-                        <img src="data:image/png;base64,{user_wordcloud_img}" alt="{user}的摸鱼内容词云">
+                        <img src="{time_dist_src}" alt="24小时消息分布">
                     </div>
-                    
-                    <h3>{user}摸鱼内容中最常见的10个词</h3>
+
+                    <h3>工作时间内的消息分布</h3>
                     <table>
                         <tr>
-                            <th>词语</th>
-                            <th>出现次数</th>
+                            <th>时间段</th>
+                            <th>消息数量</th>
                         </tr>
-            """
-            
-            for word, count in user_word_counts:
-                html_content += f"""
+            """)
+
+            for hour in work_hours:
+                report.write(f"""
                         <tr>
-                            <td>{word}</td>
-                            <td>{count}</td>
+                            <td>{hour}点-{hour+1}点</td>
+                            <td>{hour_counts[hour]}</td>
                         </tr>
-                """
-            
-            html_content += """
+                """)
+                print(f"{hour}点-{hour+1}点: {hour_counts[hour]}条消息")
+
+            report.write("""
                     </table>
                 </div>
-            """
-        else:
-            print(f"{user}的摸鱼内容不足以生成词云")
+            """)
 
-# 9. 重点用户的摸鱼内容分析
-print("\n===== 重点用户摸鱼内容分析 =====")
+            # 3. 分析详细用户的摸鱼时间分布
+            timer.start("detailed_users_time")
+            print("\n===== 摸鱼达人时间分析 =====")
+
+            detailed_users_time_src = report.image(detailed_users_time_future.result(), "detailed_users_time_distribution.png")
+
+            # 添加摸鱼达人时间分析到HTML
+            report.write(f"""
+                <div class="section">
+                    <h2>摸鱼达人时间分析</h2>
+                    <div class="chart">
+                        <img src="{detailed_users_time_src}" alt="摸鱼达人时间分布对比">
+                    </div>
+                </div>
+            """)
+
+            # 4. 计算并显示每人每天平均摸鱼消息数
+            if total_work_days > 0:
+                timer.start("efficiency")
+                print("\n每人每天平均摸鱼消息数:")
+                for i, (name, count) in enumerate(extended_ranking, 1):
+                    avg_per_day = count / total_work_days
+                    print(f"{i}. {name}: {avg_per_day:.2f}条/天")
+
+                # 可视化平均摸鱼效率
+                efficiency_src = report.image(efficiency_future.result(), "moyu_efficiency.png")
+
+                # 添加摸鱼效率到HTML
+                report.write(f"""
+                    <div class="section">
+                        <h2>摸鱼效率分析</h2>
+                        <div class="chart">
+                            <img src="{efficiency_src}" alt="微信群日均摸鱼效率排行">
+                        </div>
+                    </div>
+                """)
+
+            # 5. 可视化周一至周五的摸鱼趋势
+            timer.start("weekday_trend")
+            weekday_trend_src = report.image(weekday_trend_future.result(), "weekday_trend.png")
+
+            # 添加工作日趋势到HTML
+            report.write(f"""
+                <div class="section">
+                    <h2>工作日摸鱼趋势</h2>
+                    <div class="chart">
+                        <img src="{weekday_trend_src}" alt="工作日摸鱼趋势">
+                    </div>
+                </div>
+            """)
+
+            # 6. 详细用户的工作日摸鱼对比
+            timer.start("detailed_users_weekday")
+            detailed_users_weekday_src = report.image(detailed_users_weekday_future.result(),
+                                                      "detailed_users_weekday_distribution.png")
+
+            # 添加摸鱼达人工作日分布到HTML
+            report.write(f"""
+                <div class="section">
+                    <h2>摸鱼达人工作日分布</h2>
+                    <div class="chart">
+                        <img src="{detailed_users_weekday_src}" alt="摸鱼达人工作日分布对比">
+                    </div>
+                </div>
+            """)
+
+            # 7. 星期 × 小时的摸鱼热力图
+            timer.start("heatmap")
+            heatmap_src = report.image(heatmap_future.result(), "weekday_hour_heatmap.png")
+
+            # 添加热力图到HTML
+            report.write(f"""
+                <div class="section">
+                    <h2>摸鱼热力图</h2>
+                    <div class="chart">
+                        <img src="{heatmap_src}" alt="星期 × 小时消息热力图">
+                    </div>
+                </div>
+            """)
+
+            # 8. 摸鱼内容分析
+            timer.start("content")
+            print("\n===== 摸鱼内容分析 =====")
+
+            wordcloud_src = report.image(wordcloud_future.result(), "moyu_content_wordcloud.png")
 
-for user in key_users:
-    if user in user_messages and len(user_messages[user]) and user not in detailed_users  > 0:
-        print(f"\n{user}的摸鱼内容分析:")
-        
-        # 将用户消息合并成一个字符串
-        user_text = " ".join(user_messages[user])
-        
-        # 使用jieba进行分词，并过滤停用词
-        user_word_list = [word for word in jieba.cut(user_text) if word not in stop_words and len(word) > 1]
-        user_word_space = " ".join(user_word_list)
-        
-        # 创建词云对象
-        user_wordcloud = WordCloud(
-            font_path="C:\\Windows\\Fonts\\msyh.ttc",  # 使用微软雅黑字体
-            width=800,
-            height=400,
-            background_color="white",
-            min_font_size=10,
-            max_font_size=150
-        )
-        
-        # 生成词云
-        if user_word_space.strip():  # 确保有内容再生成词云
-            user_wordcloud.generate(user_word_space)
-            
-            # 显示词云图
-            plt.figure(figsize=(10, 5))
-            plt.imshow(user_wordcloud, interpolation="bilinear")
-            plt.axis("off")
-            plt.title(f'{user}的摸鱼内容词云')
-            plt.tight_layout()
-            user_wordcloud_img = fig_to_base64(plt.gcf())
-            plt.savefig(os.path.join(result_dir, f"{user}_wordcloud.png"))
-            plt.close()
-            
             # 输出词频统计
-            user_word_counts = Counter(user_word_list).most_common(10)
-            print(f"\n{user}摸鱼内容中最常见的10个词：")
-            for word, count in user_word_counts:
+            word_counts = word_counter.most_common(20)
+            print("\n摸鱼内容中最常见的20个词：")
+            if word_error is not None:
+                print(approximate_words_note(word_error))
+            for word, count in word_counts:
                 print(f"{word}: {count}次")
-            
-            # 添加用户摸鱼内容分析到HTML
-            html_content += f"""
+
+            # 添加摸鱼内容分析到HTML
+            report.write(f"""
                 <div class="section">
-                    <h2>{user}的摸鱼内容分析</h2>
+                    <h2>摸鱼内容分析</h2>
                     <div class="chart">
-                        <img src="data:image/png;base64,{user_wordcloud_img}" alt="{user}的摸鱼内容词云">
+                        <img src="{wordcloud_src}" alt="摸鱼内容词云">
                     </div>
-                    
-                    <h3>{user}摸鱼内容中最常见的10个词</h3>
+
+                    <h3>摸鱼内容中最常见的20个词</h3>
+                    {approximate_words_paragraph(word_error)}
                     <table>
                         <tr>
                             <th>词语</th>
                             <th>出现次数</th>
                         </tr>
-            """
-            
-            for word, count in user_word_counts:
-                html_content += f"""
+            """)
+
+            for word, count in word_counts:
+                report.write(f"""
                         <tr>
                             <td>{word}</td>
                             <td>{count}</td>
                         </tr>
-                """
-            
-            html_content += """
+                """)
+
+            report.write("""
                     </table>
                 </div>
-            """
-        else:
-            print(f"{user}的摸鱼内容不足以生成词云")
+            """)
+            # 9. 前topn名用户的摸鱼内容分析
+            timer.start("user_content", users=len(top_users) + len(other_key_users))
+            print("\n===== 前%s名用户的摸鱼内容分析 =====" % topn_users)
+            for user in top_users:
+                user_content_section(report, user, user_word_counters.get(user, Counter()),
+                                     user_wordcloud_futures.get(user), (user_word_errors or {}).get(user))
+
+            # 10. 重点用户的摸鱼内容分析
+            print("\n===== 重点用户摸鱼内容分析 =====")
+
+            for user in other_key_users:
+                user_content_section(report, user, user_word_counters.get(user, Counter()),
+                                     user_wordcloud_futures.get(user), (user_word_errors or {}).get(user))
+
+        # 添加页脚到HTML
+        timer.start("report")
+        report.write("""
+                <div class="footer">
+                    <p>微信群摸鱼排行榜分析报告 - 生成时间: """ + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + """</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """)
+
+    print(f"\n分析报告已保存到 {report_path}")
+
+    return Result(stats, total_work_days, top_moyu, extended_ranking, word_counter, user_word_counters,
+                  report_path, date_range=date_range, rolling=rolling, word_error=word_error,
+                  user_word_errors=user_word_errors)
 
-# 添加页脚到HTML
-html_content += """
-        <div class="footer">
-            <p>微信群摸鱼排行榜分析报告 - 生成时间: """ + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + """</p>
-        </div>
-    </div>
-</body>
-</html>
-"""
 
-# 保存HTML报告
-with open(os.path.join(result_dir, "moyu_report.html"), "w", encoding="utf-8") as f:
-    f.write(html_content)
+# 解析 "3/8" 形式的分片编号，返回 (从0开始的序号, 分片数)
+def parse_shard(value):
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"分片格式应为 序号/分片数，例如 3/8: {value}")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"分片序号应在 1 到分片数之间: {value}")
+    return index - 1, count
+
+
+# 检查 "YYYY-MM-DD" 形式的日期
+def parse_date(value):
+    try:
+        datetime.datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式应为 YYYY-MM-DD，例如 2024-03-01: {value}")
+    return value
 
-print(f"\n分析报告已保存到 {os.path.join(result_dir, 'moyu_report.html')}")
\ No newline at end of file
+
+# 检查时区名（IANA时区名，例如 Asia/Shanghai）
+def parse_timezone(value):
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise argparse.ArgumentTypeError(f"未知的时区，应为IANA时区名，例如 Asia/Shanghai: {value}")
+    return value
+
+
+# 解析 "9-18" 形式的工作时间
+def parse_work_hours(value):
+    try:
+        start, end = (int(part) for part in value.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"工作时间格式应为 开始小时-结束小时，例如 9-18: {value}")
+    if not 0 <= start < end <= 24:
+        raise argparse.ArgumentTypeError(f"工作时间应满足 0 <= 开始小时 < 结束小时 <= 24: {value}")
+    return start, end
+
+
+def main():
+    # 解析命令行参数，未指定的参数使用文件开头的默认配置
+    parser = argparse.ArgumentParser(description="微信群摸鱼分析")
+    parser.add_argument("input", nargs="?", default=input_file,
+                        help=f"聊天记录CSV文件（批量分析时为目录或通配符），默认 {input_file}")
+    parser.add_argument("--batch", action="store_true",
+                        help="批量分析目录中（或通配符匹配到）的每个导出文件，各群的报告保存在 结果目录/群名/ 下")
+    parser.add_argument("-o", "--output-dir", default=result_dir, help=f"结果目录，默认 {result_dir}")
+    parser.add_argument("--key-user", dest="key_users", action="append", default=None, metavar="昵称",
+                        help="重点关注的用户，可以重复指定多次")
+    parser.add_argument("--top-n", type=int, default=topn_users, help="详细分析摸鱼内容的前几名用户")
+    parser.add_argument("--work-hours", type=parse_work_hours, default=(work_start_hour, work_end_hour),
+                        metavar="开始-结束", help=f"工作日的工作时间，默认 {work_start_hour}-{work_end_hour}")
+    parser.add_argument("--timezone", type=parse_timezone, default=timezone,
+                        help="统计工作时间使用的时区，例如 Asia/Shanghai，默认使用本机时区")
+    parser.add_argument("--workers", type=int, default=workers,
+                        help="jieba分词和图表渲染使用的进程数（批量分析时为同时分析的群数），1 表示不使用进程池")
+    parser.add_argument("--ingest-mode", choices=["loop", "vectorized", "stream"], default=ingest_mode,
+                        help="数据读取方式")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default=backend,
+                        help="sqlite：先把聊天记录导入结果目录下的SQLite消息库（文件没有变化时直接使用），"
+                             "排行榜和词频由消息库查询得到")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量分析：读取上次保存的统计状态，只统计新增的消息")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="把文件按字节切分为多个分片分别统计（--workers 大于1时并行）后合并，"
+                             "优先使用分片目录中已保存的分片统计结果")
+    parser.add_argument("--shard", type=parse_shard, metavar="序号/分片数",
+                        help="只统计一个分片并保存到结果目录的分片目录中（用于多台机器分别统计），不生成报告")
+    parser.add_argument("--font", default=font_path, help="词云使用的中文字体文件")
+    parser.add_argument("--jieba-cache-dir", default=jieba_cache_dir,
+                        help="jieba序列化词典缓存所在的目录，默认使用系统临时目录")
+    parser.add_argument("--stats-only", action="store_true",
+                        help="只输出摸鱼排行榜，不分词，也不生成图表和报告（启动更快）")
+    parser.add_argument("--link-images", dest="embed_images", action="store_false", default=embed_images,
+                        help="报告中以相对路径引用PNG图片，不内嵌base64，报告需要和图片放在同一目录")
+    parser.add_argument("--preview", action="store_true", default=wordcloud_preview,
+                        help="快速生成低分辨率、词数较少的词云预览")
+    parser.add_argument("--from", dest="date_from", type=parse_date, metavar="YYYY-MM-DD",
+                        help="另外输出从这一天开始的摸鱼排行（可以只指定 --from 或 --to）")
+    parser.add_argument("--to", dest="date_to", type=parse_date, metavar="YYYY-MM-DD",
+                        help="另外输出到这一天（包含）为止的摸鱼排行")
+    parser.add_argument("--rolling", choices=["week", "month"],
+                        help=f"另外输出最近{rolling_periods}个自然周/自然月各自的摸鱼排行")
+    parser.add_argument("--approximate-words", action="store_true", default=approximate_words,
+                        help=f"近似词频：只跟踪全部内容中最常见的{word_sketch_size}个词和每个用户最常见的"
+                             f"{user_word_sketch_size}个词，内存占用固定，输出计数可能偏高的上限")
+    parser.add_argument("--serve", action="store_true",
+                        help="只读取一次聊天记录，在本机启动HTTP查询服务（见 moyu_server.py），不生成报告")
+    parser.add_argument("--port", type=int, default=8765, help="--serve 的端口，默认 8765")
+    parser.add_argument("--timings", action="store_true",
+                        help=f"分析结束后打印各阶段的耗时、CPU时间和峰值内存（总是保存在结果目录的 {timings_file} 中）")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"用 cProfile 记录整个分析过程，结果保存在结果目录的 {profile_file} 中")
+    args = parser.parse_args()
+    if args.incremental and (args.shards > 1 or args.shard is not None):
+        parser.error("--incremental 不能与 --shards / --shard 同时使用")
+    if args.backend == "sqlite" and (args.incremental or args.shards > 1 or args.shard is not None):
+        parser.error("--backend sqlite 不能与 --incremental / --shards / --shard 同时使用")
+    if args.date_from and args.date_to and args.date_from > args.date_to:
+        parser.error("--from 的日期不能晚于 --to")
+
+    config = Config(
+        key_users=key_users if args.key_users is None else args.key_users,
+        topn_users=args.top_n,
+        result_dir=args.output_dir,
+        work_hours=args.work_hours,
+        timezone=args.timezone,
+        workers=args.workers,
+        ingest_mode=args.ingest_mode,
+        backend=args.backend,
+        incremental=args.incremental,
+        font_path=args.font,
+        jieba_cache_dir=args.jieba_cache_dir,
+        stats_only=args.stats_only,
+        shards=args.shards,
+        embed_images=args.embed_images,
+        wordcloud_preview=args.preview,
+        profile=args.profile,
+        date_from=args.date_from,
+        date_to=args.date_to,
+        rolling=args.rolling,
+        approximate_words=args.approximate_words,
+    )
+    try:
+        if args.shard is not None:
+            index, count = args.shard
+            state_path = save_shard(args.input, index, count, config)
+            print(f"分片 {index + 1}/{count} 的统计结果已保存到 {state_path}")
+        elif args.serve:
+            from moyu_server import serve
+            serve(args.input, config, port=args.port)
+        elif args.batch:
+            from moyu_batch import analyze_batch, find_exports
+            analyze_batch(find_exports(args.input), config, args.workers)
+        else:
+            result = analyze(args.input, config)
+            if args.timings:
+                from moyu_timing import format_timings
+                print("\n各阶段耗时:")
+                print(format_timings(result.timings))
+            if args.profile:
+                print(f"cProfile 统计结果已保存到 {os.path.join(config.result_dir, config.profile_file)}")
+    except AnalysisError as e:
+        print(e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
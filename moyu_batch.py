@@ -0,0 +1,214 @@
+"""
+批量分析：一次分析一个目录（或通配符匹配到的）多个群的导出文件，
+各群的报告保存在 <结果目录>/<群名>/ 下，另外生成一份跨群的汇总排行和每个群的耗时
+"""
+import contextlib
+import datetime
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from moyu_analyzer import AnalysisError, Config, analyze, report_head
+
+# 汇总排行中显示的人数
+summary_top_users = 20
+
+
+def find_exports(pattern):
+    """
+    pattern 为目录时返回其中所有的 .csv 文件，否则按通配符匹配，结果按路径排序
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.csv")
+    paths = sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+    if not paths:
+        raise AnalysisError(f"没有找到要分析的CSV文件: {pattern}")
+    return paths
+
+
+def group_names(paths):
+    """
+    每个导出文件对应的群名（文件名去掉扩展名），重名时依次加上 _2、_3 ……
+    """
+    names = []
+    used = set()
+    for path in paths:
+        base = os.path.splitext(os.path.basename(path))[0]
+        name, index = base, 1
+        while name in used:
+            index += 1
+            name = f"{base}_{index}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+# 子进程初始化：每个进程只加载一次jieba词典和matplotlib（导入时加载字体列表），之后分析的各个群都直接复用
+def _init_worker(jieba_cache_dir):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    from moyu_tokenizer import initialize_jieba, use_dictionary_cache
+
+    if jieba_cache_dir:
+        use_dictionary_cache(jieba_cache_dir)
+    initialize_jieba()
+
+
+# 分析一个群，分析过程的输出写入该群结果目录下的 analysis.log，返回可以pickle的摘要
+def _analyze_group(group, path, config):
+    start = time.perf_counter()
+    summary = {"group": group, "path": path, "result_dir": config.result_dir, "error": None}
+    os.makedirs(config.result_dir, exist_ok=True)
+    with open(os.path.join(config.result_dir, "analysis.log"), "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log):
+        try:
+            result = analyze(path, config)
+        except Exception as e:  # 一个群出错不影响其他群
+            summary["error"] = str(e) if isinstance(e, AnalysisError) else f"{type(e).__name__}: {e}"
+        else:
+            summary["total_work_days"] = result.total_work_days
+            summary["work_messages"] = result.stats["cube"].work_message_count()
+            summary["ranking"] = result.ranking
+            summary["report_path"] = result.report_path
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def analyze_batch(paths, config=None, workers=1):
+    """
+    分析多个导出文件，返回每个群的摘要（按 paths 的顺序），并在 config.result_dir 下生成 summary.html。
+    workers 大于1时用进程池同时分析多个群，每个群内部不再使用进程池
+    """
+    if config is None:
+        config = Config()
+    names = group_names(paths)
+    group_configs = [
+        Config(**dict(vars(config), result_dir=os.path.join(config.result_dir, name), workers=1))
+        for name in names
+    ]
+
+    start = time.perf_counter()
+    summaries = []
+    if workers > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(config.jieba_cache_dir,)) as pool:
+            futures = [pool.submit(_analyze_group, name, path, group_config)
+                       for name, path, group_config in zip(names, paths, group_configs)]
+            for future in futures:
+                summaries.append(future.result())
+                print_group_timing(summaries[-1])
+    else:
+        for name, path, group_config in zip(names, paths, group_configs):
+            summaries.append(_analyze_group(name, path, group_config))
+            print_group_timing(summaries[-1])
+    elapsed = time.perf_counter() - start
+
+    summary_path = write_summary(summaries, config.result_dir, elapsed)
+    failed = sum(1 for summary in summaries if summary["error"])
+    print(f"\n共分析 {len(summaries)} 个群（失败 {failed} 个），总耗时 {elapsed:.1f} 秒")
+    print(f"汇总报告已保存到 {summary_path}")
+    return summaries
+
+
+def print_group_timing(summary):
+    if summary["error"]:
+        print(f"{summary['group']}: 失败（{summary['seconds']:.1f} 秒）: {summary['error']}")
+    else:
+        print(f"{summary['group']}: {summary['work_messages']}条工作时间消息，耗时 {summary['seconds']:.1f} 秒")
+
+
+# 跨群汇总排行：各群的前10名按日均工作时间消息数排序（同名的人在不同的群里分别计算）
+def summary_ranking(summaries):
+    ranking = []
+    for summary in summaries:
+        if summary["error"] or not summary["total_work_days"]:
+            continue
+        for name, count in summary["ranking"]:
+            ranking.append((name, summary["group"], count, count / summary["total_work_days"]))
+    ranking.sort(key=lambda item: item[3], reverse=True)
+    return ranking[:summary_top_users]
+
+
+def write_summary(summaries, result_dir, elapsed):
+    os.makedirs(result_dir, exist_ok=True)
+    summary_path = os.path.join(result_dir, "summary.html")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        f.write(report_head)
+        f.write(f"""
+        <div class="section">
+            <h2>各群分析结果</h2>
+            <p>共分析 <span class="highlight">{len(summaries)}</span> 个群，总耗时 {elapsed:.1f} 秒</p>
+            <table>
+                <tr>
+                    <th>群</th>
+                    <th>工作日数</th>
+                    <th>工作时间消息数</th>
+                    <th>摸鱼第一名</th>
+                    <th>耗时（秒）</th>
+                    <th>报告</th>
+                </tr>
+        """)
+        for summary in summaries:
+            if summary["error"]:
+                f.write(f"""
+                <tr>
+                    <td>{summary['group']}</td>
+                    <td colspan="3">分析失败: {summary['error']}</td>
+                    <td>{summary['seconds']:.1f}</td>
+                    <td></td>
+                </tr>
+        """)
+                continue
+            top_user = summary["ranking"][0][0] if summary["ranking"] else ""
+            report_link = os.path.relpath(summary["report_path"], result_dir).replace(os.sep, "/")
+            f.write(f"""
+                <tr>
+                    <td>{summary['group']}</td>
+                    <td>{summary['total_work_days']}</td>
+                    <td>{summary['work_messages']}</td>
+                    <td>{top_user}</td>
+                    <td>{summary['seconds']:.1f}</td>
+                    <td><a href="{report_link}">查看报告</a></td>
+                </tr>
+        """)
+        f.write("""
+            </table>
+        </div>
+        """)
+
+        f.write(f"""
+        <div class="section">
+            <h2>跨群摸鱼排行榜（前{summary_top_users}名）</h2>
+            <table>
+                <tr>
+                    <th>排名</th>
+                    <th>昵称</th>
+                    <th>群</th>
+                    <th>工作时间消息数</th>
+                    <th>平均每天消息数</th>
+                </tr>
+        """)
+        for i, (name, group, count, avg_per_day) in enumerate(summary_ranking(summaries), 1):
+            f.write(f"""
+                <tr>
+                    <td>{i}</td>
+                    <td>{name}</td>
+                    <td>{group}</td>
+                    <td>{count}</td>
+                    <td>{avg_per_day:.2f}</td>
+                </tr>
+        """)
+        f.write("""
+            </table>
+        </div>
+
+            <div class="footer">
+                <p>微信群摸鱼排行榜汇总报告 - 生成时间: """ + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + """</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """)
+    return summary_path
@@ -0,0 +1,124 @@
+"""
+时间戳到日历信息（日序号、日期、星期、小时）的快速换算，支持指定时区（含夏令时）
+"""
+import datetime
+import time
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+# 时区偏移总是15分钟的整数倍，同一个15分钟区间内的UTC偏移相同
+_bucket_seconds = 900
+
+_epoch = datetime.date(1970, 1, 1)
+
+
+class WorkCalendar:
+    """
+    把Unix时间戳换算为本地时间的日序号、星期和小时，并判断是否为工作时间。
+    每个15分钟区间只查询一次时区偏移（夏令时切换也只发生在区间边界上），
+    之后都是整数运算：日序号 = (时间戳 + 偏移) // 86400，星期由日序号取模得到
+    """
+
+    def __init__(self, timezone=None, work_hours=(9, 18)):
+        # timezone 为 None 时使用本机时区，否则为IANA时区名，例如 "Asia/Shanghai"
+        self.timezone = timezone
+        self.tz = ZoneInfo(timezone) if timezone else None
+        # 工作时间为周一至周五的 [开始小时, 结束小时)
+        self.work_start, self.work_end = work_hours
+        self._offsets = {}  # 15分钟区间 -> UTC偏移秒数（None 表示无法换算）
+        self._dates = {}  # 日序号 -> "YYYY-MM-DD"
+
+    def _bucket_offset(self, bucket):
+        try:
+            offset = self._offsets[bucket]
+        except KeyError:
+            ts = bucket * _bucket_seconds
+            try:
+                if self.tz is None:
+                    offset = time.localtime(ts).tm_gmtoff
+                else:
+                    offset = int(datetime.datetime.fromtimestamp(ts, self.tz).utcoffset().total_seconds())
+            except (OverflowError, OSError, ValueError):
+                offset = None
+            self._offsets[bucket] = offset
+        return offset
+
+    def calendar(self, timestamp):
+        """
+        返回 (日序号, 星期, 小时)，星期 0=周一；时间戳无法换算时抛出 ValueError
+        """
+        offset = self._bucket_offset(timestamp // _bucket_seconds)
+        if offset is None:
+            raise ValueError(f"无法换算的时间戳: {timestamp}")
+        local = timestamp + offset
+        day = local // 86400
+        return day, (day + 3) % 7, local % 86400 // 3600  # 1970-01-01 是周四
+
+    def calendar_array(self, timestamps):
+        """
+        批量换算 int64 时间戳数组，返回 (日序号, 星期, 小时, 是否有效) 四个数组
+        """
+        buckets, inverse = np.unique(timestamps // _bucket_seconds, return_inverse=True)
+        offsets = np.zeros(len(buckets), dtype=np.int64)
+        valid = np.ones(len(buckets), dtype=bool)
+        for i, bucket in enumerate(buckets):
+            offset = self._bucket_offset(int(bucket))
+            if offset is None:
+                valid[i] = False
+            else:
+                offsets[i] = offset
+
+        local = timestamps + offsets[inverse]
+        days = local // 86400
+        weekdays = ((days + 3) % 7).astype(np.int8)
+        hours = (local % 86400 // 3600).astype(np.int8)
+        return days, weekdays, hours, valid[inverse]
+
+    def is_work_time(self, weekday, hour):
+        return weekday < 5 and self.work_start <= hour < self.work_end
+
+    def work_mask(self, weekdays, hours):
+        """
+        is_work_time 的数组版本
+        """
+        return (weekdays < 5) & (hours >= self.work_start) & (hours < self.work_end)
+
+    def date_string(self, day):
+        """
+        日序号对应的 "YYYY-MM-DD" 日期字符串
+        """
+        date = self._dates.get(day)
+        if date is None:
+            date = (_epoch + datetime.timedelta(days=int(day))).strftime("%Y-%m-%d")
+            self._dates[day] = date
+        return date
+
+
+def day_number(date):
+    """
+    "YYYY-MM-DD" 日期字符串（或 datetime.date）对应的日序号，与 WorkCalendar.calendar() 返回的日序号一致
+    """
+    if isinstance(date, str):
+        date = datetime.datetime.strptime(date, "%Y-%m-%d").date()
+    return (date - _epoch).days
+
+
+def period_ranges(first_day, last_day, period):
+    """
+    依次返回覆盖 [first_day, last_day] 的各个自然周（周一至周日，period="week"）或自然月（period="month"）
+    的 (第一天, 最后一天) 日序号
+    """
+    if period == "week":
+        start = first_day - (first_day + 3) % 7  # 1970-01-01 是周四
+        while start <= last_day:
+            yield start, start + 6
+            start += 7
+    elif period == "month":
+        date = (_epoch + datetime.timedelta(days=int(first_day))).replace(day=1)
+        while day_number(date) <= last_day:
+            next_month = (date + datetime.timedelta(days=32)).replace(day=1)
+            yield day_number(date), day_number(next_month) - 1
+            date = next_month
+    else:
+        raise ValueError(f"未知的周期: {period}")
@@ -0,0 +1,166 @@
+"""
+聊天记录导出文件的二进制列式缓存。
+
+第一次读取CSV时只把需要的三列写入CSV旁边的 <文件名>.moyu 目录：时间戳（int64）、昵称（字典编码）
+和消息内容（UTF-8字节缓冲区 + 偏移量），之后只要CSV没有变化，就直接以内存映射的方式加载，不再解析CSV
+"""
+import array
+import json
+import mmap
+import os
+import shutil
+
+import numpy as np
+
+from moyu_csv import iter_columns
+
+# 无法解析的时间戳
+missing_timestamp = np.iinfo(np.int64).min
+
+_format_version = 1
+
+
+# 缓存目录的位置：与CSV文件同目录
+def cache_dir(path):
+    return path + ".moyu"
+
+
+# CSV文件的签名，文件大小或修改时间变化后缓存失效
+def _source_signature(path, columns):
+    stat = os.stat(path)
+    return {
+        "version": _format_version,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "columns": list(columns),
+    }
+
+
+def is_fresh(path, columns):
+    meta_path = os.path.join(cache_dir(path), "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f) == _source_signature(path, columns)
+
+
+# 与逐行统计的 int() 一致地解析时间戳，无法解析或超出int64范围时返回 missing_timestamp
+def parse_timestamp(value):
+    try:
+        timestamp = int(value)
+    except ValueError:
+        return missing_timestamp
+    if not missing_timestamp < timestamp < 2 ** 63:
+        return missing_timestamp
+    return timestamp
+
+
+def build(path, columns, reader="csv"):
+    """
+    解析CSV并写入缓存。columns 为 (时间戳列, 消息列, 昵称列) 的索引，reader 为CSV读取方式（见 moyu_csv）；
+    与分析脚本一致，跳过表头和列数不足的行，无法解析的时间戳记为 missing_timestamp
+    """
+    directory = cache_dir(path)
+    tmp_directory = directory + ".tmp"
+    if os.path.exists(tmp_directory):
+        shutil.rmtree(tmp_directory)
+    os.makedirs(tmp_directory)
+
+    signature = _source_signature(path, columns)
+    timestamps = array.array("q")
+    nickname_codes = array.array("i")
+    byte_lengths = array.array("q")
+    char_lengths = array.array("q")
+    nickname_ids = {}
+
+    with open(os.path.join(tmp_directory, "messages.bin"), "wb") as out:
+        for timestamp, msg, nickname in iter_columns(path, columns, reader=reader):
+            data = msg.encode("utf-8")
+            out.write(data)
+            timestamps.append(parse_timestamp(timestamp))
+            nickname_codes.append(nickname_ids.setdefault(nickname, len(nickname_ids)))
+            byte_lengths.append(len(data))
+            char_lengths.append(len(msg))
+
+    np.save(os.path.join(tmp_directory, "timestamps.npy"), np.frombuffer(timestamps, dtype=np.int64))
+    np.save(os.path.join(tmp_directory, "nickname_codes.npy"), np.frombuffer(nickname_codes, dtype=np.int32))
+    for name, lengths in (("offsets.npy", byte_lengths), ("char_offsets.npy", char_lengths)):
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(lengths, dtype=np.int64), out=offsets[1:])
+        np.save(os.path.join(tmp_directory, name), offsets)
+    with open(os.path.join(tmp_directory, "nicknames.json"), "w", encoding="utf-8") as f:
+        json.dump(list(nickname_ids), f, ensure_ascii=False)
+    with open(os.path.join(tmp_directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(signature, f)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp_directory, directory)
+
+
+class ColumnarExport:
+    """
+    内存映射方式打开的列式缓存，按块读取时只解码当前块的消息
+    """
+
+    def __init__(self, directory):
+        self.timestamps = np.load(os.path.join(directory, "timestamps.npy"), mmap_mode="r")
+        self.nickname_codes = np.load(os.path.join(directory, "nickname_codes.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        self.char_offsets = np.load(os.path.join(directory, "char_offsets.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "nicknames.json"), "r", encoding="utf-8") as f:
+            self.nicknames = np.array(json.load(f), dtype=object)
+
+        self._file = open(os.path.join(directory, "messages.bin"), "rb")
+        if os.fstat(self._file.fileno()).st_size > 0:
+            self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.buffer = b""  # 空文件无法映射
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def messages(self, start, stop):
+        # 整块解码一次，再按字符偏移切分出每条消息
+        text = self.buffer[int(self.offsets[start]):int(self.offsets[stop])].decode("utf-8")
+        bounds = (self.char_offsets[start:stop + 1] - self.char_offsets[start]).tolist()
+        return [text[bounds[i]:bounds[i + 1]] for i in range(stop - start)]
+
+    def iter_chunks(self, chunk_size=None):
+        """
+        按块返回 (时间戳数组, 昵称数组, 消息列表)；chunk_size 为 None 时一次返回全部
+        """
+        chunk_size = chunk_size or max(len(self), 1)
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            yield (np.asarray(self.timestamps[start:stop]),
+                   self.nicknames[self.nickname_codes[start:stop]],
+                   self.messages(start, stop))
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_export(path, columns, reader="csv"):
+    """
+    打开CSV对应的列式缓存，缓存不存在或已过期时先用 reader 方式读取CSV重新生成。
+    缓存无法写入（例如导出文件所在的目录只读）时打印提示并返回 None，调用方直接读取CSV
+    """
+    os.stat(path)  # CSV文件不存在时直接抛出 FileNotFoundError
+    if not is_fresh(path, columns):
+        print(f"正在生成 {path} 的二进制缓存...")
+        try:
+            build(path, columns, reader)
+        except OSError as e:
+            shutil.rmtree(cache_dir(path) + ".tmp", ignore_errors=True)
+            print(f"无法写入二进制缓存（{e}），直接读取CSV文件")
+            return None
+    return ColumnarExport(cache_dir(path))
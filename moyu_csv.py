@@ -0,0 +1,173 @@
+"""
+按列读取导出的CSV文件，只返回需要的几列，跳过表头和列数不足的行。
+
+提供两种读取方式：
+- "csv"：标准库 csv.reader，会解码并创建每一行所有字段的字符串
+- "mmap"：以内存映射方式打开文件，用正则定位需要的列，其余的列（例如大段的BytesExtra、XML）
+  既不解码也不创建对象，直接用 find 跳到行尾。解析结果与 csv.reader 完全一致，
+  支持带引号、包含逗号、双引号转义和换行的多行字段
+
+两种方式都可以只读取文件中 [start, end) 字节范围内的行，配合 row_boundaries() 把一个文件切分为多个分片分别处理
+"""
+import csv
+import io
+import mmap
+import os
+import re
+
+# 一个字段：带引号的字段（引号内可以有逗号、换行，"" 表示一个双引号，结束引号后的字符与 csv.reader 一样
+# 直接拼接在后面；引号直到文件末尾都没有结束时读到文件末尾），或者不带引号的字段。
+# 结束引号后面不能紧跟引号，不带引号的字段不能以引号开头，因此每一行只有一种匹配方式，匹配失败时不会回溯出错误的切分
+_field = rb'(?:"[^"]*(?:""[^"]*)*(?:"(?!")[^,\r\n]*|\Z)|(?:[^",\r\n][^,\r\n]*)?)'
+
+# 需要提取的字段：分别捕获引号内的内容、引号后的多余字符和不带引号的内容
+_captured_field = rb'(?:"([^"]*(?:""[^"]*)*)(?:"(?!")([^,\r\n]*)|\Z)|((?:[^",\r\n][^,\r\n]*)?))'
+
+_line_end = rb'(?:\r\n|\n|\r|\Z)'
+
+# 一行中剩余的字段和行尾
+_rest_of_row = re.compile(rb'(?:,' + _field + rb')*' + _line_end)
+
+# 跳过一整行（用于表头和列数不足的行）
+_skip_row = re.compile(_field + _rest_of_row.pattern)
+
+
+# 切分分片时每次统计引号个数的字节数
+_scan_block_size = 1 << 24
+
+
+def row_boundaries(path, count):
+    """
+    把文件按字节大致均分为 count 个分片，返回 count + 1 个偏移量（第一个为0，最后一个为文件大小），
+    每个偏移量都是一行的开头，不会落在带引号的多行字段中间。
+    按引号个数的奇偶判断是否位于引号内，要求字段内的引号按标准CSV格式转义（csv.writer 导出的文件都满足）
+    """
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, "rb") as f:
+        if not size:
+            return [0] * count + [0]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            pos = 0
+            quotes = 0  # pos 之前的引号个数
+            for i in range(1, count):
+                target = max(size * i // count, pos)
+                # 统计到目标位置为止的引号个数，然后找到之后第一个不在引号内的换行符
+                while pos < target:
+                    block_end = min(pos + _scan_block_size, target)
+                    quotes += buffer[pos:block_end].count(b'"')
+                    pos = block_end
+                while pos < size:
+                    line_end = buffer.find(b"\n", pos)
+                    if line_end < 0:
+                        line_end = size - 1
+                    quotes += buffer[pos:line_end + 1].count(b'"')
+                    pos = line_end + 1
+                    if quotes % 2 == 0:
+                        break
+                boundaries.append(pos)
+    boundaries.append(size)
+    return boundaries
+
+
+class _RangeFile(io.RawIOBase):
+    """
+    只读取文件中 [start, end) 范围的内容
+    """
+
+    def __init__(self, path, start, end):
+        self.file = open(path, "rb", buffering=0)
+        self.file.seek(start)
+        self.remaining = max(0, end - start)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.file.readinto(memoryview(buffer)[:self.remaining])
+        self.remaining -= n
+        return n
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def _decode(quoted, suffix, plain):
+    if quoted is None:
+        return plain.decode("utf-8")
+    value = quoted.replace(b'""', b'"')
+    if suffix:
+        value += suffix
+    if b"\r" in value:
+        # 与以默认换行模式打开文件的 csv.reader 一致，字段内的 \r\n 和 \r 都读作 \n
+        value = value.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    return value.decode("utf-8")
+
+
+def _iter_columns_csv(path, columns, skip_header, start, end):
+    width = max(columns)
+    if start == 0 and end is None:
+        f = open(path, "r", encoding="utf-8")
+    else:
+        # 与 open(path, "r") 相同的解码和换行处理，只是读到 end 为止
+        f = io.TextIOWrapper(io.BufferedReader(_RangeFile(path, start, end)), encoding="utf-8")
+    with f:
+        reader = csv.reader(f)
+        if skip_header:
+            next(reader, None)
+        for row in reader:
+            if len(row) <= width:
+                continue  # 跳过格式不正确的行
+            yield tuple(row[column] for column in columns)
+
+
+def _iter_columns_mmap(path, columns, skip_header, start, end):
+    order = sorted(set(columns))
+    # 只匹配到最后一个需要的列为止
+    prefix = re.compile(b",".join(
+        _captured_field if i in order else _field for i in range(order[-1] + 1)
+    ))
+    # 每个需要的列在匹配结果中占3个分组
+    groups = [3 * order.index(column) for column in columns]
+
+    with open(path, "rb") as f:
+        if not f.seek(0, 2):
+            return  # 空文件无法映射
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            end = len(buffer) if end is None else min(end, len(buffer))
+            find = buffer.find
+            pos = _skip_row.match(buffer, start).end() if skip_header else start
+
+            while pos < end:
+                match = prefix.match(buffer, pos)
+                # 跳过列数不足的行和空行（csv.reader 把空行读作 []）
+                if match is None or (match.end() == pos and buffer[pos:pos + 1] != b","):
+                    pos = _skip_row.match(buffer, pos).end()
+                    continue
+
+                # 剩下的列里没有引号和单独的 \r 时，行尾就是下一个换行符，不需要再逐个字段匹配
+                pos = match.end()
+                line_end = find(b"\n", pos)
+                if line_end < 0:
+                    line_end = end
+                if find(b'"', pos, line_end) < 0 and find(b"\r", pos, line_end - 1) < 0:
+                    pos = line_end + 1
+                else:
+                    pos = _rest_of_row.match(buffer, pos).end()
+
+                values = match.groups()
+                yield tuple(_decode(*values[group:group + 3]) for group in groups)
+
+
+def iter_columns(path, columns, skip_header=True, reader="csv", start=0, end=None):
+    """
+    逐行返回 columns 指定的各列组成的元组（字符串），跳过表头和列数不足的行。
+    reader 为 "csv" 或 "mmap"，两种方式的结果完全一致。
+    指定 start/end 时只读取从 start 开始、在 end 之前开始的行，二者都应为 row_boundaries() 返回的行开头
+    """
+    if reader == "mmap":
+        return _iter_columns_mmap(path, columns, skip_header, start, end)
+    if reader == "csv":
+        return _iter_columns_csv(path, columns, skip_header, start, end)
+    raise ValueError(f"未知的CSV读取方式: {reader}")
@@ -0,0 +1,240 @@
+"""
+核心统计数据：所有有效消息按 用户 × 星期 × 小时 计数的NumPy立方体，以及按日的计数，
+排行榜、时间分布、工作日趋势、用户对比和热力图都由数组的切片和求和得到
+"""
+from collections import Counter
+
+import numpy as np
+
+# 一个用户在立方体中占用的格子数（7天 × 24小时）
+_cells_per_user = 7 * 24
+
+
+# np.bincount 带权重时返回浮点数，这里转回整数计数
+def _bincount(values, weights, minlength):
+    if weights is None:
+        return np.bincount(values, minlength=minlength)
+    return np.bincount(values, weights=weights, minlength=minlength).astype(np.int64)
+
+
+class CountCube:
+    """
+    昵称按首次出现的顺序映射为从0开始的整数id，所有有效消息的数量保存在
+    counts[用户id, 星期, 小时]（int32，星期 0=周一）中。按日的计数只保存有消息的日期：
+    days 为排好序的日序号，day_hour[i, 小时] 为第 days[i] 天的全部消息数，
+    day_user[i, 用户id] 为第 days[i] 天该用户在工作时间的消息数。
+    按日的计数在第一次查询日期范围时沿日期累加为前缀和，之后任意日期范围的统计只需两行相减。
+    work_hours 为工作日的工作时间 [开始小时, 结束小时)
+    """
+
+    def __init__(self, work_hours=(9, 18)):
+        self.work_start, self.work_end = work_hours
+        self.names = []  # 用户id -> 昵称
+        self.ids = {}  # 昵称 -> 用户id
+        self.counts = np.zeros((0, 7, 24), dtype=np.int32)
+        self.days = np.zeros(0, dtype=np.int64)
+        self.day_hour = np.zeros((0, 24), dtype=np.int32)
+        self.day_user = np.zeros((0, 0), dtype=np.int32)
+        # 在工作时间发过言的用户id，按各自第一条工作时间消息的顺序（排名并列时按这个顺序）
+        self.work_order = {}
+        self._prefix_sums = None  # 按日计数的前缀和，计数变化后重新计算
+
+    # 前缀和可以随时重新计算，不随统计状态一起保存
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_prefix_sums"] = None
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("_prefix_sums", None)
+        self.__dict__.update(state)
+
+    def intern(self, name):
+        """
+        返回昵称的用户id，第一次出现的昵称分配新的id
+        """
+        uid = self.ids.get(name)
+        if uid is None:
+            uid = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return uid
+
+    # 为新分配的用户id扩展数组
+    def _grow_users(self):
+        added = len(self.names) - self.counts.shape[0]
+        if added > 0:
+            self.counts = np.concatenate([self.counts, np.zeros((added, 7, 24), dtype=np.int32)])
+            self.day_user = np.concatenate(
+                [self.day_user, np.zeros((len(self.days), added), dtype=np.int32)], axis=1)
+
+    # 返回 days（排好序且不重复）在 self.days 中的行号，没有的日期插入新的行
+    def _day_rows(self, days):
+        new = np.setdiff1d(days, self.days, assume_unique=True)
+        if len(new):
+            merged = np.union1d(self.days, new)
+            rows = np.searchsorted(merged, self.days)
+            day_hour = np.zeros((len(merged), 24), dtype=np.int32)
+            day_hour[rows] = self.day_hour
+            day_user = np.zeros((len(merged), self.day_user.shape[1]), dtype=np.int32)
+            day_user[rows] = self.day_user
+            self.days, self.day_hour, self.day_user = merged, day_hour, day_user
+        return np.searchsorted(self.days, days)
+
+    def add_cells(self, cells, days, counts=None):
+        """
+        批量累加消息：cells[i] = (用户id * 7 + 星期) * 24 + 小时，days[i] 为日序号；
+        counts[i] 为这一项代表的消息数（已经聚合过的计数），None 表示每项一条消息
+        """
+        cells = np.asarray(cells, dtype=np.int64)
+        if not len(cells):
+            return
+        days = np.asarray(days, dtype=np.int64)
+        weights = None if counts is None else np.asarray(counts, dtype=np.int64)
+        self._prefix_sums = None
+        self._grow_users()
+        users = len(self.names)
+        self.counts += _bincount(cells, weights, users * _cells_per_user).reshape(users, 7, 24)
+
+        uids, weekdays, hours = cells // _cells_per_user, cells // 24 % 7, cells % 24
+        work = (weekdays < 5) & (hours >= self.work_start) & (hours < self.work_end)
+        work_uids = uids[work]
+        first_uids, first_index = np.unique(work_uids, return_index=True)
+        for uid in first_uids[np.argsort(first_index)].tolist():
+            self.work_order.setdefault(uid, None)
+
+        unique_days, day_index = np.unique(days, return_inverse=True)
+        rows = self._day_rows(unique_days)
+        self.day_hour[rows] += _bincount(day_index * 24 + hours, weights,
+                                         len(unique_days) * 24).reshape(-1, 24)
+        self.day_user[rows] += _bincount(day_index[work] * users + work_uids,
+                                         None if weights is None else weights[work],
+                                         len(unique_days) * users).reshape(-1, users)
+
+    def add(self, uids, days, weekdays, hours, counts=None):
+        """
+        批量累加消息，参数为等长的数组，counts 的含义与 add_cells() 相同
+        """
+        uids = np.asarray(uids, dtype=np.int64)
+        weekdays = np.asarray(weekdays, dtype=np.int64)
+        hours = np.asarray(hours, dtype=np.int64)
+        self.add_cells((uids * 7 + weekdays) * 24 + hours, days, counts)
+
+    def merge(self, other):
+        """
+        把 other 累加进来（other 中的消息在文件中位于本立方体的消息之后），用户按昵称对应
+        """
+        mapping = np.array([self.intern(name) for name in other.names], dtype=np.int64)
+        self._prefix_sums = None
+        self._grow_users()
+        if len(mapping):
+            self.counts[mapping] += other.counts
+        rows = self._day_rows(other.days)
+        self.day_hour[rows] += other.day_hour
+        if len(mapping) and len(rows):
+            self.day_user[np.ix_(rows, mapping)] += other.day_user
+        for uid in other.work_order:
+            self.work_order.setdefault(int(mapping[uid]), None)
+        return self
+
+    def user_work_counts(self):
+        """
+        每个用户在工作时间的消息数（按用户id）
+        """
+        return self.counts[:, :5, self.work_start:self.work_end].sum(axis=(1, 2))
+
+    def moyu_counter(self):
+        """
+        用户在工作时间的消息数（Counter），按第一条工作时间消息的顺序插入，most_common() 并列时的顺序与逐条累加一致
+        """
+        work_counts = self.user_work_counts()
+        return Counter({self.names[uid]: int(work_counts[uid]) for uid in self.work_order})
+
+    def work_message_count(self):
+        return int(self.counts[:, :5, self.work_start:self.work_end].sum())
+
+    def message_count(self):
+        return int(self.counts.sum())
+
+    def hour_counts(self):
+        """
+        全部有效消息的24小时分布
+        """
+        return self.counts.sum(axis=(0, 1)).tolist()
+
+    def weekday_counts(self):
+        """
+        周一至周五全部有效消息的数量
+        """
+        return self.counts[:, :5, :].sum(axis=(0, 2)).tolist()
+
+    def user_hour_counts(self, name):
+        """
+        用户在工作日每个小时的消息数（24个），工作时间的各小时即为该用户工作时间内的时间分布
+        """
+        return self.counts[self.ids[name], :5, :].sum(axis=0).tolist()
+
+    def user_weekday_counts(self, name):
+        """
+        用户在周一至周五每天工作时间内的消息数
+        """
+        return self.counts[self.ids[name], :5, self.work_start:self.work_end].sum(axis=1).tolist()
+
+    def heatmap(self):
+        """
+        全部有效消息的 星期 × 小时 分布（7 × 24）
+        """
+        return self.counts.sum(axis=0)
+
+    def work_day_count(self):
+        """
+        有消息的工作日（周一至周五）天数
+        """
+        return int(np.count_nonzero((self.days + 3) % 7 < 5))  # 1970-01-01 是周四
+
+    # 按日计数沿日期方向的前缀和（首行为0），第 lo 到 hi-1 行的和为 prefix[hi] - prefix[lo]
+    def _prefix(self):
+        if self._prefix_sums is None:
+            def prefix(day_counts):
+                sums = np.zeros((len(day_counts) + 1,) + day_counts.shape[1:], dtype=np.int64)
+                np.cumsum(day_counts, axis=0, out=sums[1:])
+                return sums
+
+            weekdays = (self.days + 3) % 7
+            day_weekday = np.zeros((len(self.days), 7), dtype=np.int64)
+            day_weekday[np.arange(len(self.days)), weekdays] = self.day_hour.sum(axis=1)
+            self._prefix_sums = {
+                "user": prefix(self.day_user),
+                "hour": prefix(self.day_hour),
+                "weekday": prefix(day_weekday),
+                "work_days": prefix(weekdays < 5),
+            }
+        return self._prefix_sums
+
+    def day_rows(self, first=None, last=None):
+        """
+        日序号在 [first, last] 之间（包含两端，None 表示不限）的日期在 days 中的行范围 (lo, hi)
+        """
+        lo = 0 if first is None else int(np.searchsorted(self.days, first, "left"))
+        hi = len(self.days) if last is None else int(np.searchsorted(self.days, last, "right"))
+        return lo, max(lo, hi)
+
+    def _range_sum(self, key, first, last):
+        lo, hi = self.day_rows(first, last)
+        sums = self._prefix()[key]
+        return sums[hi] - sums[lo]
+
+    def range_moyu_counter(self, first=None, last=None):
+        """
+        日期范围内用户在工作时间的消息数（Counter，只包含消息数大于0的用户），插入顺序与 moyu_counter() 相同
+        """
+        work_counts = self._range_sum("user", first, last)
+        return Counter({self.names[uid]: int(work_counts[uid]) for uid in self.work_order if work_counts[uid]})
+
+    def range_hour_counts(self, first=None, last=None):
+        return self._range_sum("hour", first, last).tolist()
+
+    def range_weekday_counts(self, first=None, last=None):
+        return self._range_sum("weekday", first, last)[:5].tolist()
+
+    def range_work_day_count(self, first=None, last=None):
+        return int(self._range_sum("work_days", first, last))
@@ -0,0 +1,106 @@
+"""
+图表渲染：把已经统计好的数据画成PNG，支持把各个图表/词云交给进程池并行渲染
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+
+import matplotlib
+import matplotlib.pyplot as plt
+from wordcloud import WordCloud
+
+# 需要同步到渲染子进程的matplotlib全局设置
+_synced_rc_params = ("font.sans-serif", "axes.unicode_minus")
+
+# 预览模式：画布边长缩小的倍数和最多显示的词数
+preview_shrink = 2
+preview_max_words = 50
+
+# 800x400 画布上的最小/最大字号，其他画布大小按宽度等比例缩放
+_base_width = 800
+_base_min_font_size = 10
+_base_max_font_size = 150
+
+
+def wordcloud_budget(max_words=200, width=800, height=400, scale=1, preview=False):
+    """
+    返回实际使用的渲染预算（dict，可以pickle后传给渲染子进程）。
+    词云排版耗时主要取决于词数和画布面积；preview 为 True 时缩小画布、减少词数并忽略 scale，用于快速预览
+    """
+    if preview:
+        width, height = width // preview_shrink, height // preview_shrink
+        max_words = min(max_words, preview_max_words)
+        scale = 1
+    return {"max_words": max_words, "width": width, "height": height, "scale": scale, "preview": preview}
+
+
+# 词云的默认渲染预算
+default_wordcloud_budget = wordcloud_budget()
+
+
+# 按渲染预算从词频（Counter）生成词云，不再重新分词
+def make_wordcloud(word_counter, font_path, budget=default_wordcloud_budget):
+    ratio = budget["width"] / _base_width
+    wordcloud = WordCloud(
+        font_path=font_path,
+        width=budget["width"],
+        height=budget["height"],
+        scale=budget["scale"],
+        max_words=budget["max_words"],
+        background_color="white",
+        min_font_size=max(1, round(_base_min_font_size * ratio)),
+        max_font_size=round(_base_max_font_size * ratio)
+    )
+    return wordcloud.generate_from_frequencies(word_counter)
+
+
+# 创建显示词云的图表，图片像素与词云画布一致（800x400 的画布对应 10x5 英寸、100 dpi）
+def wordcloud_figure(budget=default_wordcloud_budget):
+    return plt.figure(figsize=(10, 10 * budget["height"] / budget["width"]),
+                      dpi=100 * budget["width"] * budget["scale"] / _base_width)
+
+
+# 把图表渲染为PNG字节，然后关闭图表释放内存
+def figure_png(fig):
+    buf = BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight')
+    png = buf.getvalue()
+    buf.close()
+    plt.close(fig)
+    return png
+
+
+# 子进程初始化：使用非交互式的Agg后端，字体设置与主进程一致
+def _init_worker(rc_params):
+    matplotlib.use("Agg")
+    plt.rcParams.update(rc_params)
+
+
+class ChartRenderer:
+    """
+    图表渲染器，submit(func, *args) 返回结果为PNG字节的 Future；func 必须是模块级函数，参数可以pickle。
+    workers 大于1时使用进程池并行渲染，否则在提交时直接在当前进程中渲染
+    """
+
+    def __init__(self, workers=1):
+        self.pool = None
+        if workers > 1:
+            rc_params = {key: plt.rcParams[key] for key in _synced_rc_params}
+            self.pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(rc_params,))
+
+    def submit(self, func, *args):
+        if self.pool is not None:
+            return self.pool.submit(func, *args)
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,50 @@
+"""
+流式写出HTML报告：每一部分生成后立即写入文件，不在内存中拼接整个报告
+"""
+import base64
+import os
+from urllib.parse import quote
+
+
+class ReportWriter:
+    """
+    把HTML片段依次写入报告文件。先写入临时文件，close() 时再替换为正式的报告，
+    中途出错不会留下不完整的报告。
+    embed_images 为 True 时图片以base64内嵌在报告中；为 False 时只以相对路径引用同目录下的PNG文件，
+    报告体积和内存占用都小得多，但报告需要和PNG文件放在一起
+    """
+
+    def __init__(self, path, embed_images=True):
+        self.path = path
+        self.directory = os.path.dirname(path)
+        self.embed_images = embed_images
+        self.file = open(path + ".tmp", "w", encoding="utf-8")
+
+    def write(self, html):
+        self.file.write(html)
+
+    def image(self, png, filename):
+        """
+        把PNG字节保存到报告所在目录，返回 <img> 标签的 src
+        """
+        with open(os.path.join(self.directory, filename), "wb") as f:
+            f.write(png)
+        if self.embed_images:
+            return "data:image/png;base64," + base64.b64encode(png).decode('utf-8')
+        return quote(filename)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.path + ".tmp")
@@ -0,0 +1,410 @@
+"""
+本地查询服务：只读取一次导出文件，把计数立方体、每个用户和每天的词频保存在内存中，
+通过本地的 HTTP/JSON 接口回答排行榜、时间分布和词频等临时问题，图表在第一次请求时渲染并缓存。
+
+用法：
+    python moyu_server.py bj.csv [--port 8765]
+    curl "http://127.0.0.1:8765/api/ranking?from=2024-03-01&to=2024-03-31"
+    curl "http://127.0.0.1:8765/api/hours?user=张三"
+    curl -o words.png "http://127.0.0.1:8765/chart/wordcloud.png?from=2024-03-01"
+
+接口（均为 GET，日期参数 from/to 为 "YYYY-MM-DD"，包含两端，可以只指定一端）：
+    /api/summary                          消息数、用户数、工作日数和日期范围
+    /api/ranking?from&to&top              工作时间消息数排行
+    /api/rolling?period=week|month&count&top  最近几个自然周/自然月各自的排行
+    /api/hours?from&to 或 ?user           24小时消息分布（指定用户时为该用户工作日的分布）
+    /api/weekdays?from&to 或 ?user        周一至周五的消息数（指定用户时为该用户工作时间内的消息数）
+    /api/heatmap                          星期 × 小时的消息数（7 × 24）
+    /api/words?user 或 ?from&to，&top     工作时间内消息的高频词
+    /chart/<名称>.png                     ranking、efficiency、hours、weekdays、heatmap、wordcloud，参数与对应的接口相同
+"""
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+import traceback
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from moyu_analyzer import (AnalysisError, Config, date_range_ranking, font_path, iter_column_frames,
+                           make_work_calendar, new_stats, parse_date, parse_timezone, plot_detailed_users_time,
+                           plot_detailed_users_weekday, plot_efficiency, plot_heatmap, plot_ranking,
+                           plot_time_distribution, plot_weekday_trend, plot_wordcloud, result_dir, rolling_rankings,
+                           stop_words, update_stats_vectorized, word_sketch_sizes)
+from moyu_calendar import day_number
+
+# 默认只监听本机
+serve_host = "127.0.0.1"
+serve_port = 8765
+
+# 缓存的图表数量和日期范围词频的数量，超出时淘汰最久未使用的
+chart_cache_size = 64
+range_words_cache_size = 128
+
+
+class QueryError(Exception):
+    """
+    请求的参数无效（400）或查询的用户不存在（404）
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def load_index(path, config):
+    """
+    分块读取导出文件（与 --ingest-mode stream 相同），读取时即分词，返回 AnalysisIndex。读取失败时抛出 AnalysisError
+    """
+    from moyu_token_cache import TokenCache
+    from moyu_tokenizer import Tokenizer, use_dictionary_cache
+
+    work_calendar = make_work_calendar(config)
+    if config.jieba_cache_dir:
+        use_dictionary_cache(config.jieba_cache_dir)
+    token_cache = None
+    if config.use_token_cache:
+        os.makedirs(config.result_dir, exist_ok=True)
+        token_cache = TokenCache(os.path.join(config.result_dir, config.token_cache_file), stop_words)
+
+    stats = new_stats(work_calendar, word_sketch_sizes(config))
+    # 近似词频时不按日保存词频，否则内存占用又会随词汇量增长
+    day_word_counters = None if config.approximate_words else {}
+    try:
+        with Tokenizer(stop_words, config.workers, token_cache) as tokenizer:
+            for chunk in iter_column_frames(path, config, chunksize=config.chunk_size):
+                update_stats_vectorized(stats, chunk, work_calendar, tokenizer, keep_messages=False,
+                                        day_word_counters=day_word_counters)
+    except Exception as e:
+        raise AnalysisError(f"读取CSV文件时出错: {e}") from e
+    return AnalysisIndex(stats, day_word_counters, work_calendar, config)
+
+
+class AnalysisIndex:
+    """
+    内存中的分析索引：排行榜和时间分布由计数立方体（及其按日前缀和）得到，
+    词频来自每个用户的词频和每天的词频，日期范围的词频按日累加后缓存。
+    日期参数为 "YYYY-MM-DD" 字符串（包含两端），None 表示不限
+    """
+
+    def __init__(self, stats, day_word_counters, work_calendar, config):
+        self.stats = stats
+        self.cube = stats["cube"]
+        self.user_word_counters = stats["user_word_counters"]
+        self.day_word_counters = day_word_counters
+        self.work_calendar = work_calendar
+        self.config = config
+        self.work_hours = list(range(work_calendar.work_start, work_calendar.work_end))
+        self.word_sketch = stats["word_sketch"]
+        if self.word_sketch is None:
+            self.word_counter = Counter()
+            for user_word_counter in self.user_word_counters.values():
+                self.word_counter.update(user_word_counter)
+        else:
+            self.word_counter = self.word_sketch.counter()
+        self._range_words = functools.lru_cache(maxsize=range_words_cache_size)(self._sum_day_words)
+
+    def _check_user(self, user):
+        if user not in self.cube.ids:
+            raise QueryError(f"没有这个用户: {user}", 404)
+
+    @staticmethod
+    def _days(date_from, date_to):
+        return (None if date_from is None else day_number(date_from),
+                None if date_to is None else day_number(date_to))
+
+    def summary(self):
+        cube = self.cube
+        return {
+            "messages": cube.message_count(),
+            "work_messages": cube.work_message_count(),
+            "users": len(cube.names),
+            "work_days": cube.work_day_count(),
+            "first_day": self.work_calendar.date_string(int(cube.days[0])) if len(cube.days) else None,
+            "last_day": self.work_calendar.date_string(int(cube.days[-1])) if len(cube.days) else None,
+        }
+
+    def ranking(self, date_from=None, date_to=None, top=10):
+        """
+        date_range_ranking() 的结果：{"label", "work_days", "work_messages", "ranking": [(昵称, 消息数)]}
+        """
+        return date_range_ranking(self.cube, date_from, date_to, top)
+
+    def rolling(self, period="week", count=12, top=3):
+        return rolling_rankings(self.cube, self.work_calendar, period, count, top)
+
+    def hour_counts(self, date_from=None, date_to=None, user=None):
+        if user is not None:
+            if date_from or date_to:
+                raise QueryError("按用户统计时不支持日期范围")
+            self._check_user(user)
+            return self.cube.user_hour_counts(user)
+        return self.cube.range_hour_counts(*self._days(date_from, date_to))
+
+    def weekday_counts(self, date_from=None, date_to=None, user=None):
+        if user is not None:
+            if date_from or date_to:
+                raise QueryError("按用户统计时不支持日期范围")
+            self._check_user(user)
+            return self.cube.user_weekday_counts(user)
+        return self.cube.range_weekday_counts(*self._days(date_from, date_to))
+
+    def heatmap(self):
+        return self.cube.heatmap().tolist()
+
+    # 日期范围内各天词频之和（按 _range_words 缓存）
+    def _sum_day_words(self, first, last):
+        word_counter = Counter()
+        for day in sorted(self.day_word_counters):
+            if (first is None or day >= first) and (last is None or day <= last):
+                word_counter.update(self.day_word_counters[day])
+        return word_counter
+
+    def word_counter_for(self, date_from=None, date_to=None, user=None):
+        """
+        返回 (词频, 近似词频时计数可能偏高的上限)；用户和日期范围不能同时指定
+        """
+        if user is not None:
+            if date_from or date_to:
+                raise QueryError("按用户统计词频时不支持日期范围")
+            self._check_user(user)
+            user_word_counter = self.user_word_counters.get(user)
+            if user_word_counter is None:  # 没有工作时间的消息
+                return Counter(), None
+            if self.word_sketch is None:
+                return user_word_counter, None
+            return user_word_counter.counter(), user_word_counter.error_bound()
+        if date_from or date_to:
+            if self.day_word_counters is None:
+                raise QueryError("近似词频模式下不支持按日期范围统计词频")
+            return self._range_words(*self._days(date_from, date_to)), None
+        return self.word_counter, None if self.word_sketch is None else self.word_sketch.error_bound()
+
+    def top_words(self, date_from=None, date_to=None, user=None, top=20):
+        word_counter, error = self.word_counter_for(date_from, date_to, user)
+        return {"words": word_counter.most_common(top), "error_bound": error}
+
+    def chart(self, name, date_from=None, date_to=None, user=None, top=10):
+        """
+        返回 (绘图函数, 参数)，由 QueryServer 渲染
+        """
+        if name == "ranking":
+            return plot_ranking, (self.ranking(date_from, date_to, top)["ranking"], self.config.key_users)
+        if name == "efficiency":
+            ranking = self.ranking(date_from, date_to, top)
+            if not ranking["work_days"]:
+                raise QueryError("日期范围内没有工作日")
+            return plot_efficiency, (ranking["ranking"], ranking["work_days"], self.config.key_users)
+        if name == "hours":
+            hour_counts = self.hour_counts(date_from, date_to, user)
+            if user is None:
+                return plot_time_distribution, (hour_counts, self.work_hours)
+            work_hour_counts = hour_counts[self.work_calendar.work_start:self.work_calendar.work_end]
+            return plot_detailed_users_time, ([user], {user: work_hour_counts}, self.work_hours)
+        if name == "weekdays":
+            weekday_counts = self.weekday_counts(date_from, date_to, user)
+            if user is None:
+                return plot_weekday_trend, (weekday_counts,)
+            return plot_detailed_users_weekday, ([user], {user: weekday_counts})
+        if name == "heatmap":
+            return plot_heatmap, (self.heatmap(), self.work_hours)
+        if name == "wordcloud":
+            from moyu_render import wordcloud_budget
+
+            word_counter, _ = self.word_counter_for(date_from, date_to, user)
+            if not word_counter:
+                raise QueryError("没有足够的内容生成词云")
+            config = self.config
+            budget = wordcloud_budget(config.wordcloud_max_words, config.wordcloud_width, config.wordcloud_height,
+                                      config.wordcloud_scale, config.wordcloud_preview)
+            title = '摸鱼内容词云' if user is None else f'{user}的摸鱼内容词云'
+            return plot_wordcloud, (word_counter, title, budget, config.font_path)
+        raise QueryError(f"没有这个图表: {name}", 404)
+
+
+# 解析查询参数：from/to 为日期，top/count 为正整数
+def _query_params(query):
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+    options = {}
+    try:
+        for key, option in (("from", "date_from"), ("to", "date_to")):
+            if params.get(key):
+                options[option] = parse_date(params[key])
+    except argparse.ArgumentTypeError as e:
+        raise QueryError(str(e))
+    if options.get("date_from") and options.get("date_to") and options["date_from"] > options["date_to"]:
+        raise QueryError("from 的日期不能晚于 to")
+    for key in ("top", "count"):
+        if key in params:
+            if not params[key].isdigit() or int(params[key]) < 1:
+                raise QueryError(f"{key} 应为正整数: {params[key]}")
+            options[key] = int(params[key])
+    if params.get("user"):
+        options["user"] = params["user"]
+    if "period" in params:
+        if params["period"] not in ("week", "month"):
+            raise QueryError(f"period 应为 week 或 month: {params['period']}")
+        options["period"] = params["period"]
+    return options
+
+
+# 每个接口接受的参数
+_api_params = {
+    "summary": (),
+    "ranking": ("date_from", "date_to", "top"),
+    "rolling": ("period", "count", "top"),
+    "hours": ("date_from", "date_to", "user"),
+    "weekdays": ("date_from", "date_to", "user"),
+    "heatmap": (),
+    "words": ("date_from", "date_to", "user", "top"),
+}
+
+_chart_params = ("date_from", "date_to", "user", "top")
+
+
+class QueryServer(ThreadingHTTPServer):
+    """
+    在 AnalysisIndex 上提供 HTTP/JSON 查询接口的服务器，渲染好的图表按 (名称, 参数) 缓存
+    """
+
+    daemon_threads = True
+
+    def __init__(self, index, address=(serve_host, serve_port)):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from moyu_render import ChartRenderer
+
+        plt.rcParams['font.sans-serif'] = ['Microsoft YaHei']
+        plt.rcParams['axes.unicode_minus'] = False
+        self.index = index
+        self.renderer = ChartRenderer(index.config.workers)
+        self.charts = OrderedDict()  # (名称, 参数) -> PNG字节
+        # matplotlib 不是线程安全的，同一时间只渲染一张图表
+        self.render_lock = threading.Lock()
+        super().__init__(address, QueryHandler)
+
+    def query(self, name, options):
+        index = self.index
+        if name not in _api_params:
+            raise QueryError(f"没有这个接口: {name}", 404)
+        unknown = set(options) - set(_api_params[name])
+        if unknown:
+            raise QueryError(f"接口 {name} 不支持参数: {', '.join(sorted(unknown))}")
+        if name == "summary":
+            return index.summary()
+        if name == "ranking":
+            return index.ranking(**options)
+        if name == "rolling":
+            return index.rolling(**options)
+        if name == "hours":
+            return index.hour_counts(**options)
+        if name == "weekdays":
+            return index.weekday_counts(**options)
+        if name == "heatmap":
+            return index.heatmap()
+        return index.top_words(**options)
+
+    def chart(self, name, options):
+        unknown = set(options) - set(_chart_params)
+        if unknown:
+            raise QueryError(f"图表不支持参数: {', '.join(sorted(unknown))}")
+        key = (name, tuple(sorted(options.items())))
+        with self.render_lock:
+            png = self.charts.get(key)
+            if png is None:
+                func, args = self.index.chart(name, **options)
+                png = self.charts[key] = self.renderer.submit(func, *args).result()
+                if len(self.charts) > chart_cache_size:
+                    self.charts.popitem(last=False)
+            self.charts.move_to_end(key)
+        return png
+
+    def server_close(self):
+        super().server_close()
+        self.renderer.close()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = unquote(url.path).rstrip("/")
+        try:
+            options = _query_params(url.query)
+            if path.startswith("/api/"):
+                data = self.server.query(path[len("/api/"):], options)
+                self._send(200, "application/json; charset=utf-8",
+                           json.dumps(data, ensure_ascii=False).encode("utf-8"))
+            elif path.startswith("/chart/") and path.endswith(".png"):
+                png = self.server.chart(path[len("/chart/"):-len(".png")], options)
+                self._send(200, "image/png", png)
+            elif path == "":
+                endpoints = [f"/api/{name}" for name in _api_params] + ["/chart/<名称>.png"]
+                self._send(200, "application/json; charset=utf-8",
+                           json.dumps({"endpoints": endpoints}, ensure_ascii=False).encode("utf-8"))
+            else:
+                raise QueryError(f"没有这个接口: {path}", 404)
+        except QueryError as e:
+            self._send_error(e.status, str(e))
+        except Exception as e:
+            # 查询或渲染时的其他错误（例如词云字体无法打开）记录到标准错误，返回500，不直接断开连接
+            self.log_error("处理 %s 时出错:\n%s", self.path, traceback.format_exc())
+            self._send_error(500, f"服务器内部错误: {e}")
+
+    def _send_error(self, status, message):
+        self._send(status, "application/json; charset=utf-8",
+                   json.dumps({"error": message}, ensure_ascii=False).encode("utf-8"))
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(path, config=None, host=serve_host, port=serve_port):
+    """
+    读取导出文件并在 host:port 上提供查询服务，直到按 Ctrl+C 结束
+    """
+    if config is None:
+        config = Config()
+    print(f"正在读取 {path} ...")
+    start = time.perf_counter()
+    index = load_index(path, config)
+    print(f"读取完成，耗时 {time.perf_counter() - start:.1f} 秒，"
+          f"共 {index.cube.message_count()} 条有效消息、{len(index.cube.names)} 个用户")
+    with QueryServer(index, (host, port)) as server:
+        print(f"查询服务已启动: http://{host}:{server.server_port}/ （按 Ctrl+C 结束）")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="读取一次聊天记录，通过本地HTTP接口查询排行榜、时间分布和词频")
+    parser.add_argument("input", help="聊天记录CSV文件")
+    parser.add_argument("--host", default=serve_host, help=f"监听的地址，默认 {serve_host}")
+    parser.add_argument("--port", type=int, default=serve_port, help=f"监听的端口，默认 {serve_port}")
+    parser.add_argument("-o", "--output-dir", default=result_dir, help=f"分词缓存所在的结果目录，默认 {result_dir}")
+    parser.add_argument("--timezone", type=parse_timezone, default=None, help="统计工作时间使用的时区，例如 Asia/Shanghai")
+    parser.add_argument("--workers", type=int, default=1, help="分词和图表渲染使用的进程数")
+    parser.add_argument("--font", default=font_path, help="词云使用的中文字体文件")
+    parser.add_argument("--jieba-cache-dir", default=None, help="jieba序列化词典缓存所在的目录")
+    parser.add_argument("--approximate-words", action="store_true", help="近似词频，内存占用固定（不支持按日期范围查询词频）")
+    args = parser.parse_args()
+
+    config = Config(result_dir=args.output_dir, timezone=args.timezone, workers=args.workers, font_path=args.font,
+                    jieba_cache_dir=args.jieba_cache_dir, approximate_words=args.approximate_words)
+    try:
+        serve(args.input, config, args.host, args.port)
+    except AnalysisError as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
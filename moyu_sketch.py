@@ -0,0 +1,101 @@
+"""
+近似词频：Space-Saving 摘要在固定的内存内跟踪出现次数最多的词，不需要保存整个词汇表
+"""
+import heapq
+from collections import Counter
+
+
+class SpaceSaving:
+    """
+    最多跟踪 capacity 个词的 Space-Saving 摘要（Metwally 等，2005）。
+    已满时遇到新词，替换计数最小的词，新词的计数从被替换词的计数开始累加，并把这部分记为它的误差。
+    对跟踪的每个词：真实次数 <= 计数 <= 真实次数 + 误差；没有被跟踪的词，真实次数不超过最小的计数。
+    误差上限不超过 总词数 / capacity，出现次数超过这个值的词一定会被跟踪。
+    update() 的参数与 Counter.update() 相同（{词: 次数}），也可以是另一个 SpaceSaving 摘要（合并）
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}  # 词 -> 计数（可能偏高）
+        self.errors = {}  # 词 -> 计数可能偏高的上限
+        self.total = 0  # 累加过的总词数
+        self._heap = []  # (计数, 词) 的最小堆，计数变化后旧的条目留在堆中，取出时跳过
+
+    def _push(self, word):
+        heapq.heappush(self._heap, (self.counts[word], word))
+        if len(self._heap) > 4 * self.capacity + 64:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self._heap = [(count, word) for word, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    # 取出计数最小的词
+    def _pop_min(self):
+        while True:
+            count, word = heapq.heappop(self._heap)
+            if self.counts.get(word) == count:
+                return word, count
+
+    # 没有被跟踪的词可能的最大次数：未满时为0，已满时为最小的计数
+    def _floor(self):
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def update(self, counts):
+        if isinstance(counts, SpaceSaving):
+            return self.merge(counts)
+        for word, count in counts.items():
+            self.total += count
+            if word in self.counts:
+                self.counts[word] += count
+            elif len(self.counts) < self.capacity:
+                self.counts[word] = count
+                self.errors[word] = 0
+            else:
+                victim, floor = self._pop_min()
+                del self.counts[victim]
+                del self.errors[victim]
+                self.counts[word] = floor + count
+                self.errors[word] = floor
+            self._push(word)
+        return self
+
+    def merge(self, other):
+        """
+        合并另一个摘要：一方没有跟踪的词按该方的最小计数补齐（计数和误差同时增加），再保留计数最大的 capacity 个词
+        """
+        floor, other_floor = self._floor(), other._floor()
+        words = list(self.counts) + [word for word in other.counts if word not in self.counts]
+        merged = [(word, self.counts.get(word, floor) + other.counts.get(word, other_floor),
+                   self.errors.get(word, floor) + other.errors.get(word, other_floor)) for word in words]
+        if len(merged) > self.capacity:
+            merged = heapq.nlargest(self.capacity, merged, key=lambda item: item[1])
+        self.counts = {word: count for word, count, _ in merged}
+        self.errors = {word: error for word, _, error in merged}
+        self.total += other.total
+        self._rebuild_heap()
+        return self
+
+    def error_bound(self):
+        """
+        计数可能偏高的最大值，同时也是没有被跟踪的词可能的最大次数
+        """
+        return max(max(self.errors.values(), default=0), self._floor())
+
+    def most_common(self, n=None):
+        """
+        计数最大的 n 个词 [(词, 计数)]，与 Counter.most_common() 相同
+        """
+        items = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return items if n is None else items[:n]
+
+    def counter(self):
+        """
+        以 Counter 的形式返回跟踪的词及其计数（用于生成词云）
+        """
+        return Counter(dict(self.most_common()))
+
+    def __len__(self):
+        return len(self.counts)
@@ -0,0 +1,451 @@
+"""
+SQLite消息库：把导出文件导入本地SQLite数据库，用户映射为整数id，消息按 (user_id, create_time) 建立索引，
+jieba分词后的消息内容建立FTS5全文索引。排行榜、时间分布和词频都是带索引的查询，
+像“谁在工作时间最常提到摸鱼”这样的临时问题不需要重新分析整个文件。
+moyu_analyzer 使用 --backend sqlite 时，报告的排行榜、时间分布和词频也由消息库的聚合查询得到（见 read_stats_store），
+数据文件没有变化时不需要重新读取和分词。
+
+用法：
+    python moyu_store.py bj.csv                       # 导入（文件没有变化时直接使用已有的数据库）并输出排行榜
+    python moyu_store.py bj.csv --search 摸鱼          # 工作时间内提到“摸鱼”的消息最多的用户
+    python moyu_store.py bj.csv --user 张三 --from 2024-03-01 --to 2024-03-31
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import sqlite3
+import time
+from collections import Counter
+
+import jieba
+
+from moyu_analyzer import (AnalysisError, Config, clean_nickname, config_fingerprint_parts, is_valid_message,
+                           iter_rows, make_work_calendar, parse_date, parse_timezone, result_dir, stop_words)
+from moyu_calendar import day_number
+from moyu_tokenizer import initialize_jieba, tokenize, use_dictionary_cache
+from zoneinfo import ZoneInfo
+
+# 数据库文件名（位于结果目录下）
+store_file = "moyu_messages.sqlite3"
+
+# 导入时每批写入的消息条数
+batch_size = 10000
+
+_schema_version = 2
+
+_schema = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+-- first_work 为用户第一条工作时间消息的id（没有时为NULL），排名并列时按这个顺序，与分析报告一致
+CREATE TABLE users (id INTEGER PRIMARY KEY, nickname TEXT NOT NULL UNIQUE, first_work INTEGER);
+CREATE TABLE messages (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    create_time INTEGER NOT NULL,
+    day INTEGER NOT NULL,      -- 本地日期的日序号（1970-01-01 为0）
+    weekday INTEGER NOT NULL,  -- 0=周一
+    hour INTEGER NOT NULL,
+    is_work INTEGER NOT NULL,  -- 是否在工作时间内
+    content TEXT NOT NULL
+);
+-- 工作时间内各用户的词频，与分析报告的词云使用相同的分词和停用词
+CREATE TABLE word_counts (
+    user_id INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    seq INTEGER NOT NULL,  -- 词第一次出现的顺序，词频并列时按这个顺序
+    PRIMARY KEY (user_id, word)
+) WITHOUT ROWID;
+-- 只保存分词后的索引，不重复保存消息内容；rowid 与 messages.id 相同
+CREATE VIRTUAL TABLE messages_fts USING fts5 (words, content='', tokenize='unicode61');
+"""
+
+# 导入完成后再建立索引，比边插入边维护索引快
+_indexes = """
+CREATE INDEX messages_user_time ON messages (user_id, create_time);
+CREATE INDEX messages_work_day ON messages (is_work, day, user_id);
+CREATE INDEX messages_day ON messages (day, weekday, hour);
+CREATE INDEX word_counts_word ON word_counts (word, count);
+"""
+
+
+# 数据库的指纹：数据文件（路径、大小、修改时间）或影响统计结果的配置变化后重新导入
+def store_fingerprint(path, work_calendar, config):
+    stat = os.stat(path)
+    parts = [str(_schema_version), os.path.abspath(path), str(stat.st_size), str(stat.st_mtime_ns)]
+    parts.extend(config_fingerprint_parts(work_calendar, config))
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def store_path(config):
+    return os.path.join(config.result_dir, store_file)
+
+
+def _read_fingerprint(db_path):
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def import_export(path, db_path, work_calendar, config):
+    """
+    把导出文件中的有效消息（过滤规则与 moyu_analyzer 相同）导入到 db_path。
+    先写入临时文件，完成后再替换，导入中途出错不会留下不完整的数据库
+    """
+    initialize_jieba()
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(_schema)
+
+        user_ids = {}
+        first_work = {}  # user_id -> 第一条工作时间消息的id
+        word_counts = {}  # (user_id, word) -> 次数
+        messages = []
+        fts_rows = []
+        message_id = 0
+
+        def flush():
+            conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", messages)
+            conn.executemany("INSERT INTO messages_fts (rowid, words) VALUES (?, ?)", fts_rows)
+            messages.clear()
+            fts_rows.clear()
+
+        for timestamp, nickname, msg in iter_rows(path, config):
+            nickname = clean_nickname(nickname)
+            if not is_valid_message(msg):
+                continue
+            try:
+                timestamp = int(timestamp)
+                day, weekday, hour = work_calendar.calendar(timestamp)
+            except (TypeError, ValueError):
+                continue
+            user_id = user_ids.get(nickname)
+            if user_id is None:
+                user_id = user_ids[nickname] = len(user_ids) + 1
+            is_work = work_calendar.is_work_time(weekday, hour)
+            message_id += 1
+            messages.append((message_id, user_id, timestamp, day, weekday, hour, is_work, msg))
+
+            words = list(jieba.cut(msg))
+            fts_rows.append((message_id, _fts_text(msg, words)))
+            if is_work:
+                first_work.setdefault(user_id, message_id)
+                for word in words:
+                    if word not in stop_words and len(word) > 1:
+                        key = (user_id, word)
+                        word_counts[key] = word_counts.get(key, 0) + 1
+            if len(messages) >= batch_size:
+                flush()
+        flush()
+
+        conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                         ((uid, name, first_work.get(uid)) for name, uid in user_ids.items()))
+        conn.executemany("INSERT INTO word_counts VALUES (?, ?, ?, ?)",
+                         ((uid, word, count, seq) for seq, ((uid, word), count) in enumerate(word_counts.items())))
+        conn.executescript(_indexes)
+        conn.execute("INSERT INTO meta VALUES ('fingerprint', ?)",
+                     (store_fingerprint(path, work_calendar, config),))
+        conn.execute("INSERT INTO meta VALUES ('work_hours', ?)",
+                     (f"{work_calendar.work_start}-{work_calendar.work_end}",))
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+
+
+def open_store(path, config=None):
+    """
+    打开导出文件对应的消息库（config.result_dir 下的 moyu_messages.sqlite3），
+    不存在或数据文件、配置已变化时先重新导入
+    """
+    if config is None:
+        config = Config()
+    work_calendar = make_work_calendar(config)
+    db_path = store_path(config)
+    if config.jieba_cache_dir:
+        use_dictionary_cache(config.jieba_cache_dir)
+    try:
+        if _read_fingerprint(db_path) != store_fingerprint(path, work_calendar, config):
+            os.makedirs(config.result_dir, exist_ok=True)
+            print(f"正在把 {path} 导入消息库...")
+            start = time.perf_counter()
+            import_export(path, db_path, work_calendar, config)
+            print(f"导入完成，耗时 {time.perf_counter() - start:.1f} 秒")
+    except (OSError, sqlite3.Error, UnicodeDecodeError) as e:
+        raise AnalysisError(f"导入消息库时出错: {e}") from e
+    return MessageStore(db_path)
+
+
+# 日期范围（"YYYY-MM-DD"，包含两端，None 表示不限）对应的 SQL 条件和参数
+def _day_condition(date_from, date_to):
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append("day >= ?")
+        params.append(day_number(date_from))
+    if date_to is not None:
+        conditions.append("day <= ?")
+        params.append(day_number(date_to))
+    return "".join(f" AND {condition}" for condition in conditions), params
+
+
+# 全文索引中的文本：jieba分出的词（去掉空白）以空格分隔。导入消息和查询关键字都用它分词，两边的切分才一致
+def _fts_text(text, words=None):
+    if words is None:
+        initialize_jieba()
+        words = jieba.cut(text)
+    return " ".join(word for word in words if word.strip())
+
+
+def _fts_phrase(keyword):
+    """
+    关键字按导入时的方式分词后作为一个短语查询：“今天摸鱼”分为“今天 摸鱼”，匹配这两个词相邻出现的消息。
+    以空格连接的整个分词结果加一对引号（其中的引号写成两个），避免引号、运算符被解释为FTS5语法；
+    关键字分不出词时返回 None
+    """
+    text = _fts_text(keyword)
+    if not text:
+        return None
+    return '"' + text.replace('"', '""') + '"'
+
+
+class MessageStore:
+    """
+    消息库上的查询。日期参数为 "YYYY-MM-DD" 字符串（包含两端），None 表示不限
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+
+    def ranking(self, limit=10, date_from=None, date_to=None):
+        """
+        工作时间消息数排行 [(昵称, 消息数)]，并列时按用户第一条工作时间消息的顺序（与分析报告一致）
+        """
+        condition, params = _day_condition(date_from, date_to)
+        return self.conn.execute(f"""
+            SELECT users.nickname, counts.n FROM (
+                SELECT user_id, COUNT(*) AS n FROM messages
+                WHERE is_work = 1{condition} GROUP BY user_id
+            ) AS counts JOIN users ON users.id = counts.user_id
+            ORDER BY counts.n DESC, users.first_work LIMIT ?
+        """, params + [limit]).fetchall()
+
+    def work_day_count(self, date_from=None, date_to=None):
+        condition, params = _day_condition(date_from, date_to)
+        return self.conn.execute(
+            f"SELECT COUNT(DISTINCT day) FROM messages WHERE weekday < 5{condition}", params).fetchone()[0]
+
+    def hour_counts(self, date_from=None, date_to=None, nickname=None):
+        """
+        24小时的消息数（全部有效消息）；指定 nickname 时只统计该用户在工作日的消息（与分析报告的用户时间分布一致）
+        """
+        condition, params = _day_condition(date_from, date_to)
+        if nickname is not None:
+            condition += " AND weekday < 5 AND user_id = (SELECT id FROM users WHERE nickname = ?)"
+            params.append(nickname)
+        counts = [0] * 24
+        for hour, count in self.conn.execute(
+                f"SELECT hour, COUNT(*) FROM messages WHERE 1{condition} GROUP BY hour", params):
+            counts[hour] = count
+        return counts
+
+    def weekday_counts(self, date_from=None, date_to=None):
+        """
+        周一至周五的消息数（全部有效消息）
+        """
+        condition, params = _day_condition(date_from, date_to)
+        counts = [0] * 5
+        for weekday, count in self.conn.execute(
+                f"SELECT weekday, COUNT(*) FROM messages WHERE weekday < 5{condition} GROUP BY weekday", params):
+            counts[weekday] = count
+        return counts
+
+    def top_words(self, limit=20, nickname=None, date_from=None, date_to=None):
+        """
+        工作时间内消息的高频词 [(词, 次数)]；指定 nickname 时只统计该用户。
+        word_counts 只有整个文件的词频，指定日期范围时对范围内的消息重新分词统计
+        """
+        if date_from is not None or date_to is not None:
+            condition, params = _day_condition(date_from, date_to)
+            if nickname is not None:
+                condition += " AND user_id = (SELECT id FROM users WHERE nickname = ?)"
+                params.append(nickname)
+            initialize_jieba()
+            counts = Counter()
+            for content, in self.conn.execute(f"SELECT content FROM messages WHERE is_work = 1{condition}", params):
+                counts.update(tokenize(content, stop_words))
+            return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        if nickname is None:
+            return self.conn.execute(
+                "SELECT word, SUM(count) AS n FROM word_counts GROUP BY word ORDER BY n DESC, word LIMIT ?",
+                (limit,)).fetchall()
+        return self.conn.execute("""
+            SELECT word, count FROM word_counts
+            WHERE user_id = (SELECT id FROM users WHERE nickname = ?)
+            ORDER BY count DESC, word LIMIT ?
+        """, (nickname, limit)).fetchall()
+
+    def keyword_ranking(self, keyword, limit=10, work_only=True, date_from=None, date_to=None):
+        """
+        提到 keyword 的消息最多的用户 [(昵称, 消息数)]。keyword 按jieba分出的词匹配，
+        例如“摸鱼”能匹配“今天摸鱼了”，但jieba把“摸鱼王”分为一个词时不匹配“摸鱼王”
+        """
+        phrase = _fts_phrase(keyword)
+        if phrase is None:
+            return []
+        condition, params = _day_condition(date_from, date_to)
+        if work_only:
+            condition += " AND is_work = 1"
+        return self.conn.execute(f"""
+            SELECT users.nickname, COUNT(*) AS n
+            FROM messages_fts JOIN messages ON messages.id = messages_fts.rowid
+            JOIN users ON users.id = messages.user_id
+            WHERE messages_fts MATCH ?{condition}
+            GROUP BY messages.user_id ORDER BY n DESC, messages.user_id LIMIT ?
+        """, [phrase] + params + [limit]).fetchall()
+
+    def search(self, keyword, limit=20, nickname=None):
+        """
+        最近提到 keyword 的消息 [(时间戳, 昵称, 消息内容)]
+        """
+        phrase = _fts_phrase(keyword)
+        if phrase is None:
+            return []
+        condition, params = "", []
+        if nickname is not None:
+            condition = " AND users.nickname = ?"
+            params.append(nickname)
+        return self.conn.execute(f"""
+            SELECT messages.create_time, users.nickname, messages.content
+            FROM messages_fts JOIN messages ON messages.id = messages_fts.rowid
+            JOIN users ON users.id = messages.user_id
+            WHERE messages_fts MATCH ?{condition}
+            ORDER BY messages.create_time DESC LIMIT ?
+        """, [phrase] + params + [limit]).fetchall()
+
+    def user_messages(self, nickname, date_from=None, date_to=None, limit=20):
+        """
+        用户最近的消息 [(时间戳, 消息内容)]，使用 (user_id, create_time) 索引
+        """
+        condition, params = _day_condition(date_from, date_to)
+        return self.conn.execute(f"""
+            SELECT create_time, content FROM messages
+            WHERE user_id = (SELECT id FROM users WHERE nickname = ?){condition}
+            ORDER BY create_time DESC LIMIT ?
+        """, [nickname] + params + [limit]).fetchall()
+
+    def fill_cube(self, cube):
+        """
+        把全部消息按 (用户, 日期, 小时) 聚合后累加到 CountCube 中。各组按其中第一条消息的顺序累加，
+        用户id和并列时的顺序与逐条读取导出文件时相同
+        """
+        # users.id 按昵称第一次出现的顺序分配，与 CountCube.intern() 的顺序相同
+        uids = [cube.intern(nickname) for nickname, in self.conn.execute("SELECT nickname FROM users ORDER BY id")]
+        cursor = self.conn.execute("""
+            SELECT user_id, day, weekday, hour, COUNT(*), MIN(id) AS first FROM messages
+            GROUP BY user_id, day, hour ORDER BY first
+        """)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            user_ids, days, weekdays, hours, counts, _ = zip(*rows)
+            cube.add([uids[user_id - 1] for user_id in user_ids], days, weekdays, hours, counts)
+
+    def user_word_counters(self):
+        """
+        工作时间内各用户的词频 {昵称: Counter}，用户按第一条工作时间消息的顺序、词按第一次出现的顺序插入，
+        与分析报告逐条分词累加的结果相同（包括 most_common() 并列时的顺序）
+        """
+        counters = {nickname: Counter() for nickname, in self.conn.execute(
+            "SELECT nickname FROM users WHERE first_work IS NOT NULL ORDER BY first_work")}
+        for nickname, word, count in self.conn.execute("""
+            SELECT users.nickname, word_counts.word, word_counts.count
+            FROM word_counts JOIN users ON users.id = word_counts.user_id
+            ORDER BY users.first_work, word_counts.seq
+        """):
+            counters[nickname][word] = count
+        return counters
+
+    def max_timestamp(self):
+        return self.conn.execute("SELECT MAX(create_time) FROM messages").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把聊天记录导入SQLite消息库并查询")
+    parser.add_argument("input", help="聊天记录CSV文件")
+    parser.add_argument("-o", "--output-dir", default=result_dir, help=f"消息库所在的结果目录，默认 {result_dir}")
+    parser.add_argument("--timezone", type=parse_timezone, default=None, help="统计工作时间使用的时区，例如 Asia/Shanghai")
+    parser.add_argument("--search", metavar="关键字", help="工作时间内提到关键字的消息最多的用户，以及最近的几条消息")
+    parser.add_argument("--user", metavar="昵称", help="只看某个用户：24小时分布、高频词和最近的消息")
+    parser.add_argument("--from", dest="date_from", type=parse_date, metavar="YYYY-MM-DD", help="开始日期")
+    parser.add_argument("--to", dest="date_to", type=parse_date, metavar="YYYY-MM-DD", help="结束日期（包含）")
+    parser.add_argument("--top", type=int, default=10, help="显示的条数")
+    parser.add_argument("--jieba-cache-dir", default=None, help="jieba序列化词典缓存所在的目录")
+    args = parser.parse_args()
+
+    config = Config(result_dir=args.output_dir, timezone=args.timezone, jieba_cache_dir=args.jieba_cache_dir)
+    try:
+        store = open_store(args.input, config)
+    except AnalysisError as e:
+        parser.exit(1, f"{e}\n")
+
+    tz = ZoneInfo(args.timezone) if args.timezone else None
+
+    def format_time(timestamp):
+        return datetime.datetime.fromtimestamp(timestamp, tz).strftime("%Y-%m-%d %H:%M")
+
+    with store:
+        start = time.perf_counter()
+        if args.search:
+            print(f"工作时间内提到“{args.search}”最多的用户:")
+            for i, (name, count) in enumerate(store.keyword_ranking(args.search, args.top, True, args.date_from,
+                                                                     args.date_to), 1):
+                print(f"{i}. {name}: {count}条消息")
+            print(f"\n最近提到“{args.search}”的消息:")
+            for timestamp, name, msg in store.search(args.search, args.top, args.user):
+                print(f"{format_time(timestamp)} {name}: {msg}")
+        elif args.user:
+            print(f"{args.user}在工作日的24小时消息分布:")
+            for hour, count in enumerate(store.hour_counts(args.date_from, args.date_to, args.user)):
+                if count:
+                    print(f"{hour}点-{hour + 1}点: {count}条消息")
+            print(f"\n{args.user}摸鱼内容中最常见的{args.top}个词:")
+            for word, count in store.top_words(args.top, args.user, args.date_from, args.date_to):
+                print(f"{word}: {count}次")
+            print(f"\n{args.user}最近的消息:")
+            for timestamp, msg in store.user_messages(args.user, args.date_from, args.date_to, args.top):
+                print(f"{format_time(timestamp)} {msg}")
+        else:
+            work_days = store.work_day_count(args.date_from, args.date_to)
+            print(f"共有 {work_days} 个工作日，摸鱼排行榜前{args.top}名:")
+            for i, (name, count) in enumerate(store.ranking(args.top, args.date_from, args.date_to), 1):
+                avg_per_day = count / work_days if work_days > 0 else 0
+                print(f"{i}. {name}: {count}条工作时间消息 (平均每天 {avg_per_day:.2f}条)")
+        print(f"\n查询耗时 {(time.perf_counter() - start) * 1000:.1f} 毫秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+分阶段计时：记录分析过程中每个阶段的耗时（墙钟时间和主进程CPU时间）、阶段结束时的进程峰值内存以及处理的行数/词数，
+保存为JSON文件，用于判断一次很慢的运行到底慢在CSV解析、分词、词云还是matplotlib
+"""
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss():
+    """
+    当前进程到目前为止的峰值常驻内存（字节），无法获取时返回 None
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 上单位为KB，macOS 上为字节
+        return peak if sys.platform == "darwin" else peak * 1024
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+def children_cpu_time():
+    """
+    已结束的子进程（进程池在关闭时结束）累计使用的CPU时间（秒），无法获取时返回 None
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class PhaseTimer:
+    """
+    依次记录各个阶段：start(name) 结束当前阶段并开始（或继续累计）名为 name 的阶段，
+    同一个阶段可以分几次进行（例如先提交图表渲染，之后再取渲染结果写入报告），耗时累加。
+    count(**counts) 给当前阶段累加行数、词数等计数。
+    墙钟时间和CPU时间只包含主进程，进程池中子进程的CPU时间在结束后汇总到 total 中
+    """
+
+    def __init__(self):
+        self.phases = {}  # 阶段名 -> {"wall_seconds", "cpu_seconds", "peak_rss_bytes", "counts"}，按开始顺序
+        self.current = None
+        self._started = None
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._start_children_cpu = children_cpu_time()
+
+    def start(self, name, **counts):
+        self.stop()
+        phase = self.phases.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_bytes": None,
+                                              "counts": {}})
+        self.current = name
+        self._started = (time.perf_counter(), time.process_time())
+        self.count(**counts)
+        return phase
+
+    def count(self, **counts):
+        if self.current is None:
+            return
+        phase_counts = self.phases[self.current]["counts"]
+        for key, value in counts.items():
+            phase_counts[key] = phase_counts.get(key, 0) + value
+
+    def stop(self):
+        if self.current is None:
+            return
+        wall, cpu = self._started
+        phase = self.phases[self.current]
+        phase["wall_seconds"] += time.perf_counter() - wall
+        phase["cpu_seconds"] += time.process_time() - cpu
+        phase["peak_rss_bytes"] = peak_rss()
+        self.current = None
+
+    def total(self):
+        children = children_cpu_time()
+        return {
+            "wall_seconds": time.perf_counter() - self._start_wall,
+            "cpu_seconds": time.process_time() - self._start_cpu,
+            "children_cpu_seconds": None if children is None else children - self._start_children_cpu,
+            "peak_rss_bytes": peak_rss(),
+        }
+
+    def save(self, path, **info):
+        """
+        结束当前阶段，把各阶段和总计写入JSON文件；info 为附加的说明（输入文件、配置等）
+        """
+        self.stop()
+        data = dict(info, total=self.total(), phases=self.phases)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
+        return data
+
+
+def format_timings(timings):
+    """
+    把 PhaseTimer.save() 返回的数据整理为每个阶段一行的文字摘要，最后一行为总计
+    """
+    lines = []
+    for name, phase in list(timings["phases"].items()) + [("total", timings["total"])]:
+        line = f"{name:<24} {phase['wall_seconds']:>8.2f} 秒  CPU {phase['cpu_seconds']:>8.2f} 秒"
+        if phase["peak_rss_bytes"] is not None:
+            line += f"  峰值内存 {phase['peak_rss_bytes'] / 1024 / 1024:>8.1f} MB"
+        if phase.get("children_cpu_seconds"):
+            line += f"  子进程CPU {phase['children_cpu_seconds']:.2f} 秒"
+        if phase.get("counts"):
+            line += "  " + ", ".join(f"{key}={value}" for key, value in phase["counts"].items())
+        lines.append(line)
+    return "\n".join(lines)
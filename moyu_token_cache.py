@@ -0,0 +1,106 @@
+"""
+持久化的分词结果缓存（SQLite），避免每次运行都重新用jieba切分相同的消息
+"""
+import hashlib
+import os
+import sqlite3
+
+import jieba
+
+from moyu_tokenizer import initialize_jieba
+
+# 缓存最多保存的消息条数，超过后淘汰最久未使用的条目
+max_entries = 2000000
+
+# 每条SQL语句最多查询的消息条数（SQLite对参数个数有限制）
+_batch_size = 500
+
+# 分词结果中词语之间的分隔符，jieba切出的长度大于1的词语不会包含它
+_separator = "\x00"
+
+
+# 停用词集合和jieba词典的指纹，二者任何一个变化都会使旧的缓存条目失效
+def cache_fingerprint(stop_words):
+    initialize_jieba()
+    parts = [
+        jieba.__version__,
+        str(jieba.dt.dictionary),
+        str(jieba.dt.total),  # 通过 add_word / load_userdict 修改词典时会变化
+        str(len(jieba.dt.FREQ)),
+    ]
+    parts.extend(sorted(stop_words))
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).digest()
+
+
+class TokenCache:
+    """
+    以 hash(指纹 + 消息内容) 为键保存过滤停用词后的分词结果，超过 max_entries 时按最近使用时间淘汰。
+    停用词或词典变化后指纹不同，旧条目不会再被命中，随后被自动淘汰
+    """
+
+    def __init__(self, path, stop_words, max_entries=max_entries):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.max_entries = max_entries
+        self.fingerprint = cache_fingerprint(stop_words)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tokens (hash BLOB PRIMARY KEY, words TEXT, used INTEGER) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tokens_used ON tokens (used)")
+
+        # 每次打开缓存视为一轮使用，条目的 used 记录最后一次被使用的轮次
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'run'").fetchone()
+        self.run = (row[0] if row else 0) + 1
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('run', ?)", (self.run,))
+        self.conn.commit()
+
+    def _key(self, msg):
+        return hashlib.blake2b(self.fingerprint + msg.encode("utf-8"), digest_size=16).digest()
+
+    def get_many(self, messages):
+        """
+        返回与 messages 一一对应的分词结果列表，未命中的位置为 None
+        """
+        keys = [self._key(msg) for msg in messages]
+        found = {}
+        for start in range(0, len(keys), _batch_size):
+            batch = keys[start:start + _batch_size]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self.conn.execute(
+                f"SELECT hash, words FROM tokens WHERE hash IN ({placeholders})", batch
+            ))
+            self.conn.execute(
+                f"UPDATE tokens SET used = ? WHERE hash IN ({placeholders})", [self.run] + batch
+            )
+        self.conn.commit()
+
+        results = []
+        for key in keys:
+            words = found.get(key)
+            if words is None:
+                results.append(None)
+            else:
+                results.append(words.split(_separator) if words else [])
+        return results
+
+    def put_many(self, messages, token_lists):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO tokens VALUES (?, ?, ?)",
+            ((self._key(msg), _separator.join(words), self.run) for msg, words in zip(messages, token_lists)),
+        )
+        self.conn.commit()
+
+    def close(self):
+        # 超出容量时淘汰最久未使用的条目
+        count = self.conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM tokens WHERE hash IN (SELECT hash FROM tokens ORDER BY used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            self.conn.commit()
+        self.conn.close()
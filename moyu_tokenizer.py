@@ -0,0 +1,221 @@
+"""
+jieba分词与词频统计，支持把消息分片后交给进程池并行分词
+"""
+import marshal
+import os
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import jieba
+
+# 每个并行任务包含的消息条数
+shard_size = 5000
+
+# 使用分词缓存时，每批查询/写入缓存的消息条数
+cache_batch_size = 50000
+
+# 子进程中使用的停用词集合，由 _init_worker 设置
+_worker_stop_words = None
+
+
+def use_dictionary_cache(directory):
+    """
+    把jieba序列化后的词典缓存保存在 directory 中（默认在系统临时目录，可能被清理）。
+    缓存存在时jieba直接加载缓存，不需要重新解析词典文件；需要在jieba加载词典之前调用
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    jieba.dt.tmp_dir = directory
+
+
+def initialize_jieba():
+    """
+    加载jieba词典。jieba自带的缓存加载用 marshal.load 从文件中逐个对象读取，比重新解析词典文件还慢；
+    这里一次读入整个缓存文件再用 marshal.loads 解析。与 jieba.Tokenizer.initialize 对自定义词典的检查一样，
+    只使用比词典文件新的缓存：词典文件被修改过时删除旧的缓存，交给 jieba.initialize() 重新解析词典并生成缓存
+    （jieba自己对默认词典不做这个检查，会继续使用过期的缓存）。使用自定义词典时直接交给 jieba.initialize()
+    """
+    dt = jieba.dt
+    if dt.initialized:
+        return
+    if dt.dictionary is not None:
+        dt.initialize()
+        return
+
+    cache_file = os.path.join(dt.tmp_dir or tempfile.gettempdir(), dt.cache_file or "jieba.cache")
+    try:
+        fresh = os.path.getmtime(cache_file) > os.path.getmtime(_default_dictionary_file())
+    except OSError:
+        fresh = False
+    if fresh:
+        try:
+            with open(cache_file, "rb") as f:
+                freq, total = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        else:
+            with dt.lock:
+                if not dt.initialized:
+                    dt.FREQ, dt.total = freq, total
+                    dt.initialized = True
+            return
+    else:
+        try:
+            os.remove(cache_file)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # 过期的缓存无法删除时 jieba.initialize() 仍会加载它，只能直接解析词典（不写缓存）
+            with dt.lock:
+                if not dt.initialized:
+                    dt.FREQ, dt.total = dt.gen_pfdict(dt.get_dict_file())
+                    dt.initialized = True
+            return
+    dt.initialize()
+
+
+# jieba默认词典文件的路径
+def _default_dictionary_file():
+    return os.path.join(os.path.dirname(os.path.abspath(jieba.__file__)), jieba.DEFAULT_DICT_NAME)
+
+
+# 使用jieba进行分词，并过滤停用词
+def tokenize(msg, stop_words):
+    return [word for word in jieba.cut(msg) if word not in stop_words and len(word) > 1]
+
+
+# 逐条分词并统计总词频
+def count_words_serial(messages, stop_words):
+    word_counter = Counter()
+    for msg in messages:
+        word_counter.update(tokenize(msg, stop_words))
+    return word_counter
+
+
+# 逐条分词并按用户统计词频，names 与 messages 一一对应
+def count_user_words_serial(messages, names, stop_words):
+    user_word_counters = {}
+    for name, msg in zip(names, messages):
+        user_word_counters.setdefault(name, Counter()).update(tokenize(msg, stop_words))
+    return user_word_counters
+
+
+# 子进程初始化：保存停用词，并且每个进程只加载一次jieba词典（与主进程使用同一个词典缓存目录）
+def _init_worker(stop_words, dictionary_cache_dir):
+    global _worker_stop_words
+    _worker_stop_words = stop_words
+    if dictionary_cache_dir:
+        use_dictionary_cache(dictionary_cache_dir)
+    initialize_jieba()
+
+
+def _count_shard(messages):
+    return count_words_serial(messages, _worker_stop_words)
+
+
+def _count_user_shard(messages, names):
+    return count_user_words_serial(messages, names, _worker_stop_words)
+
+
+def _tokenize_shard(messages):
+    return [tokenize(msg, _worker_stop_words) for msg in messages]
+
+
+class Tokenizer:
+    """
+    分词器，workers 大于1时使用进程池并行分词，结果与串行分词完全一致。
+    传入 cache（TokenCache）时优先从缓存读取分词结果，只对未命中的消息调用jieba
+    """
+
+    def __init__(self, stop_words, workers=1, cache=None):
+        initialize_jieba()
+        self.stop_words = stop_words
+        self.cache = cache
+        self.pool = None
+        if workers > 1:
+            self.pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                            initargs=(stop_words, jieba.dt.tmp_dir))
+
+    # 把各列按 shard_size 切片后交给进程池，按分片顺序返回结果
+    def _map_shards(self, func, *columns):
+        starts = range(0, len(columns[0]), shard_size)
+        shards = [[column[start:start + shard_size] for start in starts] for column in columns]
+        return self.pool.map(func, *shards)
+
+    def tokenize_many(self, messages):
+        """
+        返回与 messages 一一对应的分词结果，重复的消息只分词一次
+        """
+        if self.cache is not None:
+            token_lists = self.cache.get_many(messages)
+        else:
+            token_lists = [None] * len(messages)
+
+        missing = list(dict.fromkeys(msg for msg, words in zip(messages, token_lists) if words is None))
+        if missing:
+            if self.pool is None or len(missing) <= shard_size:
+                new_token_lists = [tokenize(msg, self.stop_words) for msg in missing]
+            else:
+                new_token_lists = [words for shard in self._map_shards(_tokenize_shard, missing) for words in shard]
+            if self.cache is not None:
+                self.cache.put_many(missing, new_token_lists)
+
+            tokenized = dict(zip(missing, new_token_lists))
+            token_lists = [tokenized[msg] if words is None else words for msg, words in zip(messages, token_lists)]
+        return token_lists
+
+    def count_words(self, messages):
+        """
+        返回所有消息的总词频
+        """
+        if self.cache is not None:
+            word_counter = Counter()
+            for start in range(0, len(messages), cache_batch_size):
+                for words in self.tokenize_many(messages[start:start + cache_batch_size]):
+                    word_counter.update(words)
+            return word_counter
+
+        if self.pool is None or len(messages) <= shard_size:
+            return count_words_serial(messages, self.stop_words)
+
+        # 按分片顺序合并，词语的先后顺序与串行分词一致，词频排名并列时的顺序也相同
+        word_counter = Counter()
+        for shard_counter in self._map_shards(_count_shard, messages):
+            word_counter.update(shard_counter)
+        return word_counter
+
+    def count_user_words(self, messages, names):
+        """
+        返回 {用户昵称: 词频}，names 与 messages 一一对应
+        """
+        if self.cache is not None:
+            user_word_counters = {}
+            for start in range(0, len(messages), cache_batch_size):
+                token_lists = self.tokenize_many(messages[start:start + cache_batch_size])
+                for name, words in zip(names[start:start + cache_batch_size], token_lists):
+                    user_word_counters.setdefault(name, Counter()).update(words)
+            return user_word_counters
+
+        if self.pool is None or len(messages) <= shard_size:
+            return count_user_words_serial(messages, names, self.stop_words)
+
+        user_word_counters = {}
+        for shard_counters in self._map_shards(_count_user_shard, messages, names):
+            for name, counter in shard_counters.items():
+                user_word_counters.setdefault(name, Counter()).update(counter)
+        return user_word_counters
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
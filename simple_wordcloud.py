@@ -1,8 +1,32 @@
-import csv
-import jieba
-from wordcloud import WordCloud
+import argparse
+import os
 import matplotlib.pyplot as plt
 from collections import Counter
+from moyu_columnar import open_export
+from moyu_csv import iter_columns
+from moyu_render import make_wordcloud, wordcloud_budget, wordcloud_figure
+from moyu_token_cache import TokenCache
+from moyu_tokenizer import Tokenizer, use_dictionary_cache
+
+# 默认读取的CSV文件和消息内容所在的列（第8列），可以通过命令行参数覆盖
+input_file = "v2ex2.csv"
+msg_index = 7
+
+# 词云使用的字体（需要支持中文），默认使用微软雅黑
+font_path = "C:\\Windows\\Fonts\\msyh.ttc"
+
+# 词云图片的保存路径
+output_file = "wordcloud.png"
+
+# CSV读取方式："csv" 或 "mmap"（只提取需要的列，导出文件带有大段无关列时更快），见 moyu_csv.py
+csv_reader = "csv"
+
+# 词云渲染预算：最多显示的词数、画布大小（像素）、缩放比例，以及是否只生成快速的低分辨率预览
+wordcloud_max_words = 200
+wordcloud_width = 800
+wordcloud_height = 400
+wordcloud_scale = 1
+wordcloud_preview = False
 
 # 定义停用词集合
 stop_words = set([
@@ -34,28 +58,28 @@ stop_words = set([
     "东西","估计","有人","一点","很多","肯定","为啥","不到","不用","的话",
     "10","两个","不了","只有","不好","只能","一年","几个"
 ])
-# 存储所有消息
-messages = []
-
-# 读取CSV文件
-with open("v2ex2.csv", "r", encoding="utf-8") as f:
-    reader = csv.reader(f)
-    for row in reader:
-        nickName = row[10]
-        msg = row[7]
-        # if nickName == "具体nickName":
-        #     if "<" in msg or ">" in msg:
-        #         continue
-        #     if msg == "":
-        #         continue
-        #     if "拍了拍" in msg:
-        #         continue
-        #     if "@" in msg:
-        #         continue
-            
-        #     messages.append(msg)
+
+
+# 逐条返回CSV文件中的消息内容，CSV未变化时直接加载旁边的二进制列式缓存（缓存无法写入时直接读取CSV）。
+# 两种方式都读取时间戳、消息、昵称三列，跳过的行（表头和列数不足的行）相同
+def iter_messages(path, column=msg_index, reader=csv_reader):
+    columns = (5, column, 10)
+    export = open_export(path, columns, reader)
+    if export is None:
+        for _, msg, _ in iter_columns(path, columns, reader=reader):
+            yield msg
+        return
+    with export:
+        for _, _, msgs in export.iter_chunks(100000):
+            yield from msgs
+
+
+# 读取CSV文件中的有效消息
+def read_messages(path, column=msg_index, reader=csv_reader):
+    messages = []
+    for msg in iter_messages(path, column, reader):
         if "<" in msg or ">" in msg:
-                continue
+            continue
         if msg == "":
             continue
         # if "拍了拍" in msg:
@@ -64,41 +88,57 @@ with open("v2ex2.csv", "r", encoding="utf-8") as f:
         #     continue
         if "撤回" in msg:
             continue
-            
+
         messages.append(msg)
+    return messages
 
-# 将所有消息合并成一个字符串
-text = " ".join(messages)
 
 # 使用jieba进行分词，并过滤停用词
-word_list = [word for word in jieba.cut(text) if word not in stop_words and len(word) > 1]
-word_space = " ".join(word_list)
-
-# 创建词云对象
-wordcloud = WordCloud(
-    font_path="C:\\Windows\\Fonts\\msyh.ttc",  # 使用微软雅黑字体
-    width=800,
-    height=400,
-    background_color="white",
-    min_font_size=10,
-    max_font_size=150
-)
-
-# 生成词云
-wordcloud.generate(word_space)
-
-# 显示词云图
-plt.figure(figsize=(10, 5))
-plt.imshow(wordcloud, interpolation="bilinear")
-plt.axis("off")
-plt.show()
-
-# 保存词云图片（可选）
-wordcloud.to_file("wordcloud.png")
-
-# 输出词频统计（可选）
-word_counts = Counter(word_list).most_common(20)
-print("\n最常见的20个词：")
-for word, count in word_counts:
-    print(f"{word}: {count}")
+# 分词结果缓存在 moyu_results 目录下（与 moyu_analyzer.py 共用），重复运行时只对新消息分词
+def count_words(messages):
+    tokenizer = Tokenizer(stop_words, cache=TokenCache(os.path.join("moyu_results", "token_cache.sqlite3"), stop_words))
+    word_counter = Counter(word for words in tokenizer.tokenize_many(messages) for word in words)
+    tokenizer.close()
+    return word_counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="根据聊天记录生成词云")
+    parser.add_argument("input", nargs="?", default=input_file, help=f"聊天记录CSV文件，默认 {input_file}")
+    parser.add_argument("--column", type=int, default=msg_index, help="消息内容所在的列（从0开始）")
+    parser.add_argument("--font", default=font_path, help="词云使用的中文字体文件")
+    parser.add_argument("-o", "--output", default=output_file, help="词云图片的保存路径")
+    parser.add_argument("--csv-reader", choices=["csv", "mmap"], default=csv_reader, help="CSV读取方式")
+    parser.add_argument("--preview", action="store_true", default=wordcloud_preview,
+                        help="快速生成低分辨率、词数较少的词云预览")
+    parser.add_argument("--jieba-cache-dir", help="jieba序列化词典缓存所在的目录，默认使用系统临时目录")
+    parser.add_argument("--no-show", dest="show", action="store_false", help="只保存图片，不弹出窗口显示")
+    args = parser.parse_args()
+
+    if args.jieba_cache_dir:
+        use_dictionary_cache(args.jieba_cache_dir)
+    word_counter = count_words(read_messages(args.input, args.column, args.csv_reader))
+
+    # 直接根据jieba分词得到的词频生成词云
+    budget = wordcloud_budget(wordcloud_max_words, wordcloud_width, wordcloud_height, wordcloud_scale, args.preview)
+    wordcloud = make_wordcloud(word_counter, args.font, budget)
+
+    # 显示词云图
+    if args.show:
+        wordcloud_figure(budget)
+        plt.imshow(wordcloud, interpolation="bilinear")
+        plt.axis("off")
+        plt.show()
+
+    # 保存词云图片
+    wordcloud.to_file(args.output)
+
+    # 输出词频统计（可选）
+    word_counts = word_counter.most_common(20)
+    print("\n最常见的20个词：")
+    for word, count in word_counts:
+        print(f"{word}: {count}")
+
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+测试用的聊天记录导出文件：列布局与真实的导出文件相同（第5列时间戳、第7列消息内容、第10列昵称）
+"""
+import csv
+
+column_count = 12
+
+# 2024-03-04 00:00（北京时间，周一）
+first_timestamp = 1709481600
+
+nicknames = ["张三", "李四😀", "王五", "Alice", "bob!!", "赵六"]
+
+messages = [
+    "今天又在摸鱼了", "这个需求明天再说吧", "哈哈哈哈", "中午吃什么", "服务器又挂了，谁来看看",
+    "周报写完了吗", "下班一起打球", "摸鱼摸鱼", "好的，收到", '他说"马上就好"',
+    "第一行\n第二行", "   ", "", "<msg><img cdnurl=\"x\"/></msg>", "\"张三\" 撤回了一条消息",
+]
+
+# 无法解析或超出范围的时间戳（逐行模式跳过这些行）
+bad_timestamps = ["", "abc", "12.5", "99999999999999999999", "-99999999999999999999", "9223372036854775807"]
+
+
+def export_row(timestamp, nickname, msg):
+    row = [""] * column_count
+    row[5], row[7], row[10] = str(timestamp), msg, nickname
+    return row
+
+
+def write_export(path, rows, append=False):
+    """
+    写入导出文件（newline="" 与 csv.writer 一起使用，字段内的换行原样保存）；append 为 False 时先写表头
+    """
+    with open(path, "a" if append else "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if not append:
+            writer.writerow([f"column{i}" for i in range(column_count)])
+        writer.writerows(rows)
+
+
+def random_rows(rng, count, start=first_timestamp, bad_rate=0.02):
+    """
+    count 行随机消息，时间戳从 start 开始递增（可能在同一秒），跨越几周的工作时间和休息时间
+    """
+    rows = []
+    timestamp = start
+    for _ in range(count):
+        timestamp += rng.choice([0, 0, 7, 60, 600, 1800, 3600, 7200])
+        value = rng.choice(bad_timestamps) if rng.random() < bad_rate else timestamp
+        rows.append(export_row(value, rng.choice(nicknames), rng.choice(messages)))
+    return rows
@@ -0,0 +1,109 @@
+"""
+moyu_calendar：WorkCalendar 的换算结果与逐条构造 datetime 相同，包括夏令时切换前后
+"""
+import argparse
+import datetime
+import random
+import time
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+from moyu_analyzer import AnalysisError, Config, make_work_calendar, parse_timezone
+from moyu_calendar import WorkCalendar, day_number
+
+_epoch = datetime.date(1970, 1, 1)
+
+# 有夏令时的时区：包括只调整半小时的 Lord_Howe、+12:45/+13:45 的 Chatham 和南半球的夏令时
+dst_timezones = ["America/New_York", "Europe/London", "Australia/Lord_Howe", "Pacific/Chatham"]
+timezones = ["Asia/Shanghai", "Asia/Kathmandu"] + dst_timezones
+
+
+def _expected(timestamp, tz):
+    local = datetime.datetime.fromtimestamp(timestamp, tz)
+    return (local.date() - _epoch).days, local.weekday(), local.hour
+
+
+def _transitions(tz, start, end):
+    # 每小时检查一次UTC偏移，返回偏移发生变化的时间点（精确到小时）
+    transitions = []
+    previous = datetime.datetime.fromtimestamp(start, tz).utcoffset()
+    for timestamp in range(start, end, 3600):
+        offset = datetime.datetime.fromtimestamp(timestamp, tz).utcoffset()
+        if offset != previous:
+            transitions.append(timestamp)
+            previous = offset
+    return transitions
+
+
+_start = int(datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+_end = int(datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+
+
+def _timestamps(tz, seed):
+    rng = random.Random(seed)
+    timestamps = [rng.randrange(_start, _end) for _ in range(2000)]
+    # 每次切换前后两小时内每分钟一个时间戳，另外加上切换前后的每一秒
+    for transition in _transitions(tz, _start, _end):
+        timestamps.extend(range(transition - 7200, transition + 7200, 60))
+        timestamps.extend(range(transition - 3600 - 2, transition - 3600 + 3))
+        timestamps.extend(range(transition - 2, transition + 3))
+    return timestamps
+
+
+@pytest.mark.parametrize("timezone", timezones)
+def test_calendar_matches_datetime(timezone):
+    tz = ZoneInfo(timezone)
+    calendar = WorkCalendar(timezone, (9, 18))
+    if timezone in dst_timezones:
+        assert len(_transitions(tz, _start, _end)) == 6
+    timestamps = _timestamps(tz, 0)
+    expected = [_expected(timestamp, tz) for timestamp in timestamps]
+    assert [calendar.calendar(timestamp) for timestamp in timestamps] == expected
+
+    days, weekdays, hours, valid = calendar.calendar_array(np.array(timestamps, dtype=np.int64))
+    assert valid.all()
+    assert list(zip(days.tolist(), weekdays.tolist(), hours.tolist())) == expected
+
+
+@pytest.mark.skipif(not hasattr(time, "tzset"), reason="需要 time.tzset 切换本机时区")
+def test_local_timezone_matches_datetime(monkeypatch):
+    # 不指定时区时使用本机时区，这里临时把本机时区设为有夏令时的 America/New_York
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        calendar = WorkCalendar(None)
+        for timestamp in _timestamps(ZoneInfo("America/New_York"), 1):
+            local = datetime.datetime.fromtimestamp(timestamp)
+            assert calendar.calendar(timestamp) == ((local.date() - _epoch).days, local.weekday(), local.hour)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_unconvertible_timestamps():
+    calendar = WorkCalendar("Asia/Shanghai")
+    with pytest.raises(ValueError):
+        calendar.calendar(10 ** 18)
+    _, _, _, valid = calendar.calendar_array(np.array([0, 10 ** 18, 1709532000], dtype=np.int64))
+    assert valid.tolist() == [True, False, True]
+
+
+def test_work_time_and_dates():
+    calendar = WorkCalendar("Asia/Shanghai", (9, 18))
+    day, weekday, hour = calendar.calendar(1709532000)  # 2024-03-04 14:00 周一
+    assert (calendar.date_string(day), weekday, hour) == ("2024-03-04", 0, 14)
+    assert day_number("2024-03-04") == day
+    assert calendar.is_work_time(weekday, hour) and not calendar.is_work_time(5, hour)
+    assert not calendar.is_work_time(weekday, 18) and calendar.is_work_time(weekday, 9)
+    assert calendar.work_mask(np.array([0, 0, 5, 4]), np.array([9, 18, 10, 17])).tolist() == [True, False, False, True]
+
+
+
+def test_invalid_timezone():
+    with pytest.raises(AnalysisError):
+        make_work_calendar(Config(timezone="Asia/Nowhere"))
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_timezone("Mars/Olympus")
+    assert parse_timezone("Asia/Shanghai") == "Asia/Shanghai"
@@ -0,0 +1,123 @@
+"""
+moyu_columnar：二进制列式缓存的内容与直接读取CSV相同；CSV变化后重新生成，缓存无法写入时直接读取CSV
+"""
+import os
+import random
+
+import numpy as np
+import pytest
+
+import moyu_columnar
+from exports import export_row, random_rows, write_export
+from moyu_analyzer import Config, iter_rows
+from moyu_columnar import cache_dir, missing_timestamp, open_export, parse_timestamp
+from moyu_csv import iter_columns
+
+columns = (5, 7, 10)
+
+
+def _read_cache(export):
+    with export:
+        rows = []
+        for timestamps, nicknames, msgs in export.iter_chunks(17):
+            rows.extend(zip(timestamps.tolist(), msgs, nicknames.tolist()))
+        return rows
+
+
+def _read_csv(path):
+    return [(parse_timestamp(timestamp), msg, nickname) for timestamp, msg, nickname in iter_columns(path, columns)]
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "export.csv")
+    write_export(path, random_rows(random.Random(0), 300) + [export_row(1, "短行", "列数不足")[:8]])
+    return path
+
+
+def test_cache_matches_csv(path, capsys):
+    rows = _read_cache(open_export(path, columns))
+    assert "正在生成" in capsys.readouterr().out
+    assert rows == _read_csv(path)
+    assert any(timestamp == missing_timestamp for timestamp, _, _ in rows)
+
+    # CSV没有变化时直接加载缓存，不重新生成
+    assert _read_cache(open_export(path, columns, reader="mmap")) == rows
+    assert capsys.readouterr().out == ""
+
+
+def test_rebuilt_when_csv_changes(path, capsys):
+    _read_cache(open_export(path, columns))
+    capsys.readouterr()
+
+    # 追加消息（文件大小变化）
+    write_export(path, [export_row(1709532000, "新来的", "追加的消息")], append=True)
+    rows = _read_cache(open_export(path, columns))
+    assert "正在生成" in capsys.readouterr().out
+    assert rows[-1] == (1709532000, "追加的消息", "新来的")
+    assert rows == _read_csv(path)
+
+    # 大小不变、只有修改时间变化
+    with open(path, "r+b") as f:
+        data = f.read()
+        f.seek(0)
+        f.write(data.replace("追加的消息".encode("utf-8"), "修改的消息".encode("utf-8")))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert _read_cache(open_export(path, columns))[-1] == (1709532000, "修改的消息", "新来的")
+
+    # 读取的列不同
+    other = (5, 10, 7)
+    with open_export(path, other) as export:
+        assert next(export.iter_chunks())[2][0] == _read_csv(path)[0][2]
+
+
+def _unwritable(monkeypatch):
+    # 以 root 运行时 chmod 无法让目录只读，这里直接让写入缓存失败
+    def build(path, columns, reader="csv"):
+        os.makedirs(cache_dir(path) + ".tmp")
+        raise PermissionError(13, "Permission denied", cache_dir(path) + ".tmp")
+
+    monkeypatch.setattr(moyu_columnar, "build", build)
+
+
+def test_bypassed_when_unwritable(path, monkeypatch, capsys):
+    _unwritable(monkeypatch)
+    assert open_export(path, columns) is None
+    assert "直接读取CSV" in capsys.readouterr().out
+    assert not os.path.exists(cache_dir(path) + ".tmp")
+    assert not os.path.exists(cache_dir(path))
+
+    # 分析脚本和词云脚本都改为直接读取CSV，结果与使用缓存时相同
+    assert list(iter_rows(path, Config())) == list(iter_rows(path, Config(use_columnar_cache=False)))
+
+    import simple_wordcloud
+    messages = simple_wordcloud.read_messages(path)
+    assert messages
+    monkeypatch.undo()
+    assert simple_wordcloud.read_messages(path) == messages
+    assert os.path.exists(cache_dir(path))
+
+
+def test_leftover_tmp_directory(path):
+    # 上次生成中途退出留下的临时目录会被清理后重新生成
+    os.makedirs(cache_dir(path) + ".tmp")
+    with open(os.path.join(cache_dir(path) + ".tmp", "messages.bin"), "wb") as f:
+        f.write(b"partial")
+    assert _read_cache(open_export(path, columns)) == _read_csv(path)
+    assert not os.path.exists(cache_dir(path) + ".tmp")
+
+
+def test_missing_csv(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        open_export(str(tmp_path / "missing.csv"), columns)
+    assert not os.path.exists(cache_dir(str(tmp_path / "missing.csv")))
+
+
+def test_empty_export(tmp_path):
+    path = str(tmp_path / "empty.csv")
+    write_export(path, [])
+    with open_export(path, columns) as export:
+        assert len(export) == 0
+        assert list(export.iter_chunks()) == []
+        assert np.asarray(export.timestamps).dtype == np.int64
@@ -0,0 +1,116 @@
+"""
+moyu_csv：内存映射读取与 csv.reader 的结果一致，row_boundaries() 切分的分片拼起来与整个文件相同
+"""
+import csv
+import random
+
+import pytest
+
+from moyu_csv import iter_columns, row_boundaries
+
+# 随机字段由这些片段拼成：逗号、引号、各种换行、中文和BOM
+_pieces = ["a", "中文", ",", '"', '""', "\n", "\r", "\r\n", " ", "摸鱼", "\ufeff"]
+
+_column_choices = [(0,), (1,), (2, 0), (0, 1, 1), (3, 1), (5, 10, 7)]
+
+
+def _random_text(rng, length):
+    return "".join(rng.choice(_pieces) for _ in range(length))
+
+
+def _write_text(path, text, bom=False):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(("\ufeff" if bom else "") + text)
+
+
+def _write_rows(path, rows, bom=False):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if bom:
+            f.write("\ufeff")
+        csv.writer(f).writerows(rows)
+
+
+def _random_rows(rng, count):
+    rows = [[f"c{i}" for i in range(12)]]
+    for _ in range(count):
+        width = rng.choice([0, 1, 3, 8, 11, 12, 12, 12, 14])
+        rows.append([_random_text(rng, rng.randint(0, 6)) for _ in range(width)])
+    return rows
+
+
+def _assert_same(path, columns, skip_header):
+    expected = list(iter_columns(path, columns, skip_header, reader="csv"))
+    assert list(iter_columns(path, columns, skip_header, reader="mmap")) == expected
+    return expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_mmap_matches_csv_reader_on_raw_text(tmp_path, seed):
+    # 任意拼接的文本，包括引号未结束、结束引号后还有字符、单独的 \r 等不规范的内容
+    rng = random.Random(seed)
+    path = tmp_path / "raw.csv"
+    for _ in range(300):
+        _write_text(path, _random_text(rng, rng.randint(0, 60)), bom=rng.random() < 0.3)
+        columns = rng.choice(_column_choices[:5])
+        for skip_header in (True, False):
+            _assert_same(path, columns, skip_header)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_mmap_matches_csv_reader_on_written_rows(tmp_path, seed):
+    rng = random.Random(seed)
+    path = tmp_path / "rows.csv"
+    for _ in range(20):
+        _write_rows(path, _random_rows(rng, rng.randint(0, 50)), bom=rng.random() < 0.5)
+        for columns in _column_choices:
+            _assert_same(path, columns, True)
+
+
+def test_quoted_newlines_and_escaped_quotes(tmp_path):
+    path = tmp_path / "quoted.csv"
+    _write_rows(path, [["time", "name", "msg"],
+                       ["1", "张三", '第一行\n第二行，"引号"'],
+                       ["2", "李四", "a,b\r\nc"],
+                       ["3", "短"]], bom=True)
+    for reader in ("csv", "mmap"):
+        assert list(iter_columns(path, (0, 2, 1), reader=reader)) == [
+            ("1", '第一行\n第二行，"引号"', "张三"),
+            ("2", "a,b\nc", "李四"),
+        ]
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.csv"
+    _write_text(path, "")
+    assert row_boundaries(path, 3) == [0, 0, 0, 0]
+    assert _assert_same(path, (0,), True) == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_shards_match_full_scan(tmp_path, seed):
+    # 分片边界必须是行的开头：各分片依次读取的结果拼起来与读取整个文件相同
+    rng = random.Random(seed)
+    path = tmp_path / "shards.csv"
+    columns = (5, 10, 7)
+    for _ in range(10):
+        _write_rows(path, _random_rows(rng, rng.randint(0, 80)), bom=rng.random() < 0.5)
+        full = list(iter_columns(path, columns, reader="csv"))
+        size = path.stat().st_size
+        for count in (1, 2, 3, 7, 32):
+            boundaries = row_boundaries(path, count)
+            assert len(boundaries) == count + 1
+            assert boundaries[0] == 0 and boundaries[-1] == size
+            assert boundaries == sorted(boundaries)
+            for reader in ("csv", "mmap"):
+                rows = []
+                for start, end in zip(boundaries, boundaries[1:]):
+                    rows.extend(iter_columns(path, columns, skip_header=start == 0, reader=reader,
+                                             start=start, end=end))
+                assert rows == full
+
+
+def test_unknown_reader(tmp_path):
+    path = tmp_path / "a.csv"
+    _write_text(path, "a\n")
+    with pytest.raises(ValueError):
+        iter_columns(path, (0,), reader="pandas")
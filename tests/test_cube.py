@@ -0,0 +1,168 @@
+"""
+moyu_cube：立方体的各项统计、前缀和得到的日期范围统计都与逐条消息直接计数的结果一致
+"""
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from moyu_cube import CountCube
+
+_work_hours = (9, 18)
+
+
+def _random_messages(rng, count):
+    names = [f"user{i}" for i in range(rng.randint(1, 12))]
+    first_day = 19000
+    messages = []
+    for _ in range(count):
+        day = first_day + rng.randint(0, 60)
+        messages.append((rng.choice(names), day, (day + 3) % 7, rng.randrange(24)))
+    return messages
+
+
+def _add(cube, messages):
+    cube.add([cube.intern(name) for name, _, _, _ in messages], [day for _, day, _, _ in messages],
+             [weekday for _, _, weekday, _ in messages], [hour for _, _, _, hour in messages])
+
+
+def _build(messages, batches):
+    cube = CountCube(_work_hours)
+    step = max(1, -(-len(messages) // batches))
+    for i in range(0, len(messages), step):
+        _add(cube, messages[i:i + step])
+    return cube
+
+
+def _is_work(weekday, hour):
+    return weekday < 5 and _work_hours[0] <= hour < _work_hours[1]
+
+
+def _assert_totals(cube, messages):
+    # 与原来逐条累加 Counter 的结果相同，包括插入顺序（排名并列时的顺序）
+    moyu = Counter()
+    heatmap = np.zeros((7, 24), dtype=np.int64)
+    user_hours = {}
+    for name, _, weekday, hour in messages:
+        if _is_work(weekday, hour):
+            moyu[name] += 1
+        heatmap[weekday, hour] += 1
+        if weekday < 5:
+            user_hours.setdefault(name, [0] * 24)[hour] += 1
+    counter = cube.moyu_counter()
+    assert counter == moyu
+    assert list(counter) == list(moyu)
+    assert (cube.heatmap() == heatmap).all()
+    assert cube.hour_counts() == heatmap.sum(axis=0).tolist()
+    assert cube.weekday_counts() == heatmap[:5].sum(axis=1).tolist()
+    assert cube.message_count() == len(messages)
+    assert cube.work_message_count() == sum(moyu.values())
+    assert cube.work_day_count() == len({day for _, day, weekday, _ in messages if weekday < 5})
+    for name, hours in user_hours.items():
+        assert cube.user_hour_counts(name) == hours
+        assert cube.user_weekday_counts(name) == [
+            sum(1 for n, _, w, h in messages if n == name and w == weekday and _is_work(w, h))
+            for weekday in range(5)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_totals_match_brute_force(seed):
+    rng = random.Random(seed)
+    messages = _random_messages(rng, rng.randint(0, 2000))
+    _assert_totals(_build(messages, batches=rng.randint(1, 5)), messages)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_merged_shards_match_brute_force(seed):
+    rng = random.Random(seed)
+    messages = _random_messages(rng, rng.randint(0, 2000))
+    cuts = sorted(rng.randint(0, len(messages)) for _ in range(rng.randint(0, 4)))
+    cube = CountCube(_work_hours)
+    for start, end in zip([0] + cuts, cuts + [len(messages)]):
+        cube.merge(_build(messages[start:end], batches=2))
+    _assert_totals(cube, messages)
+
+
+def _in_range(day, first, last):
+    return (first is None or day >= first) and (last is None or day <= last)
+
+
+def _expected_range(messages, first, last):
+    selected = [message for message in messages if _in_range(message[1], first, last)]
+    # 插入顺序为各用户第一条工作时间消息的顺序（整个文件中，不限于范围内）
+    order = dict.fromkeys(name for name, _, weekday, hour in messages if _is_work(weekday, hour))
+    work_counts = Counter(name for name, _, weekday, hour in selected if _is_work(weekday, hour))
+    moyu = Counter({name: work_counts[name] for name in order if work_counts[name]})
+    hours = [0] * 24
+    weekdays = [0] * 5
+    for _, _, weekday, hour in selected:
+        hours[hour] += 1
+        if weekday < 5:
+            weekdays[weekday] += 1
+    work_days = len({day for _, day, weekday, _ in selected if weekday < 5})
+    return moyu, hours, weekdays, work_days
+
+
+def _assert_ranges(cube, messages, rng):
+    days = [day for _, day, _, _ in messages] or [19000]
+    low, high = min(days) - 3, max(days) + 3
+    ranges = [(None, None), (None, low), (high, None), (low, high)]
+    for _ in range(40):
+        first, last = rng.randint(low, high), rng.randint(low, high)
+        ranges.append((first, last))  # 包括 first > last 的空范围
+        ranges.append((rng.choice([None, first]), rng.choice([None, last])))
+    for first, last in ranges:
+        moyu, hours, weekdays, work_days = _expected_range(messages, first, last)
+        counter = cube.range_moyu_counter(first, last)
+        assert counter == moyu
+        assert list(counter) == list(moyu)
+        assert cube.range_hour_counts(first, last) == hours
+        assert cube.range_weekday_counts(first, last) == weekdays
+        assert cube.range_work_day_count(first, last) == work_days
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_ranges_match_brute_force(seed):
+    rng = random.Random(seed)
+    messages = _random_messages(rng, rng.randint(0, 2000))
+    cube = _build(messages, batches=rng.randint(1, 5))
+    _assert_ranges(cube, messages, rng)
+
+    # 不限范围时与整个立方体的统计相同
+    assert cube.range_moyu_counter() == cube.moyu_counter()
+    assert cube.range_hour_counts() == cube.hour_counts()
+    assert cube.range_weekday_counts() == cube.weekday_counts()
+    assert cube.range_work_day_count() == cube.work_day_count()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_ranges_after_merge(seed):
+    rng = random.Random(seed)
+    messages = _random_messages(rng, rng.randint(0, 2000))
+    cuts = sorted(rng.randint(0, len(messages)) for _ in range(rng.randint(0, 4)))
+    cube = CountCube(_work_hours)
+    for start, end in zip([0] + cuts, cuts + [len(messages)]):
+        cube.merge(_build(messages[start:end], batches=2))
+    _assert_ranges(cube, messages, rng)
+
+
+def test_prefix_sums_refresh_after_add():
+    rng = random.Random(0)
+    messages = _random_messages(rng, 500)
+    cube = _build(messages[:250], batches=1)
+    cube.range_hour_counts()  # 先计算一次前缀和
+    _add(cube, messages[250:])
+    _assert_ranges(cube, messages, rng)
+
+
+def test_prefix_sums_are_not_pickled():
+    import pickle
+
+    rng = random.Random(1)
+    messages = _random_messages(rng, 300)
+    cube = _build(messages, batches=1)
+    cube.range_hour_counts()
+    restored = pickle.loads(pickle.dumps(cube))
+    assert restored._prefix_sums is None
+    _assert_ranges(restored, messages, rng)
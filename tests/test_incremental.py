@@ -0,0 +1,75 @@
+"""
+增量分析：文件末尾追加消息后的增量统计与重新完整统计的结果一致，包括与上次最后一条消息在同一秒内的消息
+"""
+import os
+import random
+
+import pytest
+
+from exports import export_row, random_rows, write_export
+from moyu_analyzer import Config, make_work_calendar, read_stats_incremental, read_stats_stream, stop_words
+from moyu_tokenizer import Tokenizer
+from test_ingest import assert_same_stats, ordered
+
+
+@pytest.fixture
+def config(tmp_path):
+    return Config(timezone="Asia/Shanghai", result_dir=str(tmp_path), use_token_cache=False,
+                  use_columnar_cache=False, incremental=True, chunk_size=53)
+
+
+@pytest.fixture
+def tokenizer():
+    with Tokenizer(stop_words) as tokenizer:
+        yield tokenizer
+
+
+def _full(path, config, tokenizer):
+    return read_stats_stream(path, make_work_calendar(config), tokenizer, config)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_appends_match_full_run(tmp_path, config, tokenizer, seed, capsys):
+    rng = random.Random(seed)
+    path = str(tmp_path / "export.csv")
+    state_path = os.path.join(config.result_dir, config.state_file)
+    work_calendar = make_work_calendar(config)
+
+    rows = random_rows(rng, 400, bad_rate=0)
+    write_export(path, rows)
+    stats = read_stats_incremental(path, state_path, work_calendar, tokenizer, config)
+    assert_same_stats(stats, _full(path, config, tokenizer))
+
+    for _ in range(3):
+        last = int(rows[-1][5])
+        # 先追加几条与上次最后一条消息同一秒的消息，再追加之后的消息（其中有无法解析的时间戳）
+        appended = [export_row(last, rng.choice(["张三", "新来的"]), "同一秒内的摸鱼消息") for _ in range(3)]
+        appended += random_rows(rng, rng.randint(0, 200), start=last)
+        write_export(path, appended, append=True)
+        rows += appended
+
+        stats = read_stats_incremental(path, state_path, work_calendar, tokenizer, config)
+        full = _full(path, config, tokenizer)
+        assert_same_stats(stats, full)
+        assert ordered(stats["user_word_counters"]) == ordered(full["user_word_counters"])
+
+    # 没有新消息时结果不变
+    again = read_stats_incremental(path, state_path, work_calendar, tokenizer, config)
+    assert_same_stats(again, full)
+    assert "新增 0 条" in capsys.readouterr().out.splitlines()[-1]
+
+
+def test_rewritten_file_only_counts_newer_messages(tmp_path, config, capsys):
+    # 文件被重新导出（不是只在末尾追加）时扫描全文件，只统计时间戳晚于上次最后一条消息的消息
+    path = str(tmp_path / "export.csv")
+    state_path = os.path.join(config.result_dir, config.state_file)
+    work_calendar = make_work_calendar(config)
+    rows = random_rows(random.Random(0), 300, bad_rate=0)
+    write_export(path, rows[:200])
+    read_stats_incremental(path, state_path, work_calendar, None, config)
+
+    newer = [row for row in rows[200:] if int(row[5]) > int(rows[199][5])]
+    write_export(path, [export_row(1, "旧消息", "重新导出时多出来的旧消息")] + rows[:200] + newer)
+    stats = read_stats_incremental(path, state_path, work_calendar, None, config)
+    write_export(path, rows[:200] + newer)
+    assert_same_stats(stats, _full(path, config, None))
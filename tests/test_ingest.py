@@ -0,0 +1,86 @@
+"""
+向量化模式、流式模式与逐行模式读取同一个导出文件，统计结果完全一致
+"""
+import random
+
+import numpy as np
+import pytest
+
+from exports import export_row, random_rows, write_export
+from moyu_analyzer import (Config, make_work_calendar, read_stats_loop, read_stats_stream, read_stats_vectorized,
+                           stop_words, tokenize_user_messages)
+from moyu_tokenizer import Tokenizer
+
+
+def assert_same_stats(actual, expected):
+    a, b = actual["cube"], expected["cube"]
+    assert a.names == b.names
+    assert list(a.work_order) == list(b.work_order)  # 排名并列时的顺序
+    assert np.array_equal(a.counts, b.counts)
+    assert np.array_equal(a.days, b.days)
+    assert np.array_equal(a.day_hour, b.day_hour)
+    assert np.array_equal(a.day_user, b.day_user)
+    assert actual["max_timestamp"] == expected["max_timestamp"]
+
+
+def ordered(counters):
+    # 比较词频时连同用户和词的先后顺序（词频并列时的顺序）
+    return [(name, list(counter.items())) for name, counter in counters.items()]
+
+
+@pytest.fixture(params=[False, True], ids=["csv", "columnar"])
+def config(request, tmp_path):
+    return Config(timezone="Asia/Shanghai", result_dir=str(tmp_path / "out"), use_token_cache=False,
+                  use_columnar_cache=request.param, chunk_size=37)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_vectorized_matches_loop(tmp_path, config, seed):
+    path = str(tmp_path / "export.csv")
+    write_export(path, random_rows(random.Random(seed), 1500))
+    work_calendar = make_work_calendar(config)
+
+    loop = read_stats_loop(path, work_calendar, config)
+    assert loop["cube"].message_count() > 0
+
+    vectorized = read_stats_vectorized(path, work_calendar, config)
+    assert_same_stats(vectorized, loop)
+    assert list(vectorized["user_messages"].items()) == list(loop["user_messages"].items())
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_stream_matches_loop(tmp_path, config, seed):
+    # 流式模式按 chunk_size 分块读取并立即分词，词频与读取全部消息后再分词相同
+    path = str(tmp_path / "export.csv")
+    write_export(path, random_rows(random.Random(seed), 1500))
+    work_calendar = make_work_calendar(config)
+
+    loop = read_stats_loop(path, work_calendar, config)
+    with Tokenizer(stop_words) as tokenizer:
+        tokenize_user_messages(loop, tokenizer, loop["user_messages"], config.chunk_size)
+        stream = read_stats_stream(path, work_calendar, tokenizer, config)
+    assert_same_stats(stream, loop)
+    assert stream["user_messages"] == {}
+    assert ordered(stream["user_word_counters"]) == ordered(loop["user_word_counters"])
+
+    # 不分词时（只输出排行榜）只统计消息数量
+    counts_only = read_stats_stream(path, work_calendar, None, config)
+    assert_same_stats(counts_only, loop)
+    assert counts_only["user_word_counters"] == {}
+
+
+def test_out_of_range_timestamps_are_skipped(tmp_path, config):
+    # 超出int64范围的时间戳与逐行模式一样只跳过该行，不会让整批统计失败；int() 能解析的写法也与逐行模式一致
+    path = str(tmp_path / "export.csv")
+    write_export(path, [
+        export_row("99999999999999999999", "张三", "摸鱼"),
+        export_row(" 1709532000 ", "张三", "摸鱼"),
+        export_row("1_709_532_060", "李四", "摸鱼"),
+        export_row("-99999999999999999999", "李四", "摸鱼"),
+        export_row("１７０９５３２１２０", "王五", "摸鱼"),
+    ])
+    work_calendar = make_work_calendar(config)
+    loop = read_stats_loop(path, work_calendar, config)
+    assert loop["cube"].moyu_counter() == {"张三": 1, "李四": 1, "王五": 1}
+    assert_same_stats(read_stats_vectorized(path, work_calendar, config), loop)
+    assert_same_stats(read_stats_stream(path, work_calendar, None, config), loop)
@@ -0,0 +1,103 @@
+"""
+moyu_server：查询接口返回的结果与计数立方体相同；参数无效时返回400、用户或接口不存在时返回404，
+查询或渲染时的其他错误返回500，错误都以JSON返回
+"""
+import json
+import random
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+
+import pytest
+
+from exports import random_rows, write_export
+from moyu_analyzer import Config
+from moyu_server import QueryServer, load_index
+
+# 测试环境没有中文字体，渲染图表时的缺字警告与测试无关
+pytestmark = pytest.mark.filterwarnings("ignore:Glyph .* missing from font")
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("server")
+    path = str(tmp_path / "export.csv")
+    write_export(path, random_rows(random.Random(0), 800))
+    # 字体文件不存在时渲染词云会失败，与默认的Windows字体路径在其他系统上的情况相同
+    config = Config(timezone="Asia/Shanghai", result_dir=str(tmp_path / "out"), use_token_cache=False,
+                    use_columnar_cache=False, workers=1, font_path=str(tmp_path / "missing.ttc"))
+    server = QueryServer(load_index(path, config), ("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _get(server, path):
+    """
+    返回 (状态码, Content-Type, 内容)
+    """
+    url = f"http://127.0.0.1:{server.server_port}{path}"
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            return response.status, response.headers["Content-Type"], response.read()
+    except urllib.error.HTTPError as e:
+        with e:
+            return e.code, e.headers["Content-Type"], e.read()
+
+
+def _get_json(server, path):
+    status, content_type, body = _get(server, path)
+    assert content_type == "application/json; charset=utf-8"
+    return status, json.loads(body.decode("utf-8"))
+
+
+def test_queries(server):
+    cube = server.index.cube
+    status, summary = _get_json(server, "/api/summary")
+    assert status == 200
+    assert summary["messages"] == cube.message_count() and summary["users"] == len(cube.names)
+
+    status, ranking = _get_json(server, "/api/ranking?top=3")
+    assert status == 200
+    assert [tuple(item) for item in ranking["ranking"]] == cube.moyu_counter().most_common(3)
+
+    user = cube.names[0]
+    status, hours = _get_json(server, f"/api/hours?user={quote(user)}")
+    assert (status, hours) == (200, cube.user_hour_counts(user))
+
+    status, words = _get_json(server, "/api/words?from=2024-03-04&to=2024-03-10&top=5")
+    assert status == 200 and len(words["words"]) <= 5
+
+    status, content_type, png = _get(server, "/chart/heatmap.png")
+    assert (status, content_type) == (200, "image/png")
+    assert png.startswith(b"\x89PNG")
+
+
+@pytest.mark.parametrize("path, status", [
+    ("/api/ranking?from=2024-13-01", 400),
+    ("/api/ranking?from=2024-03-10&to=2024-03-01", 400),
+    ("/api/ranking?top=0", 400),
+    ("/api/heatmap?user=张三", 400),
+    ("/api/rolling?period=day", 400),
+    ("/api/hours?user=没有这个人", 404),
+    ("/api/nothing", 404),
+    ("/chart/nothing.png", 404),
+    ("/other", 404),
+])
+def test_query_errors(server, path, status):
+    actual, body = _get_json(server, quote(path, safe="/?=&"))
+    assert actual == status
+    assert body["error"]
+
+
+def test_internal_error(server, capsys):
+    # 渲染时的意外错误返回500和JSON错误信息，服务器继续处理之后的请求
+    status, body = _get_json(server, "/chart/wordcloud.png")
+    assert status == 500
+    assert "服务器内部错误" in body["error"]
+    assert "Traceback" in capsys.readouterr().err
+    assert _get_json(server, "/api/summary")[0] == 200
@@ -0,0 +1,67 @@
+"""
+moyu_sketch：Space-Saving 摘要的计数范围和误差上限
+"""
+import random
+from collections import Counter
+
+import pytest
+
+from moyu_sketch import SpaceSaving
+
+
+def _random_batches(rng, batches):
+    # 近似 Zipf 分布的词频：少数词很常见，大量的词只出现几次
+    vocabulary = [f"w{i}" for i in range(rng.randint(10, 400))]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return [Counter(rng.choices(vocabulary, weights, k=rng.randint(0, 300))) for _ in range(batches)]
+
+
+def _assert_bounds(sketch, truth, capacity):
+    assert sketch.total == sum(truth.values())
+    assert len(sketch) <= capacity
+    bound = sketch.error_bound()
+    assert bound * capacity <= sketch.total
+    for word, count in sketch.counts.items():
+        assert truth[word] <= count <= truth[word] + sketch.errors[word]
+        assert sketch.errors[word] <= bound
+    # 没有被跟踪的词不超过误差上限，因此出现次数超过 总词数 / capacity 的词一定被跟踪
+    for word, count in truth.items():
+        if word not in sketch.counts:
+            assert count <= bound
+        if count * capacity > sketch.total:
+            assert word in sketch.counts
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("capacity", [1, 5, 50, 1000])
+def test_error_bound(seed, capacity):
+    rng = random.Random(seed)
+    sketch = SpaceSaving(capacity)
+    truth = Counter()
+    for batch in _random_batches(rng, 20):
+        sketch.update(batch)
+        truth.update(batch)
+        _assert_bounds(sketch, truth, capacity)
+    if len(truth) <= capacity:
+        assert sketch.counter() == truth  # 没有满时计数是准确的
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("capacity", [1, 5, 50])
+def test_merge_error_bound(seed, capacity):
+    rng = random.Random(seed)
+    merged = SpaceSaving(capacity)
+    truth = Counter()
+    for _ in range(rng.randint(1, 5)):
+        part = SpaceSaving(capacity)
+        for batch in _random_batches(rng, rng.randint(0, 10)):
+            part.update(batch)
+            truth.update(batch)
+        merged.update(part)
+        _assert_bounds(merged, truth, capacity)
+
+
+def test_most_common_order():
+    sketch = SpaceSaving(10).update({"a": 3, "b": 5, "c": 1})
+    assert sketch.most_common(2) == [("b", 5), ("a", 3)]
+    assert sketch.error_bound() == 0
@@ -0,0 +1,63 @@
+"""
+启动优化：导入 moyu_analyzer 时不加载重型库；initialize_jieba() 只使用比词典文件新的序列化缓存
+"""
+import marshal
+import os
+import subprocess
+import sys
+
+import jieba
+import pytest
+
+import moyu_tokenizer
+from moyu_tokenizer import initialize_jieba
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def test_import_does_not_load_heavy_libraries():
+    code = ("import sys, moyu_analyzer; "
+            "print(' '.join(m for m in ('matplotlib', 'pandas', 'jieba', 'wordcloud') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+@pytest.fixture
+def dictionary_cache(tmp_path, monkeypatch):
+    # 使用新的jieba分词器和单独的缓存目录，不影响其他测试使用的全局词典
+    monkeypatch.setattr(jieba, "dt", jieba.Tokenizer())
+    jieba.dt.tmp_dir = str(tmp_path)
+    return os.path.join(str(tmp_path), "jieba.cache")
+
+
+def _write_cache(path, freq, mtime):
+    with open(path, "wb") as f:
+        f.write(marshal.dumps((freq, sum(freq.values()))))
+    os.utime(path, (mtime, mtime))
+
+
+def test_fresh_cache_is_loaded(dictionary_cache):
+    dictionary_mtime = os.path.getmtime(moyu_tokenizer._default_dictionary_file())
+    _write_cache(dictionary_cache, {"摸鱼": 3}, dictionary_mtime + 60)
+    initialize_jieba()
+    assert jieba.dt.initialized
+    assert jieba.dt.FREQ == {"摸鱼": 3}
+
+
+def test_stale_cache_is_rebuilt(dictionary_cache):
+    # 词典文件比缓存新（词典被修改过）时不能继续使用旧的词频
+    dictionary_mtime = os.path.getmtime(moyu_tokenizer._default_dictionary_file())
+    _write_cache(dictionary_cache, {"摸鱼": 3}, dictionary_mtime - 60)
+    initialize_jieba()
+    assert jieba.dt.initialized
+    assert len(jieba.dt.FREQ) > 100000
+    # 重新生成的缓存比词典文件新，下次直接加载
+    assert os.path.getmtime(dictionary_cache) > dictionary_mtime
+    with open(dictionary_cache, "rb") as f:
+        assert marshal.loads(f.read())[1] == jieba.dt.total
+
+
+def test_missing_cache_is_created(dictionary_cache):
+    initialize_jieba()
+    assert len(jieba.dt.FREQ) > 100000
+    assert os.path.exists(dictionary_cache)
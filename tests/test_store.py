@@ -0,0 +1,148 @@
+"""
+moyu_store：消息库的排行榜、时间分布和词频与分析报告（逐行读取导出文件）的结果相同，包括并列时的顺序；
+全文检索按jieba分出的词匹配
+"""
+import random
+from collections import Counter
+
+import jieba
+import pytest
+
+from exports import export_row, first_timestamp, random_rows, write_export
+from moyu_analyzer import (Config, clean_nickname, is_valid_message, make_work_calendar, read_stats_loop,
+                           read_stats_store, stop_words, tokenize_user_messages)
+from moyu_calendar import day_number
+from moyu_store import open_store
+from moyu_tokenizer import Tokenizer, initialize_jieba
+from test_ingest import assert_same_stats, ordered
+
+# 2024-03-04 14:00（北京时间，周一）开始的几条额外消息：多词关键字、引号和FTS5运算符
+extra_messages = ["今天摸鱼好开心", "明天摸鱼", "摸鱼 OR 上班", '他说"摸鱼"']
+
+
+@pytest.fixture
+def config(tmp_path):
+    return Config(timezone="Asia/Shanghai", result_dir=str(tmp_path / "out"), use_token_cache=False,
+                  use_columnar_cache=False)
+
+
+def _write(path, seed):
+    rng = random.Random(seed)
+    rows = random_rows(rng, 1500)
+    rows += [export_row(first_timestamp + 14 * 3600 + i, rng.choice(["张三", "新来的"]), msg)
+             for i, msg in enumerate(extra_messages * 3)]
+    write_export(path, rows)
+    return rows
+
+
+def _report(path, config):
+    stats = read_stats_loop(path, make_work_calendar(config), config)
+    with Tokenizer(stop_words) as tokenizer:
+        tokenize_user_messages(stats, tokenizer, stats["user_messages"], config.chunk_size)
+    return stats
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_store_matches_report(tmp_path, config, seed):
+    path = str(tmp_path / "export.csv")
+    _write(path, seed)
+    report = _report(path, config)
+    cube = report["cube"]
+
+    stats = read_stats_store(path, make_work_calendar(config), config)
+    assert_same_stats(stats, report)
+    assert ordered(stats["user_word_counters"]) == ordered(report["user_word_counters"])
+
+    with open_store(path, config) as store:
+        # 随机数据中消息数相同的用户很多，排名并列时的顺序也要与报告一致
+        assert store.ranking(10) == cube.moyu_counter().most_common(10)
+        assert store.ranking(100) == cube.moyu_counter().most_common()
+        assert store.work_day_count() == cube.work_day_count()
+        assert store.hour_counts() == cube.hour_counts()
+        assert store.weekday_counts() == cube.weekday_counts()
+        for name in cube.names:
+            assert store.hour_counts(nickname=name) == cube.user_hour_counts(name)
+
+        first, last = "2024-03-06", "2024-03-20"
+        assert store.ranking(100, first, last) == \
+            cube.range_moyu_counter(day_number(first), day_number(last)).most_common()
+        assert store.hour_counts(first, last) == cube.range_hour_counts(day_number(first), day_number(last))
+        assert store.work_day_count(first, last) == cube.range_work_day_count(day_number(first), day_number(last))
+
+        word_counter = sum(report["user_word_counters"].values(), Counter())
+        assert dict(store.top_words(1000)) == dict(word_counter)
+        for name, counter in report["user_word_counters"].items():
+            assert dict(store.top_words(1000, name)) == dict(counter)
+
+
+def _work_messages(rows, config):
+    # 工作时间内的有效消息 [(昵称, 消息内容)]，过滤规则与 moyu_analyzer 相同
+    work_calendar = make_work_calendar(config)
+    messages = []
+    for row in rows:
+        msg = row[7]
+        try:
+            day, weekday, hour = work_calendar.calendar(int(row[5]))
+        except ValueError:
+            continue
+        if is_valid_message(msg) and work_calendar.is_work_time(weekday, hour):
+            messages.append((clean_nickname(row[10]), msg))
+    return messages
+
+
+def _contains_phrase(msg, keyword):
+    # 关键字的各个词在消息中相邻出现（全文索引不保存标点）
+    def words(text):
+        return [word for word in jieba.cut(text) if any(ch.isalnum() for ch in word)]
+
+    message_words, phrase = words(msg), words(keyword)
+    return any(message_words[i:i + len(phrase)] == phrase for i in range(len(message_words) - len(phrase) + 1))
+
+
+@pytest.mark.parametrize("keyword", ["摸鱼", "今天摸鱼", "服务器", "OR", '"摸鱼"'])
+def test_keyword_ranking(tmp_path, config, keyword):
+    path = str(tmp_path / "export.csv")
+    rows = _write(path, 0)
+    initialize_jieba()
+    expected = {}
+    for name, msg in _work_messages(rows, config):
+        if _contains_phrase(msg, keyword):
+            expected[name] = expected.get(name, 0) + 1
+
+    with open_store(path, config) as store:
+        ranking = store.keyword_ranking(keyword, limit=100)
+        assert dict(ranking) == expected
+        assert [count for _, count in ranking] == sorted(expected.values(), reverse=True)
+        if keyword == "今天摸鱼":
+            # 两个词必须相邻：“今天又在摸鱼了”不匹配
+            assert sum(expected.values()) == 3
+
+
+def test_search(tmp_path, config):
+    path = str(tmp_path / "export.csv")
+    _write(path, 1)
+    with open_store(path, config) as store:
+        results = store.search("今天摸鱼", limit=100)
+        assert sorted(msg for _, _, msg in results) == ["今天摸鱼好开心"] * 3
+        timestamps = [timestamp for timestamp, _, _ in store.search("摸鱼", limit=100)]
+        assert timestamps == sorted(timestamps, reverse=True)
+        assert all(name == "张三" for _, name, _ in store.search("摸鱼", limit=100, nickname="张三"))
+
+        # 关键字分不出词时没有结果，不会产生FTS5语法错误
+        assert store.search("   ") == []
+        assert store.keyword_ranking("，。") == []
+
+
+def test_reimported_when_export_changes(tmp_path, config, capsys):
+    path = str(tmp_path / "export.csv")
+    _write(path, 0)
+    open_store(path, config).close()
+    assert "导入完成" in capsys.readouterr().out
+    open_store(path, config).close()
+    assert capsys.readouterr().out == ""
+
+    write_export(path, [export_row(1709532000, "新来的", "追加的摸鱼消息")], append=True)
+    with open_store(path, config) as store:
+        assert "导入完成" in capsys.readouterr().out
+        assert store.search("追加") == [(1709532000, "新来的", "追加的摸鱼消息")]
+        assert store.max_timestamp() == _report(path, config)["max_timestamp"]
@@ -0,0 +1,63 @@
+"""
+moyu_token_cache：缓存命中时返回与jieba相同的分词结果，停用词或jieba词典变化后旧的缓存条目不再被使用
+"""
+import jieba
+import pytest
+
+from exports import messages as sample_messages
+from moyu_analyzer import stop_words
+from moyu_token_cache import TokenCache
+from moyu_tokenizer import Tokenizer, initialize_jieba, tokenize
+
+messages = [msg for msg in sample_messages if msg.strip()] + ["摸鱼王今天又在摸鱼"]
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "token_cache.sqlite3")
+
+
+def _fill(cache_path, words=stop_words):
+    with Tokenizer(words, cache=TokenCache(cache_path, words)) as tokenizer:
+        return tokenizer.tokenize_many(messages)
+
+
+def test_hits_match_jieba(cache_path):
+    expected = [tokenize(msg, stop_words) for msg in messages]
+    assert _fill(cache_path) == expected
+
+    cache = TokenCache(cache_path, stop_words)
+    try:
+        assert cache.get_many(messages) == expected
+    finally:
+        cache.close()
+
+
+def test_stop_words_change_invalidates(cache_path):
+    _fill(cache_path)
+    changed = stop_words | {"摸鱼"}
+    cache = TokenCache(cache_path, changed)
+    try:
+        assert cache.get_many(messages) == [None] * len(messages)
+    finally:
+        cache.close()
+    # 重新分词的结果使用新的停用词，之后按新的停用词命中
+    token_lists = _fill(cache_path, changed)
+    assert all("摸鱼" not in words for words in token_lists)
+    assert token_lists == [tokenize(msg, changed) for msg in messages]
+
+
+def test_dictionary_change_invalidates(cache_path, monkeypatch):
+    _fill(cache_path)
+    initialize_jieba()
+    # 只在本测试中修改词典
+    monkeypatch.setattr(jieba.dt, "FREQ", dict(jieba.dt.FREQ))
+    monkeypatch.setattr(jieba.dt, "total", jieba.dt.total)
+    jieba.add_word("摸鱼王", 100000)
+
+    cache = TokenCache(cache_path, stop_words)
+    try:
+        assert cache.get_many(messages) == [None] * len(messages)
+    finally:
+        cache.close()
+    assert "摸鱼王" in _fill(cache_path)[-1]
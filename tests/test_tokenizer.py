@@ -0,0 +1,50 @@
+"""
+moyu_tokenizer：进程池并行分词的结果（包括词的先后顺序）与单进程完全一致
+"""
+import random
+
+import pytest
+
+import moyu_tokenizer
+from exports import messages as sample_messages, nicknames
+from moyu_analyzer import stop_words
+from moyu_tokenizer import Tokenizer
+
+
+def _random_messages(rng, count):
+    # 把示例消息随机拼接，得到大量不同的消息，其中也有重复的
+    return ["，".join(rng.choice(sample_messages) for _ in range(rng.randint(1, 4))) for _ in range(count)]
+
+
+@pytest.fixture
+def small_shards(monkeypatch):
+    # 分片很小时几百条消息就会分给多个进程
+    monkeypatch.setattr(moyu_tokenizer, "shard_size", 50)
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_parallel_matches_serial(small_shards, workers):
+    rng = random.Random(workers)
+    messages = _random_messages(rng, 700)
+    names = [rng.choice(nicknames) for _ in messages]
+
+    with Tokenizer(stop_words) as serial:
+        expected = (serial.tokenize_many(messages), serial.count_words(messages),
+                    serial.count_user_words(messages, names))
+    with Tokenizer(stop_words, workers) as parallel:
+        assert parallel.pool is not None
+        token_lists = parallel.tokenize_many(messages)
+        word_counter = parallel.count_words(messages)
+        user_word_counters = parallel.count_user_words(messages, names)
+
+    assert token_lists == expected[0]
+    # 词频并列时按词第一次出现的顺序排列，因此连同顺序一起比较
+    assert list(word_counter.items()) == list(expected[1].items())
+    assert [(name, list(counter.items())) for name, counter in user_word_counters.items()] == \
+        [(name, list(counter.items())) for name, counter in expected[2].items()]
+
+
+def test_stop_words_are_removed():
+    with Tokenizer(stop_words) as tokenizer:
+        for words in tokenizer.tokenize_many(_random_messages(random.Random(0), 200)):
+            assert all(word not in stop_words and len(word) > 1 for word in words)